@@ -180,38 +180,45 @@ def criar_dataframe_mibgas_completo():
     print("Série temporal de preços MIBGAS criada com sucesso.")
     return df_final, ultima_data_spot
 
+def publicar_serie_mibgas(df_mibgas, ultima_data_spot, pasta_destino):
+    """
+    Publica a série MIBGAS e a data de referência SPOT em ficheiros CSV pequenos,
+    independentes do Excel de tarifários. A escrita é feita para um ficheiro temporário
+    e depois substituída de forma atómica, para que a app nunca leia um ficheiro a meio.
+    """
+    os.makedirs(pasta_destino, exist_ok=True)
+
+    df_publicar = df_mibgas[['Data', 'Preço']].copy()
+    df_publicar['Data'] = pd.to_datetime(df_publicar['Data']).dt.strftime('%Y-%m-%d')
+    ficheiros_escritos = [(df_publicar, os.path.join(pasta_destino, 'MIBGAS.csv'))]
+
+    if ultima_data_spot:
+        info_df = pd.DataFrame({'Descricao': ['Ultima Data MIBGAS SPOT'], 'Data': [ultima_data_spot.strftime('%Y-%m-%d')]})
+        ficheiros_escritos.append((info_df, os.path.join(pasta_destino, 'Info.csv')))
+
+    for df_ficheiro, caminho_final in ficheiros_escritos:
+        caminho_temp = caminho_final + '.tmp'
+        df_ficheiro.to_csv(caminho_temp, index=False, encoding='utf-8')
+        os.replace(caminho_temp, caminho_final)
+        print(f"  > Escrito '{os.path.basename(caminho_final)}' ({len(df_ficheiro)} linhas).")
+
 if __name__ == "__main__":
     # O diretório do script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     # O diretório raiz do projeto (uma pasta acima da pasta 'scripts')
     project_root = os.path.dirname(script_dir)
-    EXCEL_FILE_PATH = os.path.join(project_root, 'Tarifarios_🔥_Gas_Natural_Tiago_Felicia.xlsx')
+    # A série MIBGAS é publicada à parte do Excel de tarifários, que só muda quando mudam os tarifários
+    PASTA_DADOS_MIBGAS = os.path.join(project_root, 'dados')
 
-    print(f"Iniciando a automação de dados MIBGAS... Ficheiro alvo: {EXCEL_FILE_PATH}")
+    print(f"Iniciando a automação de dados MIBGAS... Pasta alvo: {PASTA_DADOS_MIBGAS}")
     gwdes_df_novo, ultima_data_spot = criar_dataframe_mibgas_completo()
     if not gwdes_df_novo.empty:
-        info_df = None
         if ultima_data_spot:
-            info_df = pd.DataFrame({'Descricao': ['Ultima Data MIBGAS SPOT'], 'Data': [ultima_data_spot]})
             print(f"Última data SPOT encontrada para registar: {ultima_data_spot.strftime('%Y-%m-%d')}")
         try:
-            with pd.ExcelWriter(EXCEL_FILE_PATH, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-                gwdes_df_novo.to_excel(writer, sheet_name='MIBGAS', index=False)
-                if info_df is not None:
-                    info_df.to_excel(writer, sheet_name='Info', index=False)
-            print(f"\n✅ Ficheiro '{os.path.basename(EXCEL_FILE_PATH)}' atualizado com sucesso nas abas 'MIBGAS' e 'Info'.")
-        except FileNotFoundError:
-            print(f"\n⚠️ Aviso: O ficheiro '{os.path.basename(EXCEL_FILE_PATH)}' não foi encontrado. A criar um novo ficheiro...")
-            try:
-                with pd.ExcelWriter(EXCEL_FILE_PATH, engine='openpyxl') as writer:
-                    gwdes_df_novo.to_excel(writer, sheet_name='MIBGAS', index=False)
-                    if info_df is not None:
-                        info_df.to_excel(writer, sheet_name='Info', index=False)
-                print(f"\n✅ Ficheiro '{os.path.basename(EXCEL_FILE_PATH)}' criado com sucesso com as abas 'MIBGAS' e 'Info'.")
-            except Exception as e:
-                print(f"\n❌ ERRO ao criar o novo ficheiro Excel: {e}")
+            publicar_serie_mibgas(gwdes_df_novo, ultima_data_spot, PASTA_DADOS_MIBGAS)
+            print(f"\n✅ Série MIBGAS publicada com sucesso em '{os.path.basename(PASTA_DADOS_MIBGAS)}/'.")
         except Exception as e:
-            print(f"\n❌ ERRO ao escrever no ficheiro Excel: {e}")
+            print(f"\n❌ ERRO ao publicar a série MIBGAS: {e}")
     else:
-        print("\n⚠️ Aviso: Nenhum dado foi gerado, o ficheiro Excel não foi modificado.")
-
+        print("\n⚠️ Aviso: Nenhum dado foi gerado, os ficheiros MIBGAS não foram modificados.")
@@ -1,2435 +1,3136 @@
-import streamlit as st
-import pandas as pd
-import datetime
-import sys
-import os
-import json
-import io
-import time
-
-from bs4 import BeautifulSoup
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils import get_column_letter
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, JsCode
-from calendar import monthrange 
-
-# --- Adicionar o diretório raiz ao path ---
-try:
-    diretorio_atual = os.path.dirname(os.path.abspath(__file__))
-    diretorio_pai = os.path.dirname(diretorio_atual)
-    if diretorio_pai not in sys.path:
-        sys.path.append(diretorio_pai)
-
-    import calculos as calc
-    import processamento_dados as proc_dados
-    from processamento_dados import normalizar_para_ordenacao
-    import graficos as gfx 
-except ImportError:
-    st.error("Erro fatal: Não foi possível encontrar os módulos locais (calculos.py, processamento_dados.py). Certifique-se de que este ficheiro está na pasta 'pages' e os outros estão no diretório principal.")
-    st.stop()
-
-
-# --- Configuração da Página ---
-st.set_page_config(page_title="Simulador de Tarifários Gás Natural 2025: Poupe na Fatura | Tiago Felícia", page_icon="🔥", layout="wide", initial_sidebar_state="collapsed")
-
-# --- Carregar Dados ---
-url_excel = "https://github.com/tiagofelicia/simulador-tarifarios-gas/raw/refs/heads/main/Tarifarios_%F0%9F%94%A5_Gas_Natural_Tiago_Felicia.xlsx"
-
-try:
-    (
-        CONSTANTES, tarifas_gas_master, tos_municipios, mibgas_df, info_tab
-    ) = proc_dados.carregar_dados_excel_gas(url_excel)
-    
-    if tarifas_gas_master.empty or CONSTANTES.empty or tos_municipios.empty:
-        st.error("Erro: Uma das abas essenciais ('Tarifas_Gas_Master', 'Constantes', 'TOS') não foi carregada ou está vazia.")
-        st.stop()
-    if mibgas_df.empty:
-        st.warning("Aviso: A aba 'MIBGAS' não foi carregada. Os tarifários indexados a gás podem não ser calculados.")
-
-except ValueError:
-    st.error("Erro fatal ao carregar os dados.")
-    st.stop()
-except Exception as e:
-    st.error(f"Ocorreu um erro ao carregar os dados do Excel: {e}")
-    st.stop()
-
-# --- Obter valor constante da Quota ACP ---
-VALOR_QUOTA_ACP_MENSAL = calc.obter_constante("Quota_ACP", CONSTANTES)
-
-#FUNÇÕES
-# --- Mapas para encurtar os parâmetros do URL ---
-MAPA_ESCALAO_PARA_URL = {
-    "Escalão 1 (Consumo até 220 m³/ano)": "E1",
-    "Escalão 2 (Consumo 221 a 500 m³/ano)": "E2",
-    "Escalão 3 (Consumo 501 a 1.000 m³/ano)": "E3",
-    "Escalão 4 (Consumo 1.001 a 10.000 m³/ano)": "E4",
-}
-# Cria o dicionário inverso automaticamente para ler os URLs
-MAPA_URL_PARA_ESCALAO = {v: k for k, v in MAPA_ESCALAO_PARA_URL.items()}
-
-def inicializar_estado_e_url_gas():
-    """
-    Verifica e inicializa o st.session_state para o simulador de Gás, dando prioridade a valores no URL. Corre apenas uma vez por sessão.
-    """
-    if 'estado_inicializado_gas' in st.session_state:
-        return
-
-    # 1. Obter lista de municípios para validação
-    lista_municipios_validos = sorted(tos_municipios['Município'].dropna().unique())
-    
-    # 2. Ler Escalão do URL, ou usar default
-    escalao_codigo_url = st.query_params.get("esc") # Pega o código, ex: "E4"
-    nome_longo_escalao = MAPA_URL_PARA_ESCALAO.get(escalao_codigo_url) # Procura "E4" no dicionário e devolve o nome completo
-
-    # Se encontrou um nome de escalão correspondente no dicionário, usa-o.
-    if nome_longo_escalao:
-        st.session_state.sel_escalao_gas_key = nome_longo_escalao
-    else:
-        # Caso contrário (parâmetro inválido ou ausente), usa o default.
-        st.session_state.sel_escalao_gas_key = "Escalão 1 (Consumo até 220 m³/ano)"
-
-    # 3. Ler Município do URL, ou usar default
-    municipio_url = st.query_params.get("mun")
-    if municipio_url and municipio_url in lista_municipios_validos:
-        st.session_state.sel_municipio_tos = municipio_url
-    else:
-        # Usar Almeirim (10º da lista - índice 9) como default, com fallback
-        default_idx = 9 if len(lista_municipios_validos) > 9 else 0
-        st.session_state.sel_municipio_tos = lista_municipios_validos[default_idx]
-
-    # 4. Ler Consumo e Modo de Input
-    st.session_state.gas_input_mode = "Consumo (m³)" if "con_m3" in st.query_params else "Consumo (kWh)"
-    st.session_state.gas_kwh_input_key = float(st.query_params.get("con_kwh", 135)) # Default 135 kWh
-
-    # 5. Ler Preço MIBGAS
-    if "mibgas" in st.query_params:
-        st.session_state.mibgas_input_mwh_manual = float(st.query_params.get("mibgas"))
-        
-    # 6. Ler Opções Adicionais
-    st.session_state.chk_ts_gas_v2 = st.query_params.get("ts") == "1"
-    st.session_state.chk_acp_gas = st.query_params.get("acp") != "0" # Default é True
-    st.session_state.chk_cont_gas = st.query_params.get("cont") != "0" # Default é True
-
-    # 7. Ler Tarifário Personalizado ---
-    if st.query_params.get("p_a") == "1":
-        st.session_state.chk_pers_gas_ativo = True
-        st.session_state.pers_gas_energia = float(st.query_params.get("p_e", 0.0))
-        st.session_state.pers_gas_fixo = float(st.query_params.get("p_f", 0.0))
-        st.session_state.pers_gas_tar_energia = st.query_params.get("p_te") != "0" # Default é True
-        st.session_state.pers_gas_tar_potencia = st.query_params.get("p_tf") != "0" # Default é True
-
-    # Adicionar uma flag para indicar que a inicialização foi concluída
-    st.session_state.estado_inicializado_gas = True
-
-# --- Chamada da Função de Inicialização ---
-inicializar_estado_e_url_gas()
-
-# --- Função para REINICIAR o simulador para os valores padrão ---
-def reiniciar_simulador():
-    """
-    Repõe o simulador de GÁS para os valores padrão, limpando o session_state e os parâmetros do URL.
-    """
-    
-    # Lista de todas as chaves de session_state específicas do simulador de Gás
-    chaves_a_apagar_gas = [
-        # Chave de inicialização
-        'estado_inicializado_gas',
-        
-        # Chaves de Inputs Principais
-        'sel_escalao_gas_key',
-        'sel_municipio_tos',
-        'gas_input_mode',
-        'gas_kwh_input_key',
-        'gas_m3_input_key',
-        'gas_pcs_input_key',
-        
-        # Chaves de Datas e MIBGAS
-        'sel_mes_gas',
-        'session_initialized_dates_gas',
-        'data_inicio_key_input_gas',
-        'data_fim_key_input_gas',
-        'dias_manual_input_key_gas',
-        'previous_mes_for_dates_gas',
-
-        
-        # Chaves MIBGAS
-        'mibgas_input_mwh_manual',
-        'mibgas_default_calculado',
-        
-        # Chaves de Opções Adicionais
-        'gas_isp_manual_input',
-        'chk_ts_gas_v2',
-        'chk_acp_gas',
-        'chk_cont_gas',
-        
-        # Chaves do "Meu Tarifário"
-        'chk_meu_tarifario_gas_ativo',
-        'meu_termo_energia_gas',
-        'meu_termo_fixo_gas',
-        'meu_gas_tar_energia_incluida',
-        'meu_gas_tar_fixo_incluida',
-        'meu_gas_desconto_energia_perc',
-        'meu_gas_desconto_fixo_perc',
-        'meu_gas_desconto_fatura_eur',
-        'meu_gas_acrescimo_fatura_eur',
-        
-        # Chaves do "Tarifário Personalizado"
-        'chk_pers_gas_ativo',
-        'pers_gas_energia',
-        'pers_gas_fixo',
-        'pers_gas_tar_energia',
-        'pers_gas_tar_potencia',
-        
-        # Chaves de Filtros e UI
-        'filter_segmento_gas_idx',
-        'filter_faturacao_gas_idx',
-        'filter_pagamento_gas_idx',
-        'filter_tipos_gas_multi',
-        'chk_vista_simplificada_gas',
-        'poupanca_excel_texto_gas',
-        'poupanca_excel_cor_gas',
-        'poupanca_excel_negrito_gas'
-    ]
-
-    # Apagar cada chave se ela existir
-    for key in chaves_a_apagar_gas:
-        if key in st.session_state:
-            del st.session_state[key]
-
-    # Limpar todos os parâmetros do URL
-    st.query_params.clear()
-
-    # Definir explicitamente o estado das checkboxes como Falso
-    st.session_state.chk_meu_tarifario_gas_ativo = False
-    st.session_state.chk_pers_gas_ativo = False
-
-    st.success("Simulador de Gás reiniciado para os valores padrão.")
-
-# --- Título e Botão de Limpeza Geral ---
-
-# Linha 1: Logo e Título
-col_logo, col_titulo = st.columns([1, 5])
-
-with col_logo:
-    st.image("https://raw.githubusercontent.com/tiagofelicia/simulador-tarifarios-eletricidade/refs/heads/main/Logo_Tiago_Felicia.png", width=180)
-
-with col_titulo:
-    st.title("🔥 Tiago Felícia - Simulador de Tarifários de Gás Natural")
-
-st.button(
-    "🧹 Limpar e Reiniciar Simulador",
-    on_click=reiniciar_simulador,
-    help="Repõe os campos do simulador para os valores iniciais.",
-    use_container_width=True
-)
-
-# --- FUNÇÕES AUXILIARES PARA EXPORTAÇÃO EXCEL ---
-def gerar_estilo_completo_para_valor(valor, minimo, maximo):
-    """Gera o CSS completo (cor de fundo e texto) para uma célula de gradiente."""
-    estilo_css_final = 'text-align: center;' 
-    if pd.isna(valor): return estilo_css_final
-    try: val_float = float(valor)
-    except ValueError: return estilo_css_final
-    if maximo == minimo or minimo is None or maximo is None: return estilo_css_final
-
-    midpoint = (minimo + maximo) / 2
-    r_bg, g_bg, b_bg = 255,255,255 
-    verde_rgb, branco_rgb, vermelho_rgb = (99,190,123), (255,255,255), (248,105,107)
-
-    if val_float <= midpoint:
-        ratio = (val_float - minimo) / (midpoint - minimo) if midpoint != minimo else 0.0
-        r_bg = int(verde_rgb[0]*(1-ratio) + branco_rgb[0]*ratio)
-        g_bg = int(verde_rgb[1]*(1-ratio) + branco_rgb[1]*ratio)
-        b_bg = int(verde_rgb[2]*(1-ratio) + branco_rgb[2]*ratio)
-    else:
-        ratio = (val_float - midpoint) / (maximo - midpoint) if maximo != midpoint else 0.0
-        r_bg = int(branco_rgb[0]*(1-ratio) + vermelho_rgb[0]*ratio)
-        g_bg = int(branco_rgb[1]*(1-ratio) + vermelho_rgb[1]*ratio)
-        b_bg = int(branco_rgb[2]*(1-ratio) + vermelho_rgb[2]*ratio)
-
-    estilo_css_final += f' background-color: #{r_bg:02X}{g_bg:02X}{b_bg:02X};'
-    luminancia = (0.299 * r_bg + 0.587 * g_bg + 0.114 * b_bg)
-    cor_texto_css = '#000000' if luminancia > 140 else '#FFFFFF'
-    estilo_css_final += f' color: {cor_texto_css};'
-    return estilo_css_final
-
-def estilo_geral_dataframe_para_exportar(df_a_aplicar_estilo, tipos_reais_para_estilo_serie, min_max_config_para_cores, nome_coluna_tarifario="Tarifário"):
-    """Aplica estilos CSS a todo o DataFrame pandas.Styler."""
-    df_com_estilos = pd.DataFrame('', index=df_a_aplicar_estilo.index, columns=df_a_aplicar_estilo.columns)
-    
-    # Cores (Gás)
-    cor_fundo_indexado_gas_css = "#FFE699"
-    cor_texto_indexado_gas_css = "black"
-    cor_fundo_fixo_gas_css = "#f0f0f0"
-    cor_texto_fixo_gas_css = "#333333"
-
-    for nome_coluna_df in df_a_aplicar_estilo.columns:
-        if nome_coluna_df in min_max_config_para_cores:
-            try:
-                serie_valores_col = pd.to_numeric(df_a_aplicar_estilo[nome_coluna_df], errors='coerce')
-                min_valor_col = min_max_config_para_cores[nome_coluna_df]['min']
-                max_valor_col = min_max_config_para_cores[nome_coluna_df]['max']
-                df_com_estilos[nome_coluna_df] = serie_valores_col.apply(
-                    lambda valor_v: gerar_estilo_completo_para_valor(valor_v, min_valor_col, max_valor_col)
-                )
-            except Exception as e_estilo_custo:
-                print(f"Erro ao aplicar estilo de custo à coluna {nome_coluna_df}: {e_estilo_custo}")
-                df_com_estilos[nome_coluna_df] = 'text-align: center;' 
-
-        elif nome_coluna_df == nome_coluna_tarifario: 
-            estilos_col_tarif_lista = []
-            for idx_linha_df, valor_nome_col_tarif in df_a_aplicar_estilo[nome_coluna_df].items():
-                tipo_tarif_str = tipos_reais_para_estilo_serie.get(idx_linha_df, '') if tipos_reais_para_estilo_serie is not None else ''
-                est_css_tarif = 'text-align: center; padding: 4px;' 
-                bg_cor_val, fonte_cor_val, fonte_peso_val = "#FFFFFF", "#000000", "normal"
-
-                if tipo_tarif_str == "Pessoal":
-                    bg_cor_val, fonte_cor_val, fonte_peso_val = "#FF0000", "#FFFFFF", "bold"
-                elif tipo_tarif_str == 'Indexado':
-                    bg_cor_val, fonte_cor_val = cor_fundo_indexado_gas_css, cor_texto_indexado_gas_css
-                elif tipo_tarif_str == 'Fixo': 
-                    bg_cor_val, fonte_cor_val = cor_fundo_fixo_gas_css, cor_texto_fixo_gas_css
-        
-                est_css_tarif += f' background-color: {bg_cor_val}; color: {fonte_cor_val}; font-weight: {fonte_peso_val};'
-                estilos_col_tarif_lista.append(est_css_tarif)
-            df_com_estilos[nome_coluna_df] = estilos_col_tarif_lista
-        else: 
-            df_com_estilos[nome_coluna_df] = 'text-align: center;'
-    return df_com_estilos
-
-def exportar_excel_completo(df_para_exportar, styler_obj, resumo_html_para_excel, poupanca_texto_para_excel, identificador_cor_cabecalho, meu_tarifario_ativo_flag, personalizado_gas_ativo_flag):
-    """Função Mestra de Exportação Excel"""
-    output_excel_buffer = io.BytesIO() 
-    with pd.ExcelWriter(output_excel_buffer, engine='openpyxl') as writer_excel:
-        sheet_name_excel = 'Tiago Felicia - Gás Natural'
-
-        # --- Escrever Resumo (Usa BeautifulSoup para ler o HTML do resumo) ---
-        dados_resumo_formatado = []
-        if resumo_html_para_excel:
-            soup_resumo = BeautifulSoup(resumo_html_para_excel, "html.parser")
-            titulo_resumo = soup_resumo.find('h5')
-            if titulo_resumo:
-                dados_resumo_formatado.append([titulo_resumo.get_text(strip=True), None])
-
-            itens_lista_resumo = soup_resumo.find_all('li')
-            linha_filtros_texto = ""
-            linha_escalao_texto = ""
-            outras_linhas_resumo = []
-
-            for item in itens_lista_resumo:
-                texto_item = item.get_text(separator=' ', strip=True)
-                if "Segmento:" in texto_item:
-                    linha_filtros_texto = texto_item
-                elif "Escalão" in texto_item or "Município" in texto_item:
-                    linha_escalao_texto = texto_item
-                else:
-                    parts = texto_item.split(':', 1)
-                    if len(parts) == 2:
-                        outras_linhas_resumo.append([parts[0].strip() + ":", parts[1].strip()])
-                    else:
-                        outras_linhas_resumo.append([texto_item, None])
-            
-            if linha_filtros_texto or linha_escalao_texto:
-                dados_resumo_formatado.append([linha_filtros_texto, linha_escalao_texto])
-            dados_resumo_formatado.extend(outras_linhas_resumo)
-        
-        df_resumo_obj = pd.DataFrame(dados_resumo_formatado)
-        df_resumo_obj.to_excel(writer_excel, sheet_name=sheet_name_excel, index=False, header=False, startrow=0)
-        worksheet_excel = writer_excel.sheets[sheet_name_excel]
-
-        bold_font_obj = Font(bold=True)
-        for i_resumo in range(len(df_resumo_obj)):
-            excel_row_idx_resumo = i_resumo + 1
-            cell_resumo_rotulo = worksheet_excel.cell(row=excel_row_idx_resumo, column=1)
-            cell_resumo_rotulo.font = bold_font_obj
-            if df_resumo_obj.shape[1] > 1 and pd.notna(df_resumo_obj.iloc[i_resumo, 1]):
-                cell_resumo_valor = worksheet_excel.cell(row=excel_row_idx_resumo, column=2)
-                cell_resumo_valor.font = bold_font_obj
-
-        worksheet_excel.column_dimensions['A'].width = 35
-        worksheet_excel.column_dimensions['B'].width = 65
-        linha_atual_no_excel_escrita = len(df_resumo_obj) + 1
-
-        # --- Escrever Mensagem de Poupança ---
-        if poupanca_texto_para_excel:
-            linha_atual_no_excel_escrita += 1 
-            cor_p = st.session_state.get('poupanca_excel_cor_gas', "000000")
-            negrito_p = st.session_state.get('poupanca_excel_negrito_gas', False)
-            poupanca_cell_escrita = worksheet_excel.cell(row=linha_atual_no_excel_escrita, column=1, value=poupanca_texto_para_excel)
-            poupanca_cell_escrita.font = Font(bold=negrito_p, color=cor_p)
-            worksheet_excel.merge_cells(start_row=linha_atual_no_excel_escrita, start_column=1, end_row=linha_atual_no_excel_escrita, end_column=6)
-            poupanca_cell_escrita.alignment = Alignment(wrap_text=True, horizontal='left', vertical='top')
-            linha_atual_no_excel_escrita += 1
-
-        # --- Linha de Informação da Simulação ---
-        linha_info_simulacao_excel = linha_atual_no_excel_escrita + 1 
-        data_hoje_obj = datetime.date.today()
-        data_hoje_formatada_str = data_hoje_obj.strftime('%d/%m/%Y')
-        espacador_info = " " * 70
-        texto_completo_info = f"          Simulação em {data_hoje_formatada_str}{espacador_info}https://www.tiagofelicia.pt{espacador_info}Tiago Felícia"
-        info_cell = worksheet_excel.cell(row=linha_info_simulacao_excel, column=1)
-        info_cell.value = texto_completo_info
-        info_cell.font = Font(bold=True)
-        worksheet_excel.merge_cells(start_row=linha_info_simulacao_excel, start_column=1, end_row=linha_info_simulacao_excel, end_column=6)
-        info_cell.alignment = Alignment(horizontal='left', vertical='center', wrap_text=True) 
-        linha_inicio_tab_dados_excel = linha_info_simulacao_excel + 2 
-
-        # Limpar fundo branco default
-        for row in worksheet_excel.iter_rows(min_row=1, max_row=worksheet_excel.max_row+100, min_col=1, max_col=20):
-            for cell in row:
-                cell.fill = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
-
-        # Escrever o DataFrame Estilizado
-        styler_obj.to_excel(
-            writer_excel,
-            sheet_name=sheet_name_excel,
-            index=False,
-            startrow=linha_inicio_tab_dados_excel - 1, 
-            columns=df_para_exportar.columns.tolist()
-        )
-
-        # Cor do Cabeçalho (identificador_cor_cabecalho é o 'Escalão' para Gás)
-        cor_fundo = "A6A6A6"; cor_fonte = "000000" # Default
-
-        for col_idx, _ in enumerate(df_para_exportar.columns):
-            celula = worksheet_excel.cell(row=linha_inicio_tab_dados_excel, column=col_idx + 1)
-            celula.fill = PatternFill(start_color=cor_fundo, end_color=cor_fundo, fill_type="solid")
-            celula.font = Font(color=cor_fonte, bold=True)
-
-        # --- LEGENDA DE CORES ---
-        ultima_linha_tabela_principal = linha_inicio_tab_dados_excel + len(df_para_exportar)
-        linha_legenda_bloco_inicio = ultima_linha_tabela_principal + 2 
-
-        titulo_legenda_cell = worksheet_excel.cell(row=linha_legenda_bloco_inicio, column=1, value="Tipos de Tarifário:")
-        titulo_legenda_cell.font = Font(bold=True)
-        worksheet_excel.merge_cells(start_row=linha_legenda_bloco_inicio, start_column=1, end_row=linha_legenda_bloco_inicio, end_column=6)
-        titulo_legenda_cell.alignment = Alignment(horizontal='center', vertical='center')
-        linha_legenda_item_atual = linha_legenda_bloco_inicio + 1 
-
-        itens_legenda_excel = []
-        # 1. Adicionar "O Meu Tarifário" se estiver ativo
-        if meu_tarifario_ativo_flag:
-            itens_legenda_excel.append(
-                {"cf": "FF0000", "ct": "FFFFFF", "b": True, "tA": "O Meu Tarifário", "tB": "Tarifário configurado pelo utilizador."}
-            )
-        
-        # 2. Adicionar "Tarifário Personalizado" se estiver ativo
-        if personalizado_gas_ativo_flag:
-             itens_legenda_excel.append(
-                 {"cf": "92D050", "ct": "FFFFFF", "b": True, "tA": "Tarifário Personalizado", "tB": "Tarifário configurado pelo utilizador."}
-             )
-
-        # 3. Adicionar os tarifários base que aparecem sempre        
-        itens_legenda_excel.extend([
-            {"cf": "FFE699", "ct": "000000", "b": False, "tA": "Indexado", "tB": "Preço de energia baseado no MIBGAS + Margem."},
-            {"cf": "F0F0F0", "ct": "333333", "b": False, "tA": "Fixo", "tB": "Preços de energia constantes", "borda_cor": "CCCCCC"}
-        ])
-
-        worksheet_excel.column_dimensions[get_column_letter(1)].width = 30
-        worksheet_excel.column_dimensions[get_column_letter(2)].width = 200
-
-        for item in itens_legenda_excel:
-            celula_A_legenda = worksheet_excel.cell(row=linha_legenda_item_atual, column=1, value=item["tA"])
-            celula_A_legenda.fill = PatternFill(start_color=item["cf"], end_color=item["cf"], fill_type="solid")
-            celula_A_legenda.font = Font(color=item["ct"], bold=item["b"])
-            celula_A_legenda.alignment = Alignment(horizontal='center', vertical='center', indent=1)
-            if "borda_cor" in item:
-                celula_A_legenda.border = Border(top=Side(style="thin", color=item["borda_cor"]), left=Side(style="thin", color=item["borda_cor"]), right=Side(style="thin", color=item["borda_cor"]), bottom=Side(style="thin", color=item["borda_cor"]))
-            celula_B_legenda = worksheet_excel.cell(row=linha_legenda_item_atual, column=2, value=item["tB"])
-            celula_B_legenda.alignment = Alignment(vertical='center', wrap_text=True, horizontal='left')
-            worksheet_excel.merge_cells(start_row=linha_legenda_item_atual, start_column=2, end_row=linha_legenda_item_atual, end_column=6) 
-            worksheet_excel.row_dimensions[linha_legenda_item_atual].height = 20
-            linha_legenda_item_atual += 1
-        # --- FIM LEGENDA ---
-
-        # Ajustar largura das colunas da tabela principal (Adaptado para Gás)
-        for col_idx_iter, col_nome_iter_width in enumerate(df_para_exportar.columns):
-            col_letra_iter = get_column_letter(col_idx_iter + 1) 
-            if "Tarifário" in col_nome_iter_width:
-                 worksheet_excel.column_dimensions[col_letra_iter].width = 80    
-            elif "Total (€)" == col_nome_iter_width:
-                worksheet_excel.column_dimensions[col_letra_iter].width = 25
-            elif "(€/kWh)" in col_nome_iter_width or "(€/dia)" in col_nome_iter_width:
-                worksheet_excel.column_dimensions[col_letra_iter].width = 25
-            elif "Comercializador" in col_nome_iter_width:
-                 worksheet_excel.column_dimensions[col_letra_iter].width = 30    
-            elif "Faturação" in col_nome_iter_width:
-                 worksheet_excel.column_dimensions[col_letra_iter].width = 33    
-            elif "Pagamento" in col_nome_iter_width:
-                 worksheet_excel.column_dimensions[col_letra_iter].width = 50    
-            else: 
-                worksheet_excel.column_dimensions[col_letra_iter].width = 25
-
-    output_excel_buffer.seek(0)
-    return output_excel_buffer
-
-
-# --- Funções de Callback ---
-def atualizar_consumo_default_gas():
-    """
-    Callback para pré-preencher o consumo anual baseado no escalão selecionado
-    E ATUALIZAR O URL com o código do escalão.
-    """
-    escalao_str = st.session_state.get('sel_escalao_gas_key', "Escalão 1") 
-    
-    # Lógica de pré-preenchimento
-    consumo_defaults = { 1: 135, 2: 300, 3: 600, 4: 1000 }
-    escalao_num = escalao_map.get(escalao_str, 1)
-    consumo_default = consumo_defaults.get(escalao_num, 0)
-    st.session_state.gas_kwh_input_key = consumo_default
-
-    # Lógica de atualização do URL
-    codigo_escalao = MAPA_ESCALAO_PARA_URL.get(escalao_str)
-    if codigo_escalao:
-        st.query_params["esc"] = codigo_escalao
-
-def atualizar_url_datas_gas():
-    """Callback para monitorizar e atualizar o URL com as datas da simulação."""
-    # Como as datas são complexas e interligadas, esta função não faz nada por agora.
-    # A simples seleção já guarda o estado. Futuramente, poderíamos adicionar a lógica.
-    pass
-
-def sincronizar_datas_pelo_mes():
-    """
-    Callback executada quando o seletor de MÊS é alterado. Atualiza as datas de início e fim para corresponderem ao mês selecionado.
-    """
-    # Obter o mês selecionado a partir do estado da sessão
-    mes_selecionado = st.session_state.sel_mes_gas
-    
-    # Obter o ano atual e o número do mês
-    ano_atual = datetime.datetime.now().year
-    mes_num = list(dias_mes.keys()).index(mes_selecionado) + 1
-    
-    # Calcular o primeiro e último dia do mês selecionado
-    primeiro_dia = datetime.date(ano_atual, mes_num, 1)
-    ultimo_dia = datetime.date(ano_atual, mes_num, dias_mes[mes_selecionado])
-    
-    # Atualizar diretamente as chaves dos widgets de data
-    # Isto força os widgets a usarem as novas datas na próxima renderização
-    st.session_state.data_inicio_key_input_gas = primeiro_dia
-    st.session_state.data_fim_key_input_gas = ultimo_dia
-    
-    # Limpar o input manual de dias, pois as datas foram alteradas
-    if 'dias_manual_input_key_gas' in st.session_state:
-        del st.session_state['dias_manual_input_key_gas']
-
-def sincronizar_mes_pelas_datas():
-    """
-    Callback executada quando um dos campos de DATA é alterado. Atualiza o seletor de mês para refletir a nova data de início.
-    """
-    # Obter a nova data de início a partir do estado da sessão do seu widget
-    nova_data_inicio = st.session_state.data_inicio_key_input_gas
-    
-    # Obter a lista de meses
-    meses_lista = list(dias_mes.keys())
-    
-    # Sincronizar o seletor de mês com o mês da nova data de início
-    st.session_state.sel_mes_gas = meses_lista[nova_data_inicio.month - 1]
-    
-    # Limpar o input manual de dias
-    if 'dias_manual_input_key_gas' in st.session_state:
-        del st.session_state['dias_manual_input_key_gas']
-
-def atualizar_url_mibgas():
-    """Callback para o preço MIBGAS."""
-    mibgas_default = st.session_state.get('mibgas_default_calculado', 30.0)
-    mibgas_atual = st.session_state.get('mibgas_input_mwh_manual', mibgas_default)
-    if mibgas_atual != mibgas_default:
-        st.query_params['mibgas'] = str(mibgas_atual)
-    elif 'mibgas' in st.query_params:
-        del st.query_params['mibgas']
-
-def atualizar_url_municipio():
-    """Callback para o município selecionado."""
-    municipio_selecionado = st.session_state.get('sel_municipio_tos')
-    if municipio_selecionado:
-        # Não verificamos default aqui, pois o município é um input principal
-        st.query_params['mun'] = municipio_selecionado
-
-def atualizar_url_consumo_gas():
-    """Callback para os inputs de consumo (kWh ou m³)."""
-    modo = st.session_state.get('gas_input_mode')
-    if modo == "Consumo (kWh)":
-        if 'con_m3' in st.query_params: del st.query_params['con_m3']
-        if 'pcs' in st.query_params: del st.query_params['pcs']
-        
-        consumo_kwh = st.session_state.get('gas_kwh_input_key', 135)
-        if consumo_kwh != 135: # Default
-            st.query_params['con_kwh'] = str(consumo_kwh)
-        elif 'con_kwh' in st.query_params:
-            del st.query_params['con_kwh']
-
-    elif modo == "Consumo (m³)":
-        if 'con_kwh' in st.query_params: del st.query_params['con_kwh']
-        
-        consumo_m3 = st.session_state.get('gas_m3_input_key', 12)
-        pcs = st.session_state.get('gas_pcs_input_key', 11.25)
-        if consumo_m3 != 12: # Default
-            st.query_params['con_m3'] = str(consumo_m3)
-        elif 'con_m3' in st.query_params:
-            del st.query_params['con_m3']
-        
-        if pcs != 11.25: # Default
-            st.query_params['pcs'] = str(pcs)
-        elif 'pcs' in st.query_params:
-            del st.query_params['pcs']
-
-def atualizar_url_opcoes_adicionais_gas():
-    """Callback para todas as opções no expander de Opções Adicionais."""
-    # Tarifa Social
-    if st.session_state.get("chk_ts_gas_v2", False):
-        st.query_params["ts"] = "1"
-    elif "ts" in st.query_params:
-        del st.query_params["ts"]
-    
-    # ACP e Continente (Default é True, guardamos no URL se for False)
-    if not st.session_state.get("chk_acp_gas", True):
-        st.query_params["acp"] = "0"
-    elif "acp" in st.query_params:
-        del st.query_params["acp"]
-
-    if not st.session_state.get("chk_cont_gas", True):
-        st.query_params["cont"] = "0"
-    elif "cont" in st.query_params:
-        del st.query_params["cont"]
-
-def atualizar_url_meu_tarifario_gas():
-    """Callback para os inputs do Meu Tarifário."""
-    chaves_meu_tar = ["m_a", "m_e", "m_f", "m_te", "m_tf", "m_de", "m_dtf","m_df", "m_af"]
-    for chave in chaves_meu_tar:
-        if chave in st.query_params:
-            del st.query_params[chave]
-
-    if not st.session_state.get("chk_meu_tarifario_gas_ativo", False):
-        return
-
-    st.query_params["m_a"] = "1" # 'm_a' = meu_ativo
-
-    # Preços
-    if st.session_state.get("meu_termo_energia_gas"): st.query_params['m_e'] = st.session_state.get("meu_termo_energia_gas")
-    if st.session_state.get("meu_termo_fixo_gas"): st.query_params['m_f'] = st.session_state.get("meu_termo_fixo_gas")
-    # Flags (default=True)
-    if not st.session_state.get("meu_gas_tar_energia_incluida", True): st.query_params['m_te'] = "0"
-    if not st.session_state.get("meu_gas_tar_fixo_incluida", True): st.query_params['m_tf'] = "0"
-    # Descontos/Acréscimos
-    if st.session_state.get("meu_gas_desconto_energia_perc"): st.query_params['m_de'] = st.session_state.get("meu_gas_desconto_energia_perc")
-    if st.session_state.get("meu_gas_desconto_fixo_perc"): st.query_params['m_dtf'] = st.session_state.get("meu_gas_desconto_fixo_perc")
-    if st.session_state.get("meu_gas_desconto_fatura_eur"): st.query_params['m_df'] = st.session_state.get("meu_gas_desconto_fatura_eur")
-    if st.session_state.get("meu_gas_acrescimo_fatura_eur"): st.query_params['m_af'] = st.session_state.get("meu_gas_acrescimo_fatura_eur")
-
-def atualizar_url_tarifario_personalizado_gas():
-    """Callback para os inputs do Tarifário Personalizado."""
-    
-    # 1. Lista de todas as chaves possíveis para este widget no URL
-    chaves_pers_tar = ["p_a", "p_e", "p_f", "p_te", "p_tf"]
-    
-    # 2. Limpar sempre as chaves antigas do URL
-    for chave in chaves_pers_tar:
-        if chave in st.query_params:
-            del st.query_params[chave]
-
-    # 3. Se a secção não estiver ativa, sair
-    if not st.session_state.get("chk_pers_gas_ativo", False):
-        return
-
-    # 4. Se estiver ativa, adicionar a flag 'p_a' e os outros parâmetros
-    st.query_params["p_a"] = "1" # 'p_a' = personalizado_gas_ativo
-
-    # Adicionar os preços apenas se forem > 0
-    preco_energia = st.session_state.get("pers_gas_energia", 0.0)
-    if preco_energia: 
-        st.query_params['p_e'] = preco_energia
-
-    preco_fixo = st.session_state.get("pers_gas_fixo", 0.0)
-    if preco_fixo:
-        st.query_params['p_f'] = preco_fixo
-        
-    # Adicionar as flags apenas se forem diferentes do default (que é True)
-    if not st.session_state.get("pers_gas_tar_energia", True):
-        st.query_params['p_te'] = "0"
-        
-    if not st.session_state.get("pers_gas_tar_potencia", True):
-        st.query_params['p_tf'] = "0"
-
-# ##################################################################
-# INÍCIO DO BLOCO - GUIA RÁPIDO E FAQ
-# ##################################################################
-
-with st.expander("❓ Como Usar o Simulador de Tarifários de Gás Natural (Guia Rápido)", expanded=False):
-    st.markdown("""
-    Bem-vindo! Esta ferramenta ajuda-o a descobrir o tarifário de gás natural mais económico para si. Siga os passos abaixo para começar a poupar.
-
-    #### **Passo 1: Defina o Período e o seu Perfil de Consumo**
-    Primeiro, configure as bases da sua simulação.
-    
-    1.  **Selecione o Período:** Escolha o **mês** ou as **datas** para as quais pretende simular a sua fatura.
-    2.  **Defina o Escalão e Município:** Indique o seu **Escalão de Consumo** (pode encontrá-lo na sua fatura) e o seu **Município**. O município é essencial para calcular corretamente a Taxa de Ocupação do Subsolo (TOS).
-    3.  **Insira o Consumo:** Pode inserir o seu consumo de duas formas:
-        * **Consumo (kWh):** O valor final de energia que aparece na sua fatura.
-        * **Consumo (m³):** O volume de gás consumido, que também encontra na fatura. Terá de indicar o **Fator de Conversão (PCS)**, que converte m³ para kWh.
-
-    #### **Passo 2: ⚙️ Refine a Simulação (Opcional)**
-    Depois de inserir os seus dados principais, pode ajustar os detalhes.
-
-    * **Preço MIBGAS:** Se estiver a analisar tarifários indexados, pode ajustar o preço médio esperado do MIBGAS (€/MWh). O simulador já sugere um valor com base em dados históricos e de futuros.
-    * **Opções Adicionais:** No *expander* de "Opções Adicionais", pode ativar benefícios como a **Tarifa Social** (apenas para escalões 1 e 2) ou incluir descontos específicos de parcerias (ACP, Continente).
-    * **O Meu Tarifário:** Use esta secção para introduzir os preços da sua fatura atual. Assim, pode compará-la diretamente com todas as ofertas do mercado e ver exatamente quanto pode poupar.
-
-    #### **Passo 3: 🏆 Encontre a Melhor Tarifa**
-    A tabela de resultados no final da página é a sua ferramenta principal.
-
-    * **Ordenar por Custo:** Clique no cabeçalho da coluna **"Total Período (€)"** para ordenar os tarifários do mais barato para o mais caro.
-    * **Explorar Detalhes:** Passe o rato sobre os preços (**Termo Fixo** e **Termo Energia**) ou sobre o **custo total** para ver um resumo detalhado dos cálculos, incluindo todas as taxas e impostos.
-    * **Filtrar Resultados:** Use os filtros no topo da tabela para refinar a sua pesquisa por tipo de tarifário (Fixo, Indexado), segmento, etc.
-    * **O Seu Pódio:** No final, a secção **"🏆 O Seu Pódio da Poupança"** destaca as 3 opções mais económicas para si.
-
-    > **Dica Pro:**
-
-    * **Use "O Meu Tarifário" como Ponto de Partida:** A forma mais poderosa de usar o simulador é introduzir os dados da sua fatura atual na secção "O Meu Tarifário". Verá imediatamente uma comparação direta e saberá se o seu contrato atual é competitivo ou exatamente quanto pode poupar ao mudar.
-    * **Teste Cenários com o MIBGAS:** Se está a considerar um tarifário indexado, não altere o preço MIBGAS na primeira simulação. Depois, experimente inserir um valor mais alto (cenário pessimista) e um mais baixo (cenário otimista) para perceber a sensibilidade do custo final às variações do mercado.
-    * **Não Ignore o Município:** A escolha do seu município é crucial. Afeta diretamente o valor da Taxa de Ocupação do Subsolo (TOS) e qual o Comercializador de Último Recurso (CUR) aplicável, influenciando o custo final da Tarifa Regulada.
-    * **Explore os Filtros:** Se procura algo específico, como um tarifário com fatura eletrónica e débito direto, use os filtros no topo da tabela. Muitas vezes, as ofertas mais económicas encontram-se aqui."""      
-    )
-
-with st.expander("❔ Perguntas Frequentes (FAQ)", expanded=False):
-    st.markdown("""
-    ### Perguntas Gerais
-
-    **P: De onde vêm os dados dos tarifários e dos preços de mercado (MIBGAS)?**
-    
-    **R:** Todos os dados dos tarifários são recolhidos a partir das informações públicas disponibilizadas pelos comercializadores nos seus websites. Os preços do mercado ibérico de gás (MIBGAS) são obtidos de fontes oficiais. Os dados são atualizados regularmente para refletir as condições atuais do mercado.
-
-    **P: Tenho um tarifário com o mesmo nome que o do simulador, mas tem valores diferentes na energia e/ou termo fixo, porquê?**
-    
-    **R:** Muitos comercializadores alteram os valores nos seus tarifários mas mantêm as denominações dos mesmos. Este simulador só tem os valores para a última versão do tarifário.
-
-    **P: O simulador é 100% preciso?**
-    
-    **R:** O objetivo é ser o mais preciso possível. Para tarifários **fixos**, a precisão é muito elevada. Para tarifários **indexados**, o custo final é uma estimativa baseada nos preços médios do MIBGAS para o período selecionado. Variações diárias no preço do gás podem levar a pequenas diferenças no custo final.
-    
-    ---
-    
-    ### Dados e Períodos   
-    **P: Qual a diferença entre escolher um Mês e um Período de Datas manual?**
-    
-    **R:** Estas são as diferenças:
-    * **Escolher um Mês**: É a forma mais simples. O simulador seleciona automaticamente o primeiro e o último dia desse mês.
-    * **Selecionar Datas**: Oferece total flexibilidade para analisar um período específico (ex: uma semana, uma quinzena).
-                
-    ---
-    
-    ### Funcionalidades do Simulador
-
-    **P: Como funciona a secção "O Meu Tarifário"?**
-    
-    **R:** Esta secção permite-lhe introduzir os preços da sua fatura atual (**Termo Fixo** em €/dia e **Termo de Energia** em €/kWh) para comparar diretamente com todas as outras ofertas do mercado. É fundamental verificar na sua fatura se os preços que insere já incluem as **TAR (Tarifas de Acesso às Redes)**.
-
-    **P: Onde encontro os valores do "Termo Fixo" e "Termo de Energia" na minha fatura?**
-
-    **R:** Estes valores estão normalmente na secção de detalhe da sua fatura. Procure por:
-    * **Termo Fixo (ou Termo de Disponibilidade):** Um valor em **€/dia**. Multiplique-o pelo número de dias do período de faturação para obter o custo total do termo fixo.
-    * **Termo de Energia (ou Custo da Energia):** Um valor em **€/kWh**. Este é o preço que paga por cada kWh de gás consumido.
-    Certifique-se de que insere os valores **sem IVA** para que o simulador possa fazer os cálculos corretamente.
-
-    **P: Para que serve a secção "Comparar outro Tarifário Personalizado?"**
-    
-    **R:** Esta funcionalidade permite-lhe criar um cenário hipotético com os seus próprios preços. É ideal para simular uma oferta que recebeu e que ainda não está na lista ou para testar o impacto de futuras alterações de preços.
-                
-    **P: Os valores MIBGAS para datas futuras são reais?**
-    
-    **R:** Não. Os valores MIBGAS apresentados para datas futuras baseiam-se nos preços do mercado de futuros. Estes valores representam a expectativa do mercado, mas não são uma garantia. Servem como a melhor estimativa disponível para simular custos em tarifários indexados para períodos que ainda não ocorreram.
-
-    **P: Com que frequência são atualizados os tarifários e os preços de mercado?**
-
-    **R:** Os dados são atualizados regularmente para refletir as alterações nos preçários dos comercializadores e as variações do mercado de gás (MIBGAS). Pode consultar a data da última atualização dos valores de mercado na secção **"Datas de Referência"**, no final da página.                    
-
-    **P: Como são tratados descontos especiais como os do ACP ou Continente?**
-    
-    **R:** O simulador tenta replicar as condições comerciais o mais fielmente possível. Para a parceria **Goldenergy/ACP**, pode optar por incluir o valor da quota mensal no custo final. Para os tarifários **Galp/Continente**, o simulador calcula o valor do desconto em Cartão Continente e subtrai-o ao custo total, refletindo a poupança real na sua carteira. Pode ativar ou desativar estas opções na secção "Opções Adicionais de Simulação".                
-
-    **P: O que está incluído no "Total Período (€)"? É o valor final da fatura?**
-    
-    **R:** Sim, o valor "Total Período (€)" representa a sua fatura final estimada. Ele inclui a soma de várias componentes:
-                
-    1.  **Custo da Energia**: O consumo (kWh) multiplicado pelo Termo de Energia (€/kWh).
-                
-    2.  **Custo do Termo Fixo**: O Termo Fixo (€/dia) multiplicado pelo número de dias.
-                
-    3.  **Taxas e Impostos especiais**: A Taxa de Ocupação do Subsolo (TOS), o Imposto sobre os Produtos Petrolíferos (ISP).
-                
-    4.  **IVA**: O IVA é aplicado a 6% ou 23% sobre cada componente, de acordo com as regras em vigor.
-                
-    5. **Descontos/Acréscimos**: Quaisquer descontos de fatura ou acréscimos (como a quota ACP) são aplicados ao valor final.
-
-    Pode ver a decomposição detalhada de todos estes custos passando o rato por cima do valor na coluna "Total Período (€)".
-
-     **P: A tabela de resultados tem muitas opções. Como posso encontrar rapidamente o que procuro?**
-    
-    **R:** A tabela é interativa! Pode:
-
-    * **Ordenar**: Clique no cabeçalho de qualquer coluna (como "Total (€)" ou "Fixo (€/dia)") para ordenar os resultados do mais baixo para o mais alto, ou vice-versa.
-
-    * **Filtrar**: Use os filtros no topo da tabela para refinar a sua pesquisa por tipo de tarifário (Fixo, Indexado), segmento (Residencial, Empresarial), ou por opções de faturação e pagamento.
-
-    * **Pesquisar**: Na vista detalhada, pode usar a pesquisa dentro das colunas "Comercializador" e "Tarifário" para encontrar uma oferta específica.
-               
-    ---
-    
-    ### Termos e Conceitos
-
-    **P: O que é um tarifário de gás indexado?**
-    
-    **R:** Um tarifário indexado tem um preço de energia que varia de acordo com o preço do mercado grossista de gás (MIBGAS). Este tipo de tarifário pode oferecer uma poupança significativa quando os preços de mercado estão baixos, mas também implica um risco maior se os preços subirem.
-
-    **P: O que é o Escalão de Consumo?**
-    
-    **R:** É uma faixa de consumo anual (medido em m³) que determina os preços aplicados ao seu contrato. Existem 4 escalões para clientes domésticos e pequenos negócios. Pode encontrar o seu escalão na sua fatura de gás.
-
-    **P: O que são as TAR (Tarifas de Acesso às Redes) no gás?**
-    
-    **R:** Tal como na eletricidade, as TAR no gás pagam pelo uso das infraestruturas (armazenamento, transporte e distribuição). São definidas pela ERSE. Alguns comercializadores apresentam os preços já com as TAR incluídas, enquanto outros as mostram em separado. O simulador lida com ambas as situações.
-
-    **P: O que é o Fator de Conversão (PCS)?**
-    
-    **R:** O seu contador mede o gás em volume (metros cúbicos, m³), mas a energia que ele contém (o seu Poder Calorífico Superior, ou PCS) pode variar ligeiramente. O PCS é o fator que converte o volume (m³) em energia (kWh). Este valor está sempre indicado na sua fatura e é necessário se optar por inserir o seu consumo em m³.
-
-    **P: O que é a TOS (Taxa de Ocupação do Subsolo)?**
-
-    **R:** É uma taxa municipal pelo uso do subsolo público para a passagem das condutas de gás. O valor varia de município para município, sendo por isso crucial selecionar o seu corretamente.
-    """)
-
-# ##################################################################
-# FIM DO BLOCO
-# ##################################################################
-
-# --- Inputs do Utilizador ---
-st.subheader("⚙️ Insira os seus dados de simulação de Gás Natural")
-
-# --- BLOCO DE DEFINIÇÃO DE DATAS ---
-dias_mes = {"Janeiro":31,"Fevereiro":29,"Março":31,"Abril":30,"Maio":31,"Junho":30,"Julho":31,"Agosto":31,"Setembro":30,"Outubro":31,"Novembro":30,"Dezembro":31}
-ano_atual_para_bissexto = datetime.datetime.now().year
-if not ((ano_atual_para_bissexto % 4 == 0 and ano_atual_para_bissexto % 100 != 0) or (ano_atual_para_bissexto % 400 == 0)):
-    dias_mes["Fevereiro"] = 28
-
-# Lógica de inicialização (executada apenas uma vez)
-if 'session_initialized_dates_gas' not in st.session_state:
-    hoje = datetime.date.today()
-    data_inicial_default = hoje + datetime.timedelta(days=1)
-    
-    ano_final, mes_final = (data_inicial_default.year, data_inicial_default.month + 1)
-    if mes_final > 12:
-        mes_final = 1
-        ano_final += 1
-    
-    dias_no_mes_final = monthrange(ano_final, mes_final)[1]
-    dia_final = min(data_inicial_default.day, dias_no_mes_final)
-    
-    data_final_bruta = datetime.date(ano_final, mes_final, dia_final)
-    data_final_default = data_final_bruta - datetime.timedelta(days=1)
-    
-    # Define os valores iniciais para as chaves dos widgets
-    st.session_state.sel_mes_gas = list(dias_mes.keys())[data_inicial_default.month - 1]
-    st.session_state.data_inicio_key_input_gas = data_inicial_default
-    st.session_state.data_fim_key_input_gas = data_final_default
-    st.session_state.session_initialized_dates_gas = True
-
-# --- Widgets com as novas callbacks ---
-col_mes, col_data_i, col_data_f, col_dias_calc, col_dias_man = st.columns(5)
-
-with col_mes:
-    mes = st.selectbox(
-        "Mês", 
-        list(dias_mes.keys()), 
-        key="sel_mes_gas", 
-        on_change=sincronizar_datas_pelo_mes,
-        help="Selecione um mês para preencher automaticamente as datas. Se o mês escolhido já tiver terminado, o valor do MIBGAS é final, se ainda estiver em curso será com Futuros."
-    )
-
-data_minima_permitida = datetime.date(2025, 1, 1)
-data_maxima_permitida = datetime.date(2026, 9, 30)
-
-with col_data_i:
-    data_inicio = st.date_input(
-        "Data Inicial", 
-        min_value=data_minima_permitida, 
-        max_value=data_maxima_permitida, 
-        format="DD/MM/YYYY", 
-        key="data_inicio_key_input_gas", 
-        on_change=sincronizar_mes_pelas_datas,
-        help="A partir de 01/01/2025. Se não modificar as datas ou o mês, será calculado a partir do dia seguinte ao atual."
-    )
-with col_data_f:
-    data_fim = st.date_input(
-        "Data Final", 
-        min_value=data_minima_permitida, 
-        max_value=data_maxima_permitida, 
-        format="DD/MM/YYYY", 
-        key="data_fim_key_input_gas", 
-        on_change=sincronizar_mes_pelas_datas,
-        help="De Data Inicial a 30/09/2026. Se não modificar as datas ou o mês, será calculado até um mês após a data inicial."
-    )
-
-# A lógica de cálculo dos dias lê os valores diretamente dos widgets
-dias_default_calculado = (data_fim - data_inicio).days + 1 if data_fim >= data_inicio else 0
-
-with col_dias_calc:
-    gfx.exibir_metrica_personalizada("Dias (pelas datas)", f"{dias_default_calculado} dias")
-
-with col_dias_man:
-    # O valor por defeito do input manual é sempre o calculado a partir das datas
-    dias_manual_input_val = st.number_input(
-        "Nº Dias (manual)", 
-        min_value=1, 
-        value=dias_default_calculado, 
-        step=1, 
-        key="dias_manual_input_key_gas",
-        help="Pode alterar os dias de forma manual, mas dê preferência às datas ou mês, para ter dados mais fidedignos nos tarifários indexados."
-    )
-
-# Decisão final sobre o número de dias a usar
-if pd.isna(dias_manual_input_val) or dias_manual_input_val <= 0 or dias_manual_input_val == dias_default_calculado:
-    dias = dias_default_calculado
-else:
-    dias = int(dias_manual_input_val)
-
-st.write(f"Dias considerados: **{dias} dias**")
-
-# Input MIBGAS
-# Calcular o default ANTES de desenhar o widget
-media_mibgas_calculada = 0.0
-if not mibgas_df.empty:
-    media_mibgas_calculada = calc.calcular_media_mibgas_datas(mibgas_df, data_inicio, data_fim)
-
-# Se o cálculo falhar, usar o default das Constantes
-if media_mibgas_calculada == 0.0:
-     mibgas_default_const = calc.obter_constante("MIBGAS_Default", CONSTANTES)
-     if mibgas_default_const != 0.0:
-         media_mibgas_calculada = mibgas_default_const
-     else:
-         media_mibgas_calculada = 30.0 # Fallback final
-
-# Guardar o default calculado para a callback do MIBGAS
-st.session_state['mibgas_default_calculado'] = media_mibgas_calculada
-
-# O valor default do input é a média que acabámos de calcular
-mibgas_input_mwh = st.number_input(
-    "Preço MIBGAS (€/MWh)",
-    min_value=0.0,
-    value=media_mibgas_calculada, # Default é o valor calculado
-    step=1.0,
-    format="%.2f",
-    key="mibgas_input_mwh_manual", # Key para o input manual
-    on_change=atualizar_url_mibgas,
-    help=f"Valor médio esperado do MIBGAS. O valor pré-preenchido ({media_mibgas_calculada:.2f} €/MWh) é a média calculada para o período selecionado."
-)
-
-# Adicionar Alertas
-if mibgas_input_mwh != media_mibgas_calculada:
-    # Usar as funções de alerta (se existirem em graficos.py) ou st.info/st.warning
-    diferenca_mibgas_perc = (mibgas_input_mwh / media_mibgas_calculada - 1) * 100 if media_mibgas_calculada != 0 else 0
-    
-    if mibgas_input_mwh < media_mibgas_calculada:
-        st.warning(
-            f"⚠️ **Aviso:** O valor MIBGAS inserido ({mibgas_input_mwh:.2f} €) é **{abs(diferenca_mibgas_perc):.1f}% inferior** à média calculada ({media_mibgas_calculada:.2f} €) para o período selecionado."
-        )
-    else:
-        st.info(
-            f"ℹ️ **Nota:** O valor MIBGAS inserido ({mibgas_input_mwh:.2f} €) é **{diferenca_mibgas_perc:.1f}% superior** à média calculada ({media_mibgas_calculada:.2f} €) para o período selecionado."
-        )
-
-# --- INÍCIO DO BLOCO DO GRÁFICO MIBGAS ---
-with st.expander("📊 Ver Gráfico de Evolução dos Preços Médios Diários MIBGAS no Período"):
-    
-    # 1. Obter a data que separa os preços Spot dos Futuros (da aba 'Info')
-    data_split_mibgas = None
-    if not info_tab.empty:
-        linha_data_split = info_tab[info_tab['Descricao'] == 'Ultima Data MIBGAS SPOT']
-        if not linha_data_split.empty:
-            valor_data = linha_data_split['Data'].iloc[0]
-            if pd.notna(valor_data):
-                try:
-                    data_split_mibgas = pd.to_datetime(valor_data).date()
-                except Exception:
-                    st.warning("Não foi possível ler a data de referência dos valores MIBGAS SPOT.")
-
-    # 2. Preparar e gerar o gráfico apenas se tivermos a data de split
-    if data_split_mibgas:
-        with st.spinner("A gerar gráfico MIBGAS..."):
-            # Chamar a nova função de preparação de dados
-            dados_grafico = gfx.preparar_dados_grafico_mibgas(
-                df_mibgas=mibgas_df,
-                data_inicio=data_inicio,
-                data_fim=data_fim,
-                data_split_spot_futuros=data_split_mibgas
-            )
-            
-            # 3. Gerar e exibir o HTML do gráfico
-            if dados_grafico:
-                html_grafico_mibgas = gfx.gerar_grafico_highcharts_multi_serie(
-                    chart_id=dados_grafico['id'],
-                    chart_data=dados_grafico
-                )
-                st.components.v1.html(html_grafico_mibgas, height=320)
-            else:
-                st.info("Não existem dados MIBGAS disponíveis para o período selecionado para gerar o gráfico.")
-    else:
-        st.warning("A data de referência para os valores MIBGAS não está definida na aba 'Info' do ficheiro Excel.")
-# --- FIM DO BLOCO DO GRÁFICO MIBGAS ---
-
-# --- BLOCO DE INPUTS DE GÁS ---
-st.markdown("##### Defina o seu perfil de consumo")
-
-col_esc, col_mun, col_cur = st.columns(3)
-
-with col_esc:
-    # Escalão é selecionado (Default E1) e chama o callback
-    escalao_map = {
-        "Escalão 1 (Consumo até 220 m³/ano)": 1,
-        "Escalão 2 (Consumo 221 a 500 m³/ano)": 2,
-        "Escalão 3 (Consumo 501 a 1.000 m³/ano)": 3,
-        "Escalão 4 (Consumo 1.001 a 10.000 m³/ano)": 4
-    }
-    escalao_selecionado_str = st.selectbox(
-        "Selecione o seu Escalão de Consumo",
-        options=list(escalao_map.keys()),
-        index=0, # Default para Escalão 1
-        key="sel_escalao_gas_key",
-        on_change=atualizar_consumo_default_gas,
-        help="Indique o seu **Escalão de Consumo** (pode encontrá-lo na sua fatura)"
-    )
-    escalao_num = escalao_map[escalao_selecionado_str]
-
-with col_mun:
-    # --- Definir default para o 10º item ---
-    lista_municipios = sorted(tos_municipios['Município'].dropna().unique(), key=normalizar_para_ordenacao)
-    
-    # Definir o 10º item (índice 9) como padrão
-    default_index_municipio = 9 
-    # Safety check: se a lista tiver menos de 10 itens, usa o primeiro (índice 0)
-    if len(lista_municipios) <= default_index_municipio: 
-        default_index_municipio = 0
-        
-    municipio_selecionado = st.selectbox(
-        "⚠️ Selecione o seu Município",
-        options=lista_municipios,
-        key="sel_municipio_tos",
-        on_change=atualizar_url_municipio,
-        help="O **Município** é essencial para calcular corretamente a Taxa de Ocupação do Subsolo (TOS)."
-    )
-
-# --- Mostrar o CUR correspondente ---
-with col_cur:
-    cur_selecionado_nome = ""
-    linha_tos_cur = pd.DataFrame() # Inicializar como DataFrame vazio
-    
-    if municipio_selecionado:
-        linha_tos_cur = tos_municipios[tos_municipios['Município'] == municipio_selecionado]
-        if not linha_tos_cur.empty and 'CUR' in linha_tos_cur.columns:
-            cur_selecionado_nome = linha_tos_cur.iloc[0].get('CUR', 'N/D')
-    
-    gfx.exibir_metrica_personalizada("Comercializador de Último Recurso (CUR)", cur_selecionado_nome if cur_selecionado_nome else "N/D")
-
-# --- Inputs de Consumo (Com lógica de pré-preenchimento) ---
-input_mode = st.radio(
-    "Como prefere inserir o consumo?",
-    ["Consumo (kWh)", "Consumo (m³)"],
-    horizontal=True, index=0, key="gas_input_mode",
-    on_change=atualizar_url_consumo_gas,
-    help="**Consumo (kWh):** O valor final de energia que aparece na sua fatura. **Consumo (m³):** O volume de gás consumido, que também encontra na fatura. Terá de indicar o **Fator de Conversão (PCS)**, que converte m³ para kWh"
-)
-
-consumo_kwh = 0
-
-# Verificamos se o callback já correu ou se é a primeira execução
-if 'gas_kwh_input_key' not in st.session_state:
-    atualizar_consumo_default_gas() # Chamar na primeira execução para definir o default (135)
-
-if input_mode == "Consumo (kWh)":
-    consumo_kwh = st.number_input(
-        "Consumo (kWh)", 
-        min_value=0, 
-        step=10, 
-        key="gas_kwh_input_key", # Key ligada ao callback
-        on_change=atualizar_url_consumo_gas
-    )
-else:
-    col_m3_1, col_m3_2 = st.columns(2)
-    with col_m3_1:
-        consumo_m3 = st.number_input("Consumo (m³)", min_value=0, value=12, step=1, key="gas_m3_input_key", on_change=atualizar_url_consumo_gas)
-    with col_m3_2:
-        fator_pcs = st.number_input("Fator de Conversão (PCS)", min_value=9.0, max_value=13.0, value=11.25, step=0.1, key="gas_pcs_input_key", on_change=atualizar_url_consumo_gas, help="Este valor (PCS) converte m³ para kWh e deve estar na sua fatura.")
-    
-    consumo_kwh = consumo_m3 * fator_pcs
-    gfx.exibir_metrica_personalizada("Consumo (kWh) Calculado", f"{consumo_kwh:.0f} kWh")
-
-# --- Calcular consumo pro-rata para o período ---
-consumo_kwh_periodo_final = 0.0
-if dias > 0 and consumo_kwh > 0:
-    consumo_kwh_periodo_final = consumo_kwh / dias
-    gfx.exibir_info_personalizada(f"O consumo médio diario para {dias} dias é de {consumo_kwh_periodo_final:.2f} kWh.")
-elif dias <= 0:
-    st.error("O número de dias da simulação não pode ser zero.")
-    st.stop()
-else:
-    st.warning("Consumo é zero. Os cálculos de custo de energia e taxas variáveis serão zero.")
-
-
-# --- Obter valores TOS ---
-tos_fixo_dia_selecionado = 0.0
-tos_variavel_kwh_selecionado = 0.0
-if municipio_selecionado != "Outro":
-    linha_tos = tos_municipios[tos_municipios['Município'] == municipio_selecionado]
-    if not linha_tos.empty:
-        try:
-            if 'TOS_Fixo_Dia' in linha_tos.columns:
-                 tos_fixo_dia_selecionado = float(linha_tos.iloc[0]['TOS_Fixo_Dia'])
-            else:
-                 tos_fixo_dia_selecionado = float(linha_tos.iloc[0]['TOS_Fixo_Dia (€/dia)']) # Fallback
-                 
-            if 'TOS_Variavel_kWh' in linha_tos.columns:
-                tos_variavel_kwh_selecionado = float(linha_tos.iloc[0]['TOS_Variavel_kWh'])
-            else:
-                tos_variavel_kwh_selecionado = float(linha_tos.iloc[0]['TOS_Variavel_kWh (€/kWh)']) # Fallback
-                
-        except Exception as e:
-            st.error(f"Erro ao ler valores TOS para {municipio_selecionado}. Verifique nomes das colunas na aba TOS. {e}")
-            tos_fixo_dia_selecionado = 0.0
-            tos_variavel_kwh_selecionado = 0.0
-
-
-# --- Opções Adicionais ---
-with st.expander("➕ Opções Adicionais de Simulação (Gás Natural)"):
-    
-    # --- Widget ISP ---
-    isp_gas_default = calc.obter_constante('ISP_Gas_eur_kwh', CONSTANTES)
-    
-    isp_gas_manual_input = st.number_input(
-        "ISP Gás (€/kWh)",
-        min_value=0.0,
-        value=isp_gas_default,
-        step=0.0001,
-        format="%.6f", 
-        key="gas_isp_manual_input",
-        on_change=atualizar_url_opcoes_adicionais_gas,
-        help=f"Imposto Especial de Consumo (ISP). Default ({isp_gas_default})."
-    )
-    # TS Condicional
-    if escalao_num in [1, 2]:
-        st.markdown(r"##### Benefícios e Condições Especiais (para Escalões 1 e 2)") # Título condicional
-        tarifa_social_gas = st.checkbox("Aplicar Tarifa Social de Gás Natural?", key="chk_ts_gas_v2", on_change=atualizar_url_opcoes_adicionais_gas, help="A Tarifa Social de Gás Natural aplica-se apenas aos escalões 1 e 2.")
-    else:
-        tarifa_social_gas = False
-        if 'chk_ts_gas_v2' in st.session_state: 
-            st.session_state.chk_ts_gas_v2 = False
-
-    # Outros descontos
-    st.markdown("##### Parcerias e Descontos Específicos")
-    col_op1, col_op2 = st.columns(2)
-    with col_op1:
-        acp_gas = st.checkbox("Incluir quota ACP", key="chk_acp_gas", value=True, on_change=atualizar_url_opcoes_adicionais_gas, help="Inclui o valor da quota do ACP (4,80 €/mês) no valor do tarifário da parceria GE/ACP.",)
-    with col_op2:
-        desconto_continente_gas = st.checkbox("Desconto Continente", key="chk_cont_gas", value=True, on_change=atualizar_url_opcoes_adicionais_gas, help="Comparar o custo total incluindo o desconto do valor do cupão Continente no tarifário Galp&Continente.")
-
-
-# --- "O Meu Tarifário" de Gás ---
-help_O_Meu_Tarifario_Gas = """
-Para preencher os valores de acordo com o seu tarifário, ou com outro qualquer que queira comparar.
-
-**Atenção às notas sobre as TAR.**
-    """
-meu_tarifario_gas_ativo = st.checkbox("**Comparar com O Meu Tarifário de Gás Natural?**", key="chk_meu_tarifario_gas_ativo", on_change=atualizar_url_meu_tarifario_gas, help=help_O_Meu_Tarifario_Gas)
-
-if meu_tarifario_gas_ativo:
-    with st.container(border=True):
-
-        st.subheader("🧾 O Meu Tarifário (Gás Natural)")
-        
-        col_meu1, col_meu2 = st.columns(2)
-        with col_meu1:
-            st.number_input("Preço Energia (€/kWh)", min_value=0.0, step=0.001, format="%g", key="meu_termo_energia_gas", on_change=atualizar_url_meu_tarifario_gas)
-        with col_meu2:
-            st.number_input("Preço Termo Fixo (€/dia)", min_value=0.0, step=0.001, format="%g", key="meu_termo_fixo_gas", on_change=atualizar_url_meu_tarifario_gas)
-
-        col_meu_flag1, col_meu_flag2 = st.columns(2)
-        with col_meu_flag1:
-            st.checkbox("TAR incluída no Preço Energia?", value=True, key="meu_gas_tar_energia_incluida", on_change=atualizar_url_meu_tarifario_gas)
-        with col_meu_flag2:
-            st.checkbox("TAR incluída no Preço Termo Fixo?", value=True, key="meu_gas_tar_fixo_incluida", on_change=atualizar_url_meu_tarifario_gas)
-            
-        st.markdown("###### Descontos e Acréscimos (Meu Tarifário)")
-        col_desc1, col_desc2, col_desc3, col_desc4 = st.columns(4)
-        with col_desc1:
-            st.number_input("Desconto Energia (%)", min_value=0.0, max_value=100.0, step=0.1, key="meu_gas_desconto_energia_perc", on_change=atualizar_url_meu_tarifario_gas)
-        with col_desc2:
-            st.number_input("Desconto Termo Fixo (%)", min_value=0.0, max_value=100.0, step=0.1, key="meu_gas_desconto_fixo_perc", on_change=atualizar_url_meu_tarifario_gas)
-        with col_desc3:
-            st.number_input("Desconto Fatura (€)", min_value=0.0, step=0.01, format="%.2f", key="meu_gas_desconto_fatura_eur", on_change=atualizar_url_meu_tarifario_gas)
-        with col_desc4:
-            st.number_input("Acréscimo Fatura (€)", min_value=0.0, step=0.01, format="%.2f", key="meu_gas_acrescimo_fatura_eur", on_change=atualizar_url_meu_tarifario_gas)
-
-# --- BLOCO DO TARIFÁRIO PERSONALIZADO ---
-help_Personalizado_Gas = """
-Crie tarifário personalizado para comparar com os seus consumos. Ideal para comparar outro tarifário extra. Não permite descontos e acréscimos que existem em 'O Meu Tarifário'.
-
-**Atenção às notas sobre as TAR.**
-    """
-personalizado_gas_ativo = st.checkbox(
-    "**Comparar outro Tarifário Personalizado? (simplificado)**",
-    key="chk_pers_gas_ativo", on_change=atualizar_url_tarifario_personalizado_gas,
-    help=help_Personalizado_Gas
-)
-
-if personalizado_gas_ativo:
-    with st.container(border=True):
-        st.subheader("Tarifário Personalizado (Gás Natural)")
-        col_s1, col_s2 = st.columns(2)
-        with col_s1:
-            # O widget atualiza o session_state e o cálculo principal irá lê-lo.
-            st.number_input("Preço Energia (€/kWh)", key="pers_gas_energia", min_value=0.0, step=0.001, format="%g", on_change=atualizar_url_tarifario_personalizado_gas)
-        with col_s2:
-            st.number_input("Preço Termo Fixo (€/dia)", key="pers_gas_fixo", min_value=0.0, step=0.001, format="%g", on_change=atualizar_url_tarifario_personalizado_gas)
-
-        col_opt1, col_opt2 = st.columns(2)
-        with col_opt1:
-            st.checkbox("TAR incluída no Preço Energia?", value=True, key="pers_gas_tar_energia", on_change=atualizar_url_tarifario_personalizado_gas)
-        with col_opt2:
-            st.checkbox("TAR incluída no Preço Termo Fixo?", value=True, key="pers_gas_tar_potencia", on_change=atualizar_url_tarifario_personalizado_gas)
-
-# --- FIM DO BLOCO PERSONALIZADO ---
-
-# --- Helper Function ---
-def get_filter_options_for_multiselect_gas(dataframe_gas, column_name):
-    """Obtém opções únicas de filtro a partir da aba mestre de gás."""
-    if column_name not in dataframe_gas.columns:
-        return []
-    options = dataframe_gas[column_name].dropna().unique()
-    return sorted([opt for opt in options if opt and str(opt).lower() != 'pessoal'])
-
-st.markdown("---") # Separador
-st.subheader("🔍 Filtros da Tabela de Resultados")
-
-# --- UI DE FILTROS ---
-col_titulo_resultados, col_btn_limpar = st.columns([3,1]) # Ajustar a proporção conforme necessário
-
-# --- Botão Limpar Filtros ---
-with col_btn_limpar:
-    st.write("") # Truque para alinhar verticalmente o botão (adiciona espaço no topo)
-    st.write("")
-    if st.button("🧹 Remover Todos os Filtros", key="btn_remover_filtros_gas", use_container_width=True, help="Remover Todos os Filtros"):
-        # Keys de SelectBox (reset para índice 0)
-        st.session_state.filter_segmento_gas_idx = 0  # Default "Residencial"
-        st.session_state.filter_faturacao_gas_idx = 0 # Default "Todas"
-        st.session_state.filter_pagamento_gas_idx = 0 # Default "Todos"
-        # Key de MultiSelect (reset para lista vazia)
-        st.session_state.filter_tipos_gas_multi = []
-        st.rerun()
-
-# Colocamos os 4 filtros e o botão de limpar, todos juntos.
-filt_col1, filt_col2, filt_col3, filt_col4 = st.columns(4)
-
-# --- Filtro de Segmento ---
-with filt_col1:
-    # 1. Definir a lista de opções
-    opcoes_filtro_segmento_user = ["Residencial", "Empresarial", "Ambos"] 
-    
-    # 2. Encontrar o índice da opção default ("Residencial")
-    default_index_segmento = opcoes_filtro_segmento_user.index("Residencial") # Isto será 0
-    
-    selected_segmento_user = st.selectbox(
-        "Segmento", 
-        opcoes_filtro_segmento_user, 
-        index=st.session_state.get("filter_segmento_gas_idx", default_index_segmento), # Usa o índice de "Residencial"
-        key="filter_segmento_gas_selectbox",
-        help="Escolha o segmento para a simulação."
-    )
-    st.session_state.filter_segmento_gas_idx = opcoes_filtro_segmento_user.index(selected_segmento_user)
-
-# --- Filtro de Tipo ---
-with filt_col2:
-    tipos_options_ms = get_filter_options_for_multiselect_gas(tarifas_gas_master, 'tipo') 
-    
-    help_text_formatado_gas = """
-    Deixe em branco para mostrar todos os tipos.
-    * **Fixo**: Preço de energia constante.
-    * **Indexado**: Preço da energia baseado na média do MIBGAS para o período.
-    """
-    selected_tipos = st.multiselect("Tipo(s) de Tarifário", tipos_options_ms,
-                                  default=st.session_state.get("filter_tipos_gas_multi", []),
-                                  key="filter_tipos_gas_multi",
-                                  help=help_text_formatado_gas)
-
-# --- Filtro de Faturação ---
-with filt_col3:
-    opcoes_faturacao_user = ["Todas", "Fatura eletrónica", "Fatura em papel"]
-    selected_faturacao_user = st.selectbox(
-        "Faturação",
-        opcoes_faturacao_user,
-        index=st.session_state.get("filter_faturacao_gas_idx", 0), # Default "Todas"
-        key="filter_faturacao_gas_selectbox",
-        help="Escolha o tipo de faturação pretendido."
-    )
-    st.session_state.filter_faturacao_gas_idx = opcoes_faturacao_user.index(selected_faturacao_user)
-
-# --- Filtro de Pagamento ---
-with filt_col4:
-    opcoes_pagamento_user = ["Todos", "Débito Direto", "Multibanco", "Numerário/Payshop/CTT"]
-    selected_pagamento_user = st.selectbox(
-        "Pagamento",
-        opcoes_pagamento_user,
-        index=st.session_state.get("filter_pagamento_gas_idx", 0), # Default "Todos"
-        key="filter_pagamento_gas_selectbox",
-        help="Escolha o método de pagamento."
-    )
-    st.session_state.filter_pagamento_gas_idx = opcoes_pagamento_user.index(selected_pagamento_user)
-# --- FIM: UI DE FILTRO ---
-
-
-# --- INÍCIO: LÓGICA DE FILTRAGEM PANDAS (PRÉ-CÁLCULO) ---
-
-# --- Obter o Link do CUR para o Município selecionado ---
-link_cur_municipio = ""
-if not linha_tos_cur.empty and 'site_adesao' in linha_tos_cur.columns:
-    link_cur_municipio = linha_tos_cur.iloc[0].get('site_adesao', '-')
-    if pd.isna(link_cur_municipio):
-        link_cur_municipio = "-"
-
-with st.spinner("A filtrar e preparar dados..."):
-    # 1. Limpeza de Tipos de Dados
-    try:
-        tarifas_gas_master['Escalão'] = pd.to_numeric(tarifas_gas_master['escalao'], errors='coerce').fillna(0).astype(int)
-        tarifas_gas_master['Disponibilidade'] = tarifas_gas_master['disponibilidade'].str.strip().str.lower()
-        cols_texto_filtro = ['segmento', 'tipo', 'faturacao', 'pagamento']
-        for col in cols_texto_filtro:
-            if col in tarifas_gas_master.columns:
-                tarifas_gas_master[col] = tarifas_gas_master[col].astype(str).str.strip()
-            
-    except Exception as e:
-        st.error(f"Erro ao tentar limpar os tipos de dados das tarifas de gás: {e}.")
-        st.stop()
-
-    # 2. Filtro PRIMÁRIO (Standalone e Escalão)
-    df_gas_processar = tarifas_gas_master[
-        (tarifas_gas_master['escalao'] == escalao_num) &
-        ( (tarifas_gas_master['disponibilidade'] == 'g_so') | (tarifas_gas_master['disponibilidade'] == 'ambos') )
-    ].copy()
-
-    if df_gas_processar.empty and not meu_tarifario_gas_ativo:
-         st.error(f"Não foram encontrados tarifários de gás standalone ('g_so' ou 'ambos') para o Escalão {escalao_num} na sua base de dados (antes dos filtros de tabela). Verifique os dados no Excel.")
-         st.stop()
-
-    # 3. Aplicar Filtros da UI
-    df_a_filtrar = df_gas_processar.copy()
-
-    # 3.1. Lógica para o filtro de Segmento
-    if selected_segmento_user != "Ambos":
-        segmentos_para_filtrar = []
-        if selected_segmento_user == "Residencial":
-            segmentos_para_filtrar.extend(["Doméstico", "Doméstico e Não Doméstico"]) 
-        elif selected_segmento_user == "Empresarial":
-            segmentos_para_filtrar.extend(["Não Doméstico", "Doméstico e Não Doméstico"])
-        
-        if 'segmento' in df_a_filtrar.columns:
-            df_a_filtrar = df_a_filtrar[df_a_filtrar['segmento'].isin(segmentos_para_filtrar)]
-        else:
-            st.warning("Filtro 'Segmento' não aplicado: Coluna 'segmento' não encontrada na aba 'Tarifas_Gas_Master'.")
-
-    # 3.2. Lógica para o filtro de Tipo (Multiselect)
-    if selected_tipos: # Aplicar apenas se a lista NÃO estiver vazia
-        if 'tipo' in df_a_filtrar.columns:
-             df_a_filtrar = df_a_filtrar[df_a_filtrar['tipo'].isin(selected_tipos)]
-        else:
-             st.warning("Filtro 'Tipo' não aplicado: Coluna 'tipo' (minúscula) não encontrada.")
-
-    # 3.3. Lógica para o filtro de Faturação
-    if selected_faturacao_user != "Todas":
-        faturacao_para_filtrar = []
-        if selected_faturacao_user == "Fatura eletrónica":
-            faturacao_para_filtrar.extend(["Fatura eletrónica", "Fatura eletrónica, Fatura em papel"])
-        elif selected_faturacao_user == "Fatura em papel":
-             faturacao_para_filtrar.extend(["Fatura eletrónica, Fatura em papel", "Fatura em papel"]) 
-        
-        if 'faturacao' in df_a_filtrar.columns:
-            df_a_filtrar = df_a_filtrar[df_a_filtrar['faturacao'].isin(faturacao_para_filtrar)]
-        else:
-            st.warning("Filtro 'Faturação' não aplicado: Coluna 'faturacao' não encontrada.")
-
-    # 3.4. Lógica para o filtro de Pagamento
-    if selected_pagamento_user != "Todos":
-        pagamento_para_filtrar = []
-        if selected_pagamento_user == "Débito Direto":
-            pagamento_para_filtrar.extend(["Débito Direto", "Débito Direto, Multibanco", "Débito Direto, Multibanco, Numerário/Payshop/CTT"])
-        elif selected_pagamento_user == "Multibanco":
-            pagamento_para_filtrar.extend(["Multibanco", "Débito Direto, Multibanco", "Débito Direto, Multibanco, Numerário/Payshop/CTT"])
-        elif selected_pagamento_user == "Numerário/Payshop/CTT":
-            pagamento_para_filtrar.extend(["Numerário/Payshop/CTT", "Débito Direto, Multibanco, Numerário/Payshop/CTT"])
-        
-        if 'pagamento' in df_a_filtrar.columns:
-            df_a_filtrar = df_a_filtrar[df_a_filtrar['pagamento'].isin(pagamento_para_filtrar)]
-        else:
-            st.warning("Filtro 'Pagamento' não aplicado: Coluna 'pagamento' não encontrada.")
-
-# --- FIM DA LÓGICA DE FILTRAGEM PANDAS ---
-
-# --- INÍCIO DO CÁLCULO (Sobre o DF filtrado: df_a_filtrar) ---
-with st.spinner(f"A calcular custos para os {len(df_a_filtrar)} tarifários de gás filtrados..."):
-    
-    resultados_list_gas = []
-    
-    # --- Definir se é um mês de faturação completo (para taxas fixas mensais) ---
-    is_billing_month = 28 <= dias <= 31
-
-    # Iterar e Calcular sobre o DataFrame JÁ FILTRADO
-    for _, linha_tarifa in df_a_filtrar.iterrows():
-        resultado_calculo = calc.calcular_custo_gas_completo(
-            linha_tarifa,
-            consumo_kwh, 
-            dias,                      
-            escalao_num,
-            tarifa_social_gas,
-            CONSTANTES,
-            tos_fixo_dia_selecionado,
-            tos_variavel_kwh_selecionado,
-            mibgas_input_mwh,
-            isp_gas_manual_input,
-            acp_gas,
-            desconto_continente_gas,
-            VALOR_QUOTA_ACP_MENSAL
-        )
-        
-        if resultado_calculo:
-            # --- LÓGICA DE LINK DINÂMICO ---
-            nome_tarifa_atual = str(resultado_calculo.get('NomeParaExibir', '')).lower()
-            
-            if "tarifa regulada" in nome_tarifa_atual and link_cur_municipio:
-                # Se for tarifa regulada, usa o link do CUR do município
-                resultado_calculo['LinkAdesao'] = link_cur_municipio
-            else:
-                # Caso contrário, usa o link (se existir) da aba Tarifas_Gas_Master
-                resultado_calculo['LinkAdesao'] = linha_tarifa.get('site_adesao', '-')
-
-            resultado_calculo['info_notas'] = linha_tarifa.get('notas', '')
-            resultados_list_gas.append(resultado_calculo)
-
-    # Calcular "O Meu Tarifário" (é calculado SEPARADAMENTE)
-    if meu_tarifario_gas_ativo:
-        resultado_meu_gas = calc.calcular_custo_meu_tarifario_gas(
-            st.session_state,
-            consumo_kwh,
-            dias,
-            escalao_num,
-            tarifa_social_gas,
-            CONSTANTES,
-            tos_fixo_dia_selecionado,
-            tos_variavel_kwh_selecionado,
-            isp_gas_manual_input
-        )
-        if resultado_meu_gas:
-            resultados_list_gas.append(resultado_meu_gas) # Adicionado à lista de resultados
-
-    # --- CÁLCULO DO TARIFÁRIO PERSONALIZADO ---
-    if personalizado_gas_ativo: # 'personalizado_gas_ativo' é o estado do checkbox
-        
-        # Criar o dicionário de inputs diretamente a partir das keys dos widgets (definidas no bloco UI)
-        inputs_personalizado_gas = {
-            'pers_gas_energia': st.session_state.get('pers_gas_energia', 0.0),
-            'pers_gas_fixo': st.session_state.get('pers_gas_fixo', 0.0),
-            'pers_gas_tar_energia': st.session_state.get('pers_gas_tar_energia', True),
-            'pers_gas_tar_fixo': st.session_state.get('pers_gas_tar_potencia', True)
-        }
-
-        # Só calcular se houver algum preço definido
-        if (float(inputs_personalizado_gas.get('pers_gas_energia', 0.0) or 0.0) > 0 or float(inputs_personalizado_gas.get('pers_gas_fixo', 0.0) or 0.0) > 0):
-            
-            resultado_personalizado_gas = calc.calcular_custo_personalizado_gas(
-                inputs_personalizado_gas,
-                consumo_kwh,
-                dias,
-                escalao_num,
-                tarifa_social_gas,
-                CONSTANTES,
-                tos_fixo_dia_selecionado,
-                tos_variavel_kwh_selecionado,
-                isp_gas_manual_input
-            )
-            if resultado_personalizado_gas:
-                resultados_list_gas.append(resultado_personalizado_gas)
-
-
-    if not resultados_list_gas:
-        st.warning("Nenhum tarifário corresponde aos filtros selecionados ou nenhum custo pôde ser calculado. Por favor, ajuste os filtros ou clique em 'Limpar'.")
-        st.stop()
-    
-    st.markdown("---")
-
-    # --- CONSTRUIR RESUMO DA SIMULAÇÃO ---
-    cor_texto_resumo = "#333333" 
-    resumo_html_parts = [
-        f"<div style='background-color: #f9f9f9; border: 1px solid #ddd; padding: 15px; border-radius: 6px; margin-bottom: 25px; color: {cor_texto_resumo};'>"
-    ]
-    resumo_html_parts.append(f"<h5 style='margin-top:0; color: {cor_texto_resumo};'>Resumo da Simulação (Gás Natural):</h5>")
-    resumo_html_parts.append("<ul style='list-style-type: none; padding-left: 0;'>")
-
-    # Linha de Filtros
-    linha_filtros = (
-        f"<b>Segmento:</b> {selected_segmento_user} &nbsp;&nbsp;|&nbsp;&nbsp; "
-        f"<b>Faturação:</b> {selected_faturacao_user} &nbsp;&nbsp;|&nbsp;&nbsp; "
-        f"<b>Pagamento:</b> {selected_pagamento_user}"
-    )
-    resumo_html_parts.append(f"<li style='margin-bottom: 5px;'>{linha_filtros}</li>")
-    
-    # Linha Escalão e Município
-    linha_escalao_municipio = f"<b>{escalao_selecionado_str}</b> | <b>Município:</b> {municipio_selecionado}"
-    resumo_html_parts.append(f"<li style='margin-bottom: 5px;'>{linha_escalao_municipio}</li>")
-
-    # Linha de Consumo
-    resumo_html_parts.append(f"<li style='margin-bottom: 5px;'><b>Consumo Total: {consumo_kwh:.0f} kWh</b></li>")
-
-    # Linha Datas e Dias
-    usou_dias_manuais = False
-    if pd.notna(dias_manual_input_val) and dias_manual_input_val > 0 and int(dias_manual_input_val) != dias_default_calculado:
-        usou_dias_manuais = True
-    
-    if usou_dias_manuais:
-        resumo_html_parts.append(f"<li style='margin-bottom: 5px;'><b>Período:</b> {dias} dias (definido manualmente)</li>")
-    else:
-        resumo_html_parts.append(f"<li style='margin-bottom: 5px;'><b>Período:</b> De {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')} ({dias} dias)</li>")
-
-    # Linha MIBGAS
-    resumo_html_parts.append(f"<li style='margin-bottom: 5px;'><b>MIBGAS:</b> {mibgas_input_mwh:.2f} €/MWh</li>")
-
-    # Linha Tarifa Social
-    if tarifa_social_gas:
-        resumo_html_parts.append(f"<li style='margin-bottom: 5px; color: red;'><b>Benefício Aplicado:</b> Tarifa Social (Gás)</li>")
-
-    resumo_html_parts.append("</ul></div>")
-    html_resumo_final = "".join(resumo_html_parts)
-    st.markdown(html_resumo_final, unsafe_allow_html=True)
-
-    # --- TÍTULO DOS RESULTADOS ---
-    # --- Processamento final e exibição da tabela de resultados ---
-    st.subheader("💰 Tiago Felícia - Tarifários de Gás Natural")
-
-    vista_simplificada = st.checkbox(
-        "📱 Ativar vista simplificada (ideal em ecrãs menores)",
-        value=True,
-        key="chk_vista_simplificada_gas"
-    )
-
-    st.write("**Total** com todos os componentes, taxas e impostos e **valores unitários** de **Energia e Fixo** sem IVA.")
-    st.write("**O nome do tarifário tem link para mais informações/adesão sobre o mesmo.**")
-
-    st.markdown("➡️ [**Exportar Tabela para Excel**](#exportar-excel-detalhada-gas)")
-
-    df_resultados_gas_final = pd.DataFrame(resultados_list_gas)
-    
-        # --- BLOCO PARA EXIBIR POUPANÇA ---
-    try:
-        # Inicializar/resetar variáveis do session_state (com keys específicas para gás)
-        st.session_state.poupanca_excel_texto_gas = ""
-        st.session_state.poupanca_excel_cor_gas = "000000"  # Preto
-        st.session_state.poupanca_excel_negrito_gas = False
-
-        if meu_tarifario_gas_ativo and not df_resultados_gas_final.empty:
-            meu_tarifario_linha = df_resultados_gas_final[df_resultados_gas_final['NomeParaExibir'].str.contains("O Meu Tarifário", case=False, na=False)]
-
-            if not meu_tarifario_linha.empty:
-                custo_meu_tarifario = meu_tarifario_linha['Total Período (€)'].iloc[0]
-                nome_meu_tarifario_ui = meu_tarifario_linha['NomeParaExibir'].iloc[0]
-
-                if pd.notna(custo_meu_tarifario):
-                    outros_tarifarios_ui_df = df_resultados_gas_final[
-                        (df_resultados_gas_final['tipo'] != 'Pessoal')
-                    ]
-                    
-                    nome_coluna_total = 'Total Período (€)'
-                    
-                    custos_outros_validos_ui = outros_tarifarios_ui_df[nome_coluna_total].dropna()
-
-                    mensagem_poupanca_html_ui = "" 
-
-                    if not custos_outros_validos_ui.empty:
-                        custo_minimo_outros_ui = custos_outros_validos_ui.min()
-                        linha_mais_barata_outros_ui = outros_tarifarios_ui_df.loc[outros_tarifarios_ui_df[nome_coluna_total] == custo_minimo_outros_ui].iloc[0]
-                        nome_tarifario_mais_barato_outros_ui = linha_mais_barata_outros_ui['NomeParaExibir']
-
-                        if custo_meu_tarifario > custo_minimo_outros_ui:
-                            poupanca_abs_ui = custo_meu_tarifario - custo_minimo_outros_ui
-                            poupanca_rel_ui = (poupanca_abs_ui / custo_meu_tarifario) * 100 if custo_meu_tarifario != 0 else 0
-                            
-                            mensagem_poupanca_html_ui = (
-                                f"<span style='color:red; font-weight:bold;'>Poupança entre '{nome_meu_tarifario_ui}' ({custo_meu_tarifario:.2f} €) e o mais económico da lista, "
-                                f"'{nome_tarifario_mais_barato_outros_ui}' ({custo_minimo_outros_ui:.2f} €): </span>"
-                                f"<span style='color:red; font-weight:bold;'>{poupanca_abs_ui:.2f} €</span> "
-                                f"<span style='color:red; font-weight:bold;'>({poupanca_rel_ui:.2f} %).</span>"
-                            )
-                            # Guardar para Excel
-                            st.session_state.poupanca_excel_texto_gas = (
-                                f"Poupança entre '{nome_meu_tarifario_ui}' ({custo_meu_tarifario:.2f} €) e o mais económico da lista, "
-                                f"'{nome_tarifario_mais_barato_outros_ui}' ({custo_minimo_outros_ui:.2f} €): "
-                                f"{poupanca_abs_ui:.2f} € ({poupanca_rel_ui:.2f} %)."
-                            )
-                            st.session_state.poupanca_excel_cor_gas = "FF0000" # Vermelho
-                            st.session_state.poupanca_excel_negrito_gas = True
-                        
-                        elif custo_meu_tarifario <= custo_minimo_outros_ui:
-                            mensagem_poupanca_html_ui = f"<span style='color:green; font-weight:bold;'>Parabéns! O seu tarifário ('{nome_meu_tarifario_ui}' - {custo_meu_tarifario:.2f}€) já é o mais económico ou está entre os mais económicos da lista!</span>"
-                            st.session_state.poupanca_excel_texto_gas = f"Parabéns! O seu tarifário ('{nome_meu_tarifario_ui}' - {custo_meu_tarifario:.2f}€) já é o mais económico ou está entre os mais económicos da lista!"
-                            st.session_state.poupanca_excel_cor_gas = "008000" # Verde
-                            st.session_state.poupanca_excel_negrito_gas = True
-                    
-                    if mensagem_poupanca_html_ui:
-                        st.markdown(mensagem_poupanca_html_ui, unsafe_allow_html=True)
-
-    except Exception as e_poupanca: 
-        st.error(f"Erro ao processar a informação de poupança para UI (Gás): {e_poupanca}")
-        st.session_state.poupanca_excel_texto_gas = "Erro ao calcular a informação de poupança."
-    # --- FIM DO BLOCO DE POUPANÇA ---
-    
-    df_resultados_gas_final = df_resultados_gas_final.sort_values(by="Total Período (€)", ascending=True).reset_index(drop=True)
-
-    # --- Lógica de Colunas Visíveis ---
-    colunas_visiveis_presentes = []
-    
-    colunas_base_energia = ['Termo Energia (€/kWh)'] 
-    coluna_fixo_gas = 'Termo Fixo (€/dia)'
-    
-    if vista_simplificada:
-        colunas_base_visivel = ['NomeParaExibir', 'Total Período (€)']
-        colunas_visiveis_presentes = colunas_base_visivel + colunas_base_energia
-        if coluna_fixo_gas in df_resultados_gas_final.columns:
-            colunas_visiveis_presentes.append(coluna_fixo_gas)
-    else:
-        colunas_base_visivel = ['NomeParaExibir', 'Total Período (€)']
-        colunas_visiveis_presentes = colunas_base_visivel + colunas_base_energia
-        if coluna_fixo_gas in df_resultados_gas_final.columns:
-            colunas_visiveis_presentes.append(coluna_fixo_gas)
-        colunas_visiveis_presentes.extend(['tipo', 'Comercializador', 'Segmento', 'Faturação', 'Pagamento'])
-
-    colunas_visiveis_presentes = [col for col in colunas_visiveis_presentes if col in df_resultados_gas_final.columns]
-
-    # --- Colunas Essenciais para JS (Tooltips e Estilos) ---
-    colunas_dados_tooltip = [
-        'tooltip_fixo_comerc_sem_tar', 'tooltip_fixo_tar_bruta', 'tooltip_fixo_ts_aplicada_flag', 'tooltip_fixo_ts_desconto_valor',
-        'tooltip_energia_comerc_sem_tar', 'tooltip_energia_tar_bruta', 'tooltip_energia_ts_aplicada_flag', 'tooltip_energia_ts_desconto_valor',
-        'tt_cte_energia_siva', 'tt_cte_fixo_siva', 'tt_cte_isp_siva', 'tt_cte_tos_fixo_siva', 'tt_cte_tos_var_siva',
-        'tt_cte_total_siva', 'tt_cte_valor_iva_6_total', 'tt_cte_valor_iva_23_total',
-        'tt_cte_subtotal_civa', 'tt_cte_desc_finais_valor', 'tt_cte_acres_finais_valor'
-    ]
-    colunas_essenciais_js = ['tipo', 'NomeParaExibir', 'LinkAdesao', 'info_notas'] 
-    colunas_para_aggrid_final = list(dict.fromkeys(colunas_visiveis_presentes + colunas_essenciais_js + colunas_dados_tooltip))
-    colunas_para_aggrid_final = [col for col in colunas_para_aggrid_final if col in df_resultados_gas_final.columns]
-
-    df_aggrid_display = df_resultados_gas_final[colunas_para_aggrid_final].copy()
-
-    gb = GridOptionsBuilder.from_dataframe(df_aggrid_display) 
-    
-    gb.configure_default_column(
-        sortable=True,
-        resizable=True,
-        editable=False,
-        wrapText=True,
-        autoHeight=True,
-        wrapHeaderText=True,
-        autoHeaderHeight=True,
-        headerClass="center-header"
-    )
-
-    # --- 1. DEFINIÇÕES JAVASCRIPT AVANÇADAS ---
-    
-    # Calcular Mín/Máx por Coluna
-    cols_para_cor_gas = ['Total Período (€)', 'Termo Energia (€/kWh)', 'Termo Fixo (€/dia)']
-    min_max_data_for_js = {}
-    for col_name in cols_para_cor_gas:
-        if col_name in df_aggrid_display:
-            series = pd.to_numeric(df_aggrid_display[col_name], errors='coerce').dropna()
-            if not series.empty:
-                min_max_data_for_js[col_name] = {'min': series.min(), 'max': series.max()}
-            else:
-                min_max_data_for_js[col_name] = {'min': 0, 'max': 0}
-    min_max_data_json_string = json.dumps(min_max_data_for_js)
-
-
-    # Componente de Tooltip Personalizado
-    custom_tooltip_component_js = JsCode("""
-        class CustomTooltip { /* ...... */ 
-            init(params) {
-                this.eGui = document.createElement('div');
-                this.eGui.innerHTML = params.value; 
-                this.eGui.style.backgroundColor = 'white'; this.eGui.style.color = 'black';
-                this.eGui.style.border = '1px solid #ccc'; this.eGui.style.padding = '10px';
-                this.eGui.style.borderRadius = '6px'; this.eGui.style.boxShadow = '0 2px 5px rgba(0,0,0,0.15)';
-                this.eGui.style.maxWidth = '400px'; this.eGui.style.fontSize = '1.1em';
-                this.eGui.style.fontFamily = 'Arial, sans-serif'; this.eGui.style.whiteSpace = 'normal';
-            }
-            getGui() { return this.eGui; }
-        }
-    """)
-
-    # Estilos de Célula para Nomes de Tarifário
-    cor_fundo_indexado_gas_css = "#FFE699" 
-    cor_texto_indexado_gas_css = "black"
-    cor_fundo_fixo_gas_css = "#f0f0f0"     
-    cor_texto_fixo_gas_css = "#333333"
-    cor_fundo_personalizado_gas_css = "#92D050"
-    cor_texto_personalizado_gas_css = "white"
-
-    cell_style_nome_tarifario_js = JsCode(f"""
-    function(params) {{
-        let styleToApply = {{ textAlign: 'center', borderRadius: '6px', padding: '10px 10px' }};                                  
-        if (params.data) {{
-            const tipoTarifario = params.data.tipo; 
-            const nomeTarifario = params.data.NomeParaExibir;
-
-            if (tipoTarifario === 'Pessoal' && nomeTarifario && nomeTarifario.startsWith('O Meu Tarifário')) {{
-                styleToApply.backgroundColor = 'red';
-                styleToApply.color = 'white';
-                styleToApply.fontWeight = 'bold';
-            }} else if (tipoTarifario === 'Pessoal') {{ 
-                /* Isto apanha o "Tarifário Personalizado" que também usa tipo 'Pessoal' */
-                styleToApply.backgroundColor = '{cor_fundo_personalizado_gas_css}';
-                styleToApply.color = '{cor_texto_personalizado_gas_css}';
-                styleToApply.fontWeight = 'bold';
-            }} else if (tipoTarifario === 'Indexado') {{
-                styleToApply.backgroundColor = '{cor_fundo_indexado_gas_css}';
-                styleToApply.color = '{cor_texto_indexado_gas_css}';                
-            }} else if (tipoTarifario === 'Fixo') {{
-                styleToApply.backgroundColor = '{cor_fundo_fixo_gas_css}';
-                styleToApply.color = '{cor_texto_fixo_gas_css}';
-            }}
-            return styleToApply;
-        }}
-        return styleToApply; 
-    }}
-    """)
-
-    # Tooltips JS para Termo Fixo e Energia
-    tooltip_termo_fixo_gas_js = JsCode("""
-    function(params) {
-        if (!params.data) { return String(params.value); }
-        const comercializador = parseFloat(params.data.tooltip_fixo_comerc_sem_tar || 0);
-        const tarBruta = parseFloat(params.data.tooltip_fixo_tar_bruta || 0);
-        const tsAplicada = params.data.tooltip_fixo_ts_aplicada_flag;
-        const descontoTSValor = parseFloat(params.data.tooltip_fixo_ts_desconto_valor || 0);
-        const formatPrice = (num) => (typeof num === 'number' && !isNaN(num)) ? num.toFixed(4) : 'N/A';
-        let tooltipParts = ["<b>Decomposição Termo Fixo (s/IVA):</b>"];
-        tooltipParts.push("Comercializador (s/TAR): " + formatPrice(comercializador) + " €/dia");
-        tooltipParts.push("TAR (Tarifa Acesso Redes): " + formatPrice(tarBruta) + " €/dia");
-        if (tsAplicada === true && descontoTSValor > 0) {
-            tooltipParts.push("Desconto Tarifa Social: -" + formatPrice(descontoTSValor) + " €/dia");
-        }
-        tooltipParts.push("----------------------------------------------------");
-        tooltipParts.push("<b>Custo Final : " + formatPrice(parseFloat(params.value)) + " €/dia</b>");
-        return tooltipParts.join("<br>");
-    }""")
-    tooltip_termo_energia_gas_js = JsCode("""
-    function(params) {
-        if (!params.data) { return String(params.value); }
-        const comercializador = parseFloat(params.data.tooltip_energia_comerc_sem_tar || 0);
-        const tarBruta = parseFloat(params.data.tooltip_energia_tar_bruta || 0);
-        const tsAplicada = params.data.tooltip_energia_ts_aplicada_flag;
-        const descontoTSValor = parseFloat(params.data.tooltip_energia_ts_desconto_valor || 0);
-        const formatPrice = (num) => (typeof num === 'number' && !isNaN(num)) ? num.toFixed(4) : 'N/A';
-        let tooltipParts = ["<b>Decomposição Energia (s/IVA):</b>"];
-        tooltipParts.push("Comercializador (s/TAR): " + formatPrice(comercializador) + " €/kWh");
-        tooltipParts.push("TAR (Tarifa Acesso Redes): " + formatPrice(tarBruta) + " €/kWh");
-        if (tsAplicada === true && descontoTSValor > 0) {
-            tooltipParts.push("Desconto Tarifa Social: -" + formatPrice(descontoTSValor) + " €/kWh");
-        }
-        tooltipParts.push("----------------------------------------------------");
-        tooltipParts.push("<b>Custo Final : " + formatPrice(parseFloat(params.value)) + " €/kWh</b>");
-        return tooltipParts.join("<br>");
-    }""")
-    tooltip_custo_total_gas_js = JsCode("""
-    function(params) {
-        if (!params.data) { return String(params.value); }
-        const formatCurrency = (num) => (typeof num === 'number' && !isNaN(num)) ? num.toFixed(2) : 'N/A';
-        const nomeTarifario = params.data.NomeParaExibir || "Tarifário";
-        let tooltipParts = [ "<i>" + nomeTarifario + "</i>", "<b>Decomposição Custo Total:</b>", "------------------------------------" ];
-        const energia_siva = parseFloat(params.data.tt_cte_energia_siva || 0);
-        const fixo_siva = parseFloat(params.data.tt_cte_fixo_siva || 0);
-        const isp_siva = parseFloat(params.data.tt_cte_isp_siva || 0);
-        const tos_fixo_siva = parseFloat(params.data.tt_cte_tos_fixo_siva || 0);
-        const tos_var_siva = parseFloat(params.data.tt_cte_tos_var_siva || 0);
-        const total_siva = parseFloat(params.data.tt_cte_total_siva || 0);
-        const iva_6 = parseFloat(params.data.tt_cte_valor_iva_6_total || 0);
-        const iva_23 = parseFloat(params.data.tt_cte_valor_iva_23_total || 0);
-        const subtotal_civa = parseFloat(params.data.tt_cte_subtotal_civa || 0);
-        const desc_finais = parseFloat(params.data.tt_cte_desc_finais_valor || 0);
-        const acres_finais = parseFloat(params.data.tt_cte_acres_finais_valor || 0);
-        tooltipParts.push("Total Energia s/IVA: " + formatCurrency(energia_siva) + " €");
-        tooltipParts.push("Total Termo Fixo s/IVA: " + formatCurrency(fixo_siva) + " €");
-        if (isp_siva !== 0) { tooltipParts.push("ISP s/IVA: " + formatCurrency(isp_siva) + " €"); }
-        if (tos_fixo_siva !== 0 || tos_var_siva !== 0) { tooltipParts.push("Taxa Ocup. Subsolo (TOS): " + formatCurrency(tos_fixo_siva + tos_var_siva) + " €"); }
-        tooltipParts.push("<b>Subtotal s/IVA: " + formatCurrency(total_siva) + " €</b>");
-        tooltipParts.push("------------------------------------");
-        if (iva_6 !== 0) { tooltipParts.push("Valor IVA (6%): " + formatCurrency(iva_6) + " €"); }
-        if (iva_23 !== 0) { tooltipParts.push("Valor IVA (23%): " + formatCurrency(iva_23) + " €"); }
-        tooltipParts.push("<b>Subtotal c/IVA: " + formatCurrency(subtotal_civa) + " €</b>");
-        if (desc_finais !== 0 || acres_finais !== 0) {
-            tooltipParts.push("------------------------------------");
-            if (desc_finais !== 0) { tooltipParts.push("Outros Descontos: -" + formatCurrency(desc_finais) + " €"); }
-            if (acres_finais !== 0) { tooltipParts.push("Outros Acréscimos: +" + formatCurrency(acres_finais) + " €"); }
-            tooltipParts.push("------------------------------------");
-        }
-        tooltipParts.push("<b>Custo Total c/IVA: " + formatCurrency(parseFloat(params.value)) + " €</b>");
-        return tooltipParts.join("<br>");
-    }""")
-
-    # Renderizador de Link/Notas
-    link_tooltip_renderer_js = JsCode("""
-        class LinkTooltipRenderer {
-            init(params) {
-                this.eGui = document.createElement('div');
-                let displayText = params.value; 
-                let url = params.data.LinkAdesao; 
-                if (url && typeof url === 'string' && url.toLowerCase().startsWith('http')) {
-                    this.eGui.innerHTML = `<a href="${url}" target="_blank" title="Aderir/Saber mais: ${url}" style="text-decoration: underline; color: inherit;">${displayText}</a>`;
-                } else {
-                    this.eGui.innerHTML = `<span title="${displayText}">${displayText}</span>`;
-                }
-            }
-            getGui() { return this.eGui; }
-        }
-    """)
-    
-    # Getter de Tooltip de Notas
-    tooltip_nome_tarifario_getter_js = JsCode("""
-        function(params) {
-            if (!params.data) { return params.value || ''; }
-            const nomeExibir = params.data.NomeParaExibir || '';
-            const notas = params.data.info_notas || ''; 
-            let tooltipHtmlParts = [];
-            if (nomeExibir) {
-                tooltipHtmlParts.push("<strong>" + nomeExibir + "</strong>");
-            }
-            if (notas) {
-                const notasHtml = notas.replace(/\\n/g, ' ').replace(/\n/g, ' ');
-                tooltipHtmlParts.push("<small style='display: block; margin-top: 5px;'><i>" + notasHtml + "</i></small>");
-            }
-            if (tooltipHtmlParts.length > 0) {
-                return tooltipHtmlParts.join('<br>');
-            }
-            return ''; 
-        }
-    """)
-
-    # Gradiente de Cor Genérico
-    cell_style_gradiente_custo_js = JsCode(f"""
-    function(params) {{
-        const colName = params.colDef.field;
-        const value = parseFloat(params.value);
-        const minMaxConfig = {min_max_data_json_string}; 
-        
-        let style = {{ textAlign: 'center', borderRadius: '6px', padding: '10px 10px' }}; 
-
-        if (isNaN(value) || !minMaxConfig[colName]) {{ return style; }}
-        const min_val = minMaxConfig[colName].min;
-        const max_val = minMaxConfig[colName].max;
-        if (max_val === min_val) {{ style.backgroundColor = 'lightgrey'; return style; }}
-        
-        const normalized_value = Math.max(0, Math.min(1, (value - min_val) / (max_val - min_val)));
-        const cL={{r:99,g:190,b:123}},cM={{r:255,g:255,b:255}},cH={{r:248,g:105,b:107}}; 
-        let r, g, b;
-        if (normalized_value < 0.5) {{
-            const t = normalized_value / 0.5; 
-            r = Math.round(cL.r * (1 - t) + cM.r * t); g = Math.round(cL.g * (1 - t) + cM.g * t); b = Math.round(cL.b * (1 - t) + cM.b * t);
-        }} else {{
-            const t = (normalized_value - 0.5) / 0.5;
-            r = Math.round(cM.r * (1 - t) + cH.r * t); g = Math.round(cM.g * (1 - t) + cH.g * t); b = Math.round(cM.b * (1 - t) + cH.b * t);
-        }}
-        style.backgroundColor = `rgb(${{r}},${{g}},${{b}})`;
-        if ((r * 0.299 + g * 0.587 + b * 0.114) < 140) {{ 
-            style.color = 'white';
-        }} else {{
-            style.color = 'black';
-        }}
-        return style;
-    }}
-    """)
-    
-    # --- Estilo de Linha para aplicar negrito ---
-    get_row_style_js = JsCode("""
-    function(params) {
-        if (params.data && params.data.tipo === 'Pessoal') {
-            // Aplica negrito a toda a linha se o 'tipo' for 'Pessoal'
-            // (Isto apanha tanto 'O Meu Tarifário' como 'Tarifário Personalizado')
-            return { 'fontWeight': 'bold' };
-        }
-        return null; // Sem estilo de linha para Fixo ou Indexado
-    }
-    """)
-
-
-    # --- 2. CONFIGURAÇÃO DAS COLUNAS ---
-
-    formatter_eur_5dec = JsCode("function(params) { if(params.value == null) return ''; return Number(params.value).toFixed(5); }") 
-    formatter_eur_2dec = JsCode("function(params) { if(params.value == null) return ''; return '€ ' + Number(params.value).toFixed(2); }")
-
-    is_visible_comerc = 'Comercializador' in colunas_visiveis_presentes 
-    gb.configure_column("Comercializador", headerName="Comercializador", minWidth=150, flex=1.5, 
-                        filter='agTextColumnFilter', cellStyle=cell_style_nome_tarifario_js,
-                        hide=(not is_visible_comerc)) 
-    
-    # Coluna 2: Tarifário (Usa Link/Tooltip E Estilo de Cor)
-    gb.configure_column("NomeParaExibir", headerName="Tarifário", minWidth=250, flex=2.5, filter='agTextColumnFilter', 
-                        cellStyle=cell_style_nome_tarifario_js,
-                        cellRenderer=link_tooltip_renderer_js,
-                        tooltipValueGetter=tooltip_nome_tarifario_getter_js,
-                        tooltipComponent=custom_tooltip_component_js)
-    
-    # Coluna 3: Total (Usa Gradiente (sem negrito) e Tooltip Total)
-    gb.configure_column("Total Período (€)", headerName=f"Total ({dias} dias) (€)", type=["numericColumn"], 
-                        valueFormatter=formatter_eur_2dec, 
-                        cellStyle=cell_style_gradiente_custo_js, 
-                        minWidth=130, flex=1,
-                        tooltipValueGetter=tooltip_custo_total_gas_js,
-                        tooltipComponent=custom_tooltip_component_js)
-
-    # Coluna 4: Energia (Usa Gradiente (sem negrito) e Tooltip Energia)
-    gb.configure_column("Termo Energia (€/kWh)", headerName="Energia (€/kWh)", type=["numericColumn"], 
-                        valueFormatter=formatter_eur_5dec, minWidth=120, flex=1, 
-                        cellStyle=cell_style_gradiente_custo_js, 
-                        tooltipValueGetter=tooltip_termo_energia_gas_js,
-                        tooltipComponent=custom_tooltip_component_js)
-                        
-    # Coluna 5: Fixo (Usa Gradiente (sem negrito) e Tooltip Fixo)
-    gb.configure_column("Termo Fixo (€/dia)", headerName="Fixo (€/dia)", type=["numericColumn"], 
-                        valueFormatter=formatter_eur_5dec, minWidth=120, flex=1, 
-                        cellStyle=cell_style_gradiente_custo_js, 
-                        tooltipValueGetter=tooltip_termo_fixo_gas_js,
-                        tooltipComponent=custom_tooltip_component_js)
-
-    # Colunas de Detalhe (com lógica hide)
-    set_filter_params = { 'buttons': ['apply', 'reset'], 'excelMode': 'mac', 'suppressMiniFilter': False, }
-    colunas_texto_detalhe = ['tipo', 'Segmento', 'Faturação', 'Pagamento']
-    for col_name in colunas_texto_detalhe:
-        if col_name in df_aggrid_display.columns:
-            is_visible = col_name in colunas_visiveis_presentes
-            header_name_display = 'Tipo' if col_name == 'tipo' else col_name 
-            
-            gb.configure_column(
-                col_name, headerName=header_name_display, minWidth=120, flex=0.75,
-                filter='agSetColumnFilter', filterParams=set_filter_params,
-                cellStyle={'textAlign': 'center', 'backgroundColor': '#f0f0f0'},
-                hide=(not is_visible) 
-            )
-
-    # Ocultar Colunas de Dados
-    colunas_para_ocultar_final = [
-        'LinkAdesao', 'info_notas', 
-        'tooltip_fixo_comerc_sem_tar', 'tooltip_fixo_tar_bruta', 'tooltip_fixo_ts_aplicada_flag', 'tooltip_fixo_ts_desconto_valor',
-        'tooltip_energia_comerc_sem_tar', 'tooltip_energia_tar_bruta', 'tooltip_energia_ts_aplicada_flag', 'tooltip_energia_ts_desconto_valor',
-        'tt_cte_energia_siva', 'tt_cte_fixo_siva', 'tt_cte_isp_siva', 'tt_cte_tos_fixo_siva', 'tt_cte_tos_var_siva',
-        'tt_cte_total_siva', 'tt_cte_valor_iva_6_total', 'tt_cte_valor_iva_23_total',
-        'tt_cte_subtotal_civa', 'tt_cte_desc_finais_valor', 'tt_cte_acres_finais_valor'
-    ]
-    for col_ocultar in colunas_para_ocultar_final:
-        if col_ocultar in df_aggrid_display.columns:
-             gb.configure_column(col_ocultar, hide=True)
-
-    gb.configure_grid_options(
-        domLayout='autoHeight', # Para altura automática
-        getRowStyle=get_row_style_js
-    )
-
-    gridOptions = gb.build()
-
-    # --- CSS para centrar cabeçalhos ---
-    custom_css = {
-        ".ag-header-cell": {
-            "display": "flex",
-            "flex-direction": "column",
-            "justify-content": "center !important",
-            "align-items": "center !important",
-            "text-align": "center !important"
-        },
-        ".ag-header-cell-label": {
-            "justify-content": "center !important",
-            "text-align": "center !important",
-            "font-size": "14px !important",
-            "font-weight": "bold !important"
-        },
-        ".ag-cell": {
-            "font-size": "14px !important"
-        },
-        ".ag-center-cols-clip": {"justify-content": "center !important", "text-align": "center !important"}
-    }
-
-    # --- 3. RENDERIZAR O AGGRID ---
-    grid_response = AgGrid(
-        df_aggrid_display, 
-        gridOptions=gridOptions,
-        custom_css=custom_css,
-        fit_columns_on_grid_load=True,
-        theme='alpine',
-        allow_unsafe_jscode=True,
-        key="aggrid_gas_standalone_v16_bold_fix",
-        enable_enterprise_modules=True,
-        tooltipShowDelay=200, 
-        tooltipMouseTrack=True,
-        update_mode=GridUpdateMode.FILTERING_CHANGED | GridUpdateMode.SORTING_CHANGED
-    )
-
-    # --- BLOCO DE EXPORTAÇÃO EXCEL ---
-    st.markdown("<a id='exportar-excel-detalhada-gas'></a>", unsafe_allow_html=True)
-    st.markdown("---")
-    with st.expander("📥 Exportar Tabela Detalhada para Excel"):
-
-        opcoes_export_excel_gas = []
-        default_cols_excel_gas = []
-
-        if 'colunas_visiveis_presentes' in locals() and isinstance(colunas_visiveis_presentes, list):
-            opcoes_export_excel_gas.extend(colunas_visiveis_presentes)
-            default_cols_excel_gas = list(colunas_visiveis_presentes)
-
-        colunas_tooltip_dados_para_export = colunas_para_ocultar_final 
-        for col_tooltip in colunas_tooltip_dados_para_export:
-            if col_tooltip in df_aggrid_display.columns and col_tooltip not in opcoes_export_excel_gas:
-                opcoes_export_excel_gas.append(col_tooltip)
-
-        colunas_para_exportar_excel_selecionadas = st.multiselect(
-            "Selecione as colunas para exportar para Excel (Gás):",
-            options=opcoes_export_excel_gas, 
-            default=default_cols_excel_gas,
-            key="cols_export_excel_selector_gas"
-        )
-        
-        opcoes_limite_export = ["Todos"] + [f"Top {i}" for i in [10, 20, 30, 40, 50]]
-        limite_export_selecionado = st.selectbox(
-            "Número de tarifários a exportar (ordenados pelo 'Total (€)' atual da tabela):",
-            options=opcoes_limite_export,
-            index=0, 
-            key="limite_tarifarios_export_excel_gas"
-        )
-
-        if st.button("Preparar Download do Ficheiro Excel (Gás)", key="btn_prep_excel_download_gas"):
-            if not colunas_para_exportar_excel_selecionadas:
-                st.warning("Por favor, selecione pelo menos uma coluna para exportar.")
-            else:
-                with st.spinner("A gerar ficheiro Excel de Gás..."):
-                    
-                    df_dados_filtrados_da_grid = pd.DataFrame()
-                    if 'grid_response' in locals() and grid_response and grid_response['data'] is not None:
-                        df_dados_filtrados_da_grid = pd.DataFrame(grid_response['data'])
-                    else:
-                        df_dados_filtrados_da_grid = df_aggrid_display.copy() 
-
-                    if df_dados_filtrados_da_grid.empty and not df_aggrid_display.empty:
-                        df_export_final = pd.DataFrame(columns=colunas_para_exportar_excel_selecionadas)
-                    elif not df_dados_filtrados_da_grid.empty:
-                        colunas_export_validas_no_filtrado = [col for col in colunas_para_exportar_excel_selecionadas if col in df_dados_filtrados_da_grid.columns]
-                        if not colunas_export_validas_no_filtrado:
-                            st.warning("Nenhuma das colunas selecionadas para exportação está presente nos dados filtrados.")
-                            df_export_final = pd.DataFrame()
-                        else:
-                            df_export_final = df_dados_filtrados_da_grid[colunas_export_validas_no_filtrado].copy()
-                    else: 
-                        st.info("Tabela de Gás está vazia, nada para exportar.")
-                        df_export_final = pd.DataFrame() 
-
-                    if not df_export_final.empty and limite_export_selecionado != "Todos":
-                        try:
-                            num_a_exportar = int(limite_export_selecionado.split(" ")[1])
-                            if len(df_export_final) > num_a_exportar:
-                                df_export_final = df_export_final.head(num_a_exportar)
-                        except Exception as e_limite_export:
-                            st.warning(f"Não foi possível aplicar o limite de tarifários: {e_limite_export}")
-
-                    if not df_export_final.empty:
-                        nome_coluna_tarifario_excel = None
-                        if 'NomeParaExibir' in df_export_final.columns:
-                            df_export_final.rename(columns={'NomeParaExibir': 'Tarifário'}, inplace=True)
-                            nome_coluna_tarifario_excel = 'Tarifário'
-                        elif 'Tarifário' in df_export_final.columns:
-                            nome_coluna_tarifario_excel = 'Tarifário'
-
-                        tipos_reais_para_estilo = None
-                        if 'tipo' in df_dados_filtrados_da_grid.columns:
-                            try:
-                                tipos_reais_para_estilo = df_dados_filtrados_da_grid.loc[df_export_final.index, 'tipo']
-                            except KeyError:
-                                tipos_reais_para_estilo = pd.Series(index=df_export_final.index, dtype=str)
-                        else:
-                            tipos_reais_para_estilo = pd.Series(index=df_export_final.index, dtype=str)
-
-                        # Arredondar dados
-                        for col in df_export_final.columns:
-                            if col in ['Total Período (€)']:
-                                df_export_final[col] = pd.to_numeric(df_export_final[col], errors='coerce').round(2)
-                            elif col in ['Termo Energia (€/kWh)', 'Termo Fixo (€/dia)']:
-                                 df_export_final[col] = pd.to_numeric(df_export_final[col], errors='coerce').round(5)
-                        
-                        styler_excel = df_export_final.style.apply(
-                            lambda df: estilo_geral_dataframe_para_exportar(df, tipos_reais_para_estilo, min_max_data_for_js, nome_coluna_tarifario_excel), 
-                            axis=None
-                        )
-                        
-                        styler_excel = styler_excel.format(formatter="{:.2f}", subset=["Total Período (€)"], na_rep="-")
-                        styler_excel = styler_excel.format(formatter="{:.5f}", subset=['Termo Energia (€/kWh)', 'Termo Fixo (€/dia)'], na_rep="-")
-                        
-                        styler_excel = styler_excel.set_table_styles([
-                            {'selector': 'th', 'props': [('background-color', '#404040'), ('color', 'white'), ('font-weight', 'bold'), ('text-align', 'center'), ('border', '1px solid black'), ('padding', '5px')]},
-                            {'selector': 'td', 'props': [('border', '1px solid #dddddd'), ('padding', '4px')]}
-                        ]).hide(axis="index")
-
-                        # Passar a flag 'personalizado_gas_ativo' para a função
-                        output_excel_bytes = exportar_excel_completo(
-                            df_export_final,
-                            styler_excel,
-                            html_resumo_final,
-                            st.session_state.get('poupanca_excel_texto_gas', ""),
-                            escalao_selecionado_str, 
-                            meu_tarifario_gas_ativo,
-                            personalizado_gas_ativo
-                        )
-
-                        timestamp_final_dl = int(time.time())
-                        nome_ficheiro_final_dl = f"Tiago_Felicia_Gas_Natural_{timestamp_final_dl}.xlsx"
-            
-                        st.download_button(
-                            label=f"📥 Descarregar Excel ({nome_ficheiro_final_dl})",
-                            data=output_excel_bytes.getvalue(),
-                            file_name=nome_ficheiro_final_dl,
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            key=f"btn_dl_excel_gas_completo_{timestamp_final_dl}" 
-                        )
-                        st.success(f"{nome_ficheiro_final_dl} pronto para download!")
-    
-    # --- FIM DO BLOCO DE EXPORTAÇÃO EXCEL ---
-
-    # --- INÍCIO: PÓDIO DA POUPANÇA ---
-    st.subheader("🏆 O Seu Pódio da Poupança (Gás)")
-    st.markdown("Estas são as 3 opções mais económicas para si, com base nos seus consumos atuais.")
-
-    # Garantir que o DataFrame está ordenado e o índice está correto
-    df_resultados_ordenado_gas = df_resultados_gas_final.sort_values(by="Total Período (€)").reset_index(drop=True)
-    top3_gas = df_resultados_ordenado_gas.head(3)
-
-    if len(top3_gas) >= 3:
-        custo_referencia = None
-        nome_referencia = ""
-    
-        if meu_tarifario_gas_ativo and not df_resultados_ordenado_gas[df_resultados_ordenado_gas['NomeParaExibir'].str.contains("O Meu Tarifário", na=False)].empty:
-            meu_tar_resultado = df_resultados_ordenado_gas[df_resultados_ordenado_gas['NomeParaExibir'].str.contains("O Meu Tarifário", na=False)].iloc[0]
-            if 'Total Período (€)' in meu_tar_resultado and pd.notna(meu_tar_resultado['Total Período (€)']):
-                custo_referencia = meu_tar_resultado['Total Período (€)']
-                nome_referencia = meu_tar_resultado['NomeParaExibir']
-
-        if custo_referencia is None and not df_resultados_ordenado_gas.empty:
-            # Fallback: Usar o mais caro se o Meu Tarifário não existir
-            pior_tarifario = df_resultados_ordenado_gas.iloc[-1]
-            custo_referencia = pior_tarifario['Total Período (€)']
-            nome_referencia = pior_tarifario['NomeParaExibir']
-    
-        if custo_referencia is not None:
-            st.caption(f"A comparação é feita em relação ao seu ponto de referência ('{nome_referencia}' ({custo_referencia:.2f} €)).")
-    
-            col2, col1, col3 = st.columns([1, 1.2, 1])
-
-            def apresentar_item_podio_gas(coluna, dados_podio, emoji):
-                with coluna:
-                    st.markdown(f"<p style='text-align: center; font-size: 24px;'>{emoji}</p>", unsafe_allow_html=True)
-                    with st.container(border=True):
-                        st.markdown(f"<p style='text-align: center; font-weight: bold;'>{dados_podio['NomeParaExibir']}</p>", unsafe_allow_html=True)
-                        st.metric("Custo Estimado", f"{dados_podio['Total Período (€)']:.2f} €")
-                    
-                        diferenca = dados_podio['Total Período (€)'] - custo_referencia
-                        if diferenca < 0:
-                            st.metric("Poupança", f"{abs(diferenca):.2f} €/mês", delta_color="off")
-                        elif diferenca > 0:
-                            st.metric("Custo Adicional", f"{diferenca:.2f} €/mês", delta=f"{diferenca:.2f} €", delta_color="inverse")
-                        else:
-                            st.metric("Custo", "Igual à referência", delta_color="off")
-
-            apresentar_item_podio_gas(col1, top3_gas.iloc[0], "🥇 1º lugar")
-            apresentar_item_podio_gas(col2, top3_gas.iloc[1], "🥈2º lugar")
-            apresentar_item_podio_gas(col3, top3_gas.iloc[2], "🥉3º lugar")
-
-    st.markdown("---")
-    # --- FIM: PÓDIO DA POUPANÇA ---
-
-# --- SECÇÃO DE PARTILHA POR URL
-st.subheader("🔗 Partilhar Simulação")
-
-# A lógica só é executada se existirem parâmetros no URL
-if st.query_params:
-    
-    # --- URL para o da sua página de Gás Natural ---
-    base_url = "https://tiagofelicia-gas.streamlit.app/" 
-
-    query_string = "&".join([f"{k}={v}" for k, v in st.query_params.items()])
-    shareable_link = f"{base_url}?{query_string}"
-
-    # --- Componente HTML/JS para o campo de texto e botão de copiar ---
-    html_componente_copiar = f"""
-    <div style="display: flex; align-items: center; gap: 8px; font-family: sans-serif;">
-        <input 
-            type="text" 
-            id="shareable-link-input-gas" 
-            value="{shareable_link}" 
-            readonly 
-            style="width: 100%; padding: 8px; border-radius: 6px; border: 1px solid #ccc; font-size: 14px;"
-        >
-        <button 
-            id="copy-button-gas" 
-            onclick="copyLinkToClipboardGas()"
-            style="
-                padding: 8px 12px; 
-                border-radius: 6px; 
-                border: 1px solid #ccc;
-                background-color: #f0f2f6; 
-                cursor: pointer;
-                font-size: 14px;
-                white-space: nowrap;
-            "
-        >
-            📋 Copiar Link
-        </button>
-    </div>
-
-    <script>
-    function copyLinkToClipboardGas() {{
-        const linkInput = document.getElementById("shareable-link-input-gas");
-        linkInput.select();
-        linkInput.setSelectionRange(0, 99999); // Para telemóveis
-
-        navigator.clipboard.writeText(linkInput.value).then(() => {{
-            const copyButton = document.getElementById("copy-button-gas");
-            copyButton.innerText = "Copiado!";
-            setTimeout(() => {{
-                copyButton.innerHTML = "&#128203; Copiar Link";
-            }}, 2000);
-        }}).catch(err => {{
-            console.error('Falha ao copiar o link: ', err);
-        }});
-    }}
-    </script>
-    """
-    st.components.v1.html(html_componente_copiar, height=55)
-
-else:
-    st.info("Altere um dos parâmetros da simulação (Escalão, Município, Consumo, etc.) para gerar um link de partilha.")
-
-
-# Legenda das Colunas da Tabela Tarifários de Gás Natural
-st.markdown("---")
-st.subheader("📖 Legenda das Colunas da Tabela Tarifários de Gás Natural")
-st.caption("""
-* **Tarifário**: Nome identificativo do tarifário. Pode incluir notas sobre descontos de fatura específicos.
-* **Tipo**: Indica se o tarifário é:
-    * `Fixo`: Preços de energia e potência são constantes.
-    * `Indexado`: Preço da energia baseado na média do MIBGÁS para o período selecionado.
-    * `Pessoal`: O seu tarifário, conforme introduzido.
-* **Comercializador**: Empresa que oferece o tarifário.
-* **[...] (€/kWh)**: Custo unitário da energia, **sem IVA**.
-    * Para "O Meu Tarifário", este valor já reflete quaisquer descontos percentuais de energia e o desconto da Tarifa Social que tenhas configurado.
-    * Para os outros tarifários, é o preço base sem IVA, já considerando o desconto da Tarifa Social se ativa.
-* **Termo Fixo (€/dia)**: Custo unitário diário do Termo Fixo **sem IVA**.
-    * Para "O Meu Tarifário", este valor já reflete quaisquer descontos percentuais de potência e o desconto da Tarifa Social que tenhas configurado.
-    * Para os outros tarifários, é o preço base sem IVA, já considerando o desconto da Tarifa Social se ativa.
-* **Total (€)**: Valor do custo final estimado da fatura para o período simulado. Este custo inclui:
-    * Custo da energia consumida (com IVA aplicado conforme as regras).
-    * Custo do Termo Fixo (com IVA aplicado conforme as regras).
-    * Taxas adicionais: ISP Gás e TOS.
-    * Quaisquer descontos de fatura em euros (para "O Meu Tarifário" ou especificados nos tarifários).
-""")
-
-# Usar f-strings para construir o HTML da legenda
-st.subheader("🎨 Legenda de Cores por Tipo de Tarifário")
-
-# Definições de cores
-cor_fundo_meu_tarifario_legenda = "red"
-cor_texto_meu_tarifario_legenda = "white"
-cor_fundo_tarifario_personalizado_legenda = "#92D050"
-cor_texto_tarifario_personalizado_legenda = "white"
-cor_fundo_indexado_css = "#FFE699"
-cor_texto_indexado_media_css = "black"
-cor_fundo_fixo_legenda = "#f0f0f0" # Cor ligeiramente cinza para Fixo
-cor_texto_fixo_legenda = "#333333"
-borda_fixo_legenda = "#CCCCCC"     # Borda para o quadrado branco ser visível
-
-# Construir a string HTML da legenda passo a passo
-html_items = ""
-
-# Item: O Meu Tarifário
-if meu_tarifario_gas_ativo:
-    html_items += f"""<div style="display: flex; align-items: center; margin-bottom: 5px;">
-        <div style="width: 18px; height: 18px; background-color: {cor_fundo_meu_tarifario_legenda}; border: 1px solid #ccc; border-radius: 4px; margin-right: 8px;"></div>
-        <span style="background-color: {cor_fundo_meu_tarifario_legenda}; color: {cor_texto_meu_tarifario_legenda}; padding: 2px 6px; border-radius: 4px; font-weight: bold;">O Meu Tarifário</span>
-        <span style="margin-left: 8px;">- Tarifário configurado pelo utilizador.</span>
-    </div>"""
-
-# Item: Tarifário Personalizado
-if personalizado_gas_ativo:
-    html_items += f"""<div style="display: flex; align-items: center; margin-bottom: 5px;">
-        <div style="width: 18px; height: 18px; background-color: {cor_fundo_tarifario_personalizado_legenda}; border: 1px solid #ccc; border-radius: 4px; margin-right: 8px;"></div>
-        <span style="background-color: {cor_fundo_tarifario_personalizado_legenda}; color: {cor_texto_tarifario_personalizado_legenda}; padding: 2px 6px; border-radius: 4px; font-weight: bold;">Tarifário Personalizado</span>
-        <span style="margin-left: 8px;">- Tarifário configurado pelo utilizador.</span>
-    </div>"""
-
-# Item: Indexado
-html_items += f"""<div style="display: flex; align-items: center; margin-bottom: 5px;">
-    <div style="width: 18px; height: 18px; background-color: {cor_fundo_indexado_css}; border: 1px solid #ccc; border-radius: 4px; margin-right: 8px;"></div>
-    <span style="background-color: {cor_fundo_indexado_css}; color: {cor_texto_indexado_media_css}; padding: 2px 6px; border-radius: 4px;">Indexado</span>
-    <span style="margin-left: 8px;">- Preço de energia baseado na média MIBGÁS do período definido.</span>
-</div>"""
-
-# Item: Fixo
-html_items += f"""<div style="display: flex; align-items: center; margin-bottom: 5px;">
-    <div style="width: 18px; height: 18px; background-color: {cor_fundo_fixo_legenda}; border: 1px solid {borda_fixo_legenda}; border-radius: 4px; margin-right: 8px;"></div>
-    <span style="background-color: {cor_fundo_fixo_legenda}; color: {cor_texto_fixo_legenda}; padding: 2px 6px; border-radius: 4px;">Tarifário Fixo</span>
-    <span style="margin-left: 8px;">- Preços de energia constantes.</span>
-</div>"""
-
-# Criar o HTML final e renderizar
-legenda_html_completa = f"""<div style="font-size: 14px;">{html_items}</div>"""
-st.markdown(legenda_html_completa, unsafe_allow_html=True)
-
-# --- DATAS DE REFERÊNCIA ---
-st.markdown("---") # Adiciona um separador visual
-st.subheader("📅 Data de Referência dos Valores de Mercado no simulador")
-
-# Processar e exibir Data_Valores_MIBGAS_SPOT a partir da aba "Info"
-data_mibgas_spot_formatada_str = "Não disponível"
-
-linha_data_mibgas_spot = info_tab[info_tab['Descricao'] == 'Ultima Data MIBGAS SPOT']
-
-if not linha_data_mibgas_spot.empty:
-    data_valores_mibgas_spot = linha_data_mibgas_spot['Data'].iloc[0]
-    if pd.notna(data_valores_mibgas_spot):
-        data_valores_mibgas_spot_temp = None # Variável temporária para a data MIBGAS
-        try:
-            if isinstance(data_valores_mibgas_spot, (datetime.datetime, pd.Timestamp)):
-                data_valores_mibgas_spot_temp = data_valores_mibgas_spot.date()
-            else:
-                timestamp_convertido_mibgas = pd.to_datetime(data_valores_mibgas_spot, errors='coerce')
-                if pd.notna(timestamp_convertido_mibgas):
-                    data_valores_mibgas_spot_temp = timestamp_convertido_mibgas.date()
-            
-            if data_valores_mibgas_spot_temp and isinstance(data_valores_mibgas_spot_temp, datetime.date):
-                data_mibgas_spot_formatada_str = data_valores_mibgas_spot_temp.strftime('%d/%m/%Y')
-            elif data_valores_mibgas_spot:
-                data_mibgas_spot_formatada_str = f"Valor não reconhecido como data ({data_valores_mibgas_spot})"
-        except Exception: # Captura outros erros de conversão
-            if data_valores_mibgas_spot:
-                data_mibgas_spot_formatada_str = f"Erro ao processar valor ({data_valores_mibgas_spot})"
-
-st.markdown(f"**Valores MIBGAS (SPOT) atualizados até** {data_mibgas_spot_formatada_str}")
-# --- FIM DA SECÇÃO ---
-
-# --- INÍCIO DA SECÇÃO DE APOIO ---
-st.markdown("---") # Adiciona um separador visual antes da secção de apoio
-st.subheader("💖 Apoie este Projeto")
-
-st.markdown(
-    "Se quiser apoiar a manutenção do site e o desenvolvimento contínuo deste simulador, "
-    "pode fazê-lo através de uma das seguintes formas:"
-)
-
-# Link para BuyMeACoffee
-st.markdown(
-    "☕ [**Compre-me um café em BuyMeACoffee**](https://buymeacoffee.com/tiagofelicia)"
-)
-
-st.markdown("ou através do botão PayPal:")
-
-# Código HTML para o botão do PayPal
-paypal_button_html = """
-<div style="text-align: left; margin-top: 10px; margin-bottom: 15px;">
-    <form action="https://www.paypal.com/donate" method="post" target="_blank" style="display: inline-block;">
-    <input type="hidden" name="hosted_button_id" value="W6KZHVL53VFJC">
-    <input type="image" src="https://www.paypalobjects.com/pt_PT/PT/i/btn/btn_donate_SM.gif" border="0" name="submit" title="PayPal - The safer, easier way to pay online!" alt="Faça donativos com o botão PayPal">
-    <img alt="" border="0" src="https://www.paypal.com/pt_PT/i/scr/pixel.gif" width="1" height="1">
-    </form>
-</div>
-"""
-st.markdown(paypal_button_html, unsafe_allow_html=True)
-# --- FIM DA SECÇÃO DE APOIO ---
-
-st.markdown("---")
-# Título para as redes sociais
-st.subheader("Redes sociais, onde poderão seguir o projeto:")
-
-# URLs das redes sociais
-url_x = "https://x.com/tiagofelicia"
-url_facebook = "https://www.facebook.com/profile.php?id=61555007360529"
-url_instagram = "https://www.instagram.com/tiago_felicia/"
-url_youtube = "https://youtube.com/@tiagofelicia"
-url_tiktok = "https://www.tiktok.com/@Tiago_Felicia"
-
-icon_url_x = "https://upload.wikimedia.org/wikipedia/commons/thumb/c/cc/X_icon.svg/120px-X_icon.svg.png?20250519203220"
-icon_url_facebook = "https://upload.wikimedia.org/wikipedia/commons/thumb/b/b9/2023_Facebook_icon.svg/120px-2023_Facebook_icon.svg.png"
-icon_url_instagram = "https://upload.wikimedia.org/wikipedia/commons/a/a5/Instagram_icon.png"
-icon_url_youtube = "https://upload.wikimedia.org/wikipedia/commons/thumb/f/fd/YouTube_full-color_icon_%282024%29.svg/120px-YouTube_full-color_icon_%282024%29.svg.png"
-icon_url_tiktok = "https://upload.wikimedia.org/wikipedia/commons/a/a6/Tiktok_icon.svg"
-
-
-svg_icon_style_dark_mode_friendly = "filter: invert(0.8) sepia(0) saturate(1) hue-rotate(0deg) brightness(1.5) contrast(0.8);"
-
-col_social1, col_social2, col_social3, col_social4, col_social5 = st.columns(5)
-
-with col_social1:
-    st.markdown(
-        f"""
-        <a href="{url_x}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
-            <img src="{icon_url_x}" width="40" alt="X" style="margin-bottom: 8px; object-fit: contain;">
-            X
-        </a>
-        """,
-        unsafe_allow_html=True
-    )
-
-with col_social2:
-    st.markdown(
-        f"""
-        <a href="{url_facebook}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
-            <img src="{icon_url_facebook}" width="40" alt="Facebook" style="margin-bottom: 8px; object-fit: contain;">
-            Facebook
-        </a>
-        """,
-        unsafe_allow_html=True
-    )
-
-with col_social3:
-    st.markdown(
-        f"""
-        <a href="{url_instagram}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
-            <img src="{icon_url_instagram}" width="40" alt="Instagram" style="margin-bottom: 8px; object-fit: contain;">
-            Instagram
-        </a>
-        """,
-        unsafe_allow_html=True
-    )
-
-with col_social4:
-    st.markdown(
-        f"""
-        <a href="{url_youtube}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
-            <img src="{icon_url_youtube}" width="40" alt="YouTube" style="margin-bottom: 8px; object-fit: contain;">
-            YouTube
-        </a>
-        """,
-        unsafe_allow_html=True
-    )
-
-with col_social5:
-    st.markdown(
-        f"""
-        <a href="{url_tiktok}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
-            <img src="{icon_url_tiktok}" width="40" alt="Tiktok" style="margin-bottom: 8px; object-fit: contain;">
-            Tiktok
-        </a>
-        """,
-        unsafe_allow_html=True
-    )
-st.markdown("<br>", unsafe_allow_html=True) # Adiciona um espaço vertical
-
-# Texto de Copyright
-ano_copyright = 2025
-nome_autor = "Tiago Felícia"
-texto_copyright_html = f"© {ano_copyright} Todos os direitos reservados | {nome_autor}"
-
-st.markdown(
-    f"<div style='text-align: center; font-size: 0.9em; color: grey;'>{texto_copyright_html}</div>",
-    unsafe_allow_html=True
-)
+import streamlit as st
+import streamlit.components.v1 as components
+import pandas as pd
+import datetime
+import sys
+import os
+import json
+import io
+import functools
+import copy
+import hashlib
+import urllib.parse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+
+from bs4 import BeautifulSoup
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.utils import get_column_letter
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, JsCode
+from calendar import monthrange 
+
+# --- Adicionar o diretório raiz ao path ---
+try:
+    diretorio_atual = os.path.dirname(os.path.abspath(__file__))
+    diretorio_pai = os.path.dirname(diretorio_atual)
+    if diretorio_pai not in sys.path:
+        sys.path.append(diretorio_pai)
+
+    import calculos as calc
+    import processamento_dados as proc_dados
+    from processamento_dados import normalizar_para_ordenacao
+    import graficos as gfx 
+except ImportError:
+    st.error("Erro fatal: Não foi possível encontrar os módulos locais (calculos.py, processamento_dados.py). Certifique-se de que este ficheiro está na pasta 'pages' e os outros estão no diretório principal.")
+    st.stop()
+
+
+# --- Configuração da Página ---
+st.set_page_config(page_title="Simulador de Tarifários Gás Natural 2025: Poupe na Fatura | Tiago Felícia", page_icon="🔥", layout="wide", initial_sidebar_state="collapsed")
+
+# --- Carregar Dados ---
+url_excel = "https://github.com/tiagofelicia/simulador-tarifarios-gas/raw/refs/heads/main/Tarifarios_%F0%9F%94%A5_Gas_Natural_Tiago_Felicia.xlsx"
+url_mibgas_csv = "https://github.com/tiagofelicia/simulador-tarifarios-gas/raw/refs/heads/main/dados/MIBGAS.csv"
+url_info_csv = "https://github.com/tiagofelicia/simulador-tarifarios-gas/raw/refs/heads/main/dados/Info.csv"
+
+try:
+    # Catálogo (tarifários, TOS, constantes) e série MIBGAS têm caches e tempos de vida independentes
+    (
+        CONSTANTES, tarifas_gas_master, tos_municipios, versao_catalogo_gas
+    ) = proc_dados.carregar_catalogo_gas(url_excel)
+    (
+        mibgas_df, info_tab, versao_mibgas
+    ) = proc_dados.carregar_serie_mibgas(url_mibgas_csv, url_info_csv, url_excel)
+
+    if tarifas_gas_master.empty or CONSTANTES.empty or tos_municipios.empty:
+        st.error("Erro: Uma das abas essenciais ('Tarifas_Gas_Master', 'Constantes', 'TOS') não foi carregada ou está vazia.")
+        st.stop()
+    if mibgas_df.empty:
+        st.warning("Aviso: A aba 'MIBGAS' não foi carregada. Os tarifários indexados a gás podem não ser calculados.")
+
+except ValueError:
+    st.error("Erro fatal ao carregar os dados.")
+    st.stop()
+except Exception as e:
+    st.error(f"Ocorreu um erro ao carregar os dados do Excel: {e}")
+    st.stop()
+
+# --- Constantes com vigência (ex: TAR que mudam em outubro/janeiro) ---
+# CONSTANTES fica com os valores em vigor; a tabela completa é usada para dividir o período de simulação
+CONSTANTES_COM_VIGENCIA = CONSTANTES
+CONSTANTES = calc.obter_constantes_em_vigor(CONSTANTES_COM_VIGENCIA, datetime.date.today())
+
+# --- Obter valor constante da Quota ACP ---
+VALOR_QUOTA_ACP_MENSAL = calc.obter_constante("Quota_ACP", CONSTANTES)
+
+#FUNÇÕES
+# --- Mapas para encurtar os parâmetros do URL ---
+MAPA_ESCALAO_PARA_URL = {
+    "Escalão 1 (Consumo até 220 m³/ano)": "E1",
+    "Escalão 2 (Consumo 221 a 500 m³/ano)": "E2",
+    "Escalão 3 (Consumo 501 a 1.000 m³/ano)": "E3",
+    "Escalão 4 (Consumo 1.001 a 10.000 m³/ano)": "E4",
+}
+# Cria o dicionário inverso automaticamente para ler os URLs
+MAPA_URL_PARA_ESCALAO = {v: k for k, v in MAPA_ESCALAO_PARA_URL.items()}
+
+def inicializar_estado_e_url_gas():
+    """
+    Verifica e inicializa o st.session_state para o simulador de Gás, dando prioridade a valores no URL. Corre apenas uma vez por sessão.
+    """
+    if 'estado_inicializado_gas' in st.session_state:
+        return
+
+    # 1. Obter lista de municípios para validação
+    lista_municipios_validos = sorted(tos_municipios['Município'].dropna().unique())
+    
+    # 2. Ler Escalão do URL, ou usar default
+    escalao_codigo_url = st.query_params.get("esc") # Pega o código, ex: "E4"
+    nome_longo_escalao = MAPA_URL_PARA_ESCALAO.get(escalao_codigo_url) # Procura "E4" no dicionário e devolve o nome completo
+
+    # Se encontrou um nome de escalão correspondente no dicionário, usa-o.
+    if nome_longo_escalao:
+        st.session_state.sel_escalao_gas_key = nome_longo_escalao
+    else:
+        # Caso contrário (parâmetro inválido ou ausente), usa o default.
+        st.session_state.sel_escalao_gas_key = "Escalão 1 (Consumo até 220 m³/ano)"
+
+    # 3. Ler Município do URL, ou usar default
+    municipio_url = st.query_params.get("mun")
+    if municipio_url and municipio_url in lista_municipios_validos:
+        st.session_state.sel_municipio_tos = municipio_url
+    else:
+        # Usar Almeirim (10º da lista - índice 9) como default, com fallback
+        default_idx = 9 if len(lista_municipios_validos) > 9 else 0
+        st.session_state.sel_municipio_tos = lista_municipios_validos[default_idx]
+
+    # 4. Ler Consumo e Modo de Input
+    st.session_state.gas_input_mode = "Consumo (m³)" if "con_m3" in st.query_params else "Consumo (kWh)"
+    st.session_state.gas_kwh_input_key = float(st.query_params.get("con_kwh", 135)) # Default 135 kWh
+
+    # 5. Ler Preço MIBGAS
+    if "mibgas" in st.query_params:
+        st.session_state.mibgas_input_mwh_manual = float(st.query_params.get("mibgas"))
+        
+    # 6. Ler Opções Adicionais
+    st.session_state.chk_ts_gas_v2 = st.query_params.get("ts") == "1"
+    st.session_state.chk_acp_gas = st.query_params.get("acp") != "0" # Default é True
+    st.session_state.chk_cont_gas = st.query_params.get("cont") != "0" # Default é True
+
+    # 7. Ler Tarifário Personalizado ---
+    if st.query_params.get("p_a") == "1":
+        st.session_state.chk_pers_gas_ativo = True
+        st.session_state.pers_gas_energia = float(st.query_params.get("p_e", 0.0))
+        st.session_state.pers_gas_fixo = float(st.query_params.get("p_f", 0.0))
+        st.session_state.pers_gas_tar_energia = st.query_params.get("p_te") != "0" # Default é True
+        st.session_state.pers_gas_tar_potencia = st.query_params.get("p_tf") != "0" # Default é True
+
+    # Adicionar uma flag para indicar que a inicialização foi concluída
+    st.session_state.estado_inicializado_gas = True
+
+# --- Chamada da Função de Inicialização ---
+inicializar_estado_e_url_gas()
+
+# --- Função para REINICIAR o simulador para os valores padrão ---
+def reiniciar_simulador():
+    """
+    Repõe o simulador de GÁS para os valores padrão, limpando o session_state e os parâmetros do URL.
+    """
+    
+    # Lista de todas as chaves de session_state específicas do simulador de Gás
+    chaves_a_apagar_gas = [
+        # Chave de inicialização
+        'estado_inicializado_gas',
+        
+        # Chaves de Inputs Principais
+        'sel_escalao_gas_key',
+        'sel_municipio_tos',
+        'gas_input_mode',
+        'gas_kwh_input_key',
+        'gas_m3_input_key',
+        'gas_pcs_input_key',
+        
+        # Chaves de Datas e MIBGAS
+        'sel_mes_gas',
+        'session_initialized_dates_gas',
+        'data_inicio_key_input_gas',
+        'data_fim_key_input_gas',
+        'dias_manual_input_key_gas',
+        'previous_mes_for_dates_gas',
+
+        
+        # Chaves MIBGAS
+        'mibgas_input_mwh_manual',
+        'mibgas_default_calculado',
+        
+        # Chaves de Opções Adicionais
+        'gas_isp_manual_input',
+        'chk_ts_gas_v2',
+        'chk_acp_gas',
+        'chk_cont_gas',
+        
+        # Chaves do "Meu Tarifário"
+        'chk_meu_tarifario_gas_ativo',
+        'meu_termo_energia_gas',
+        'meu_termo_fixo_gas',
+        'meu_gas_tar_energia_incluida',
+        'meu_gas_tar_fixo_incluida',
+        'meu_gas_desconto_energia_perc',
+        'meu_gas_desconto_fixo_perc',
+        'meu_gas_desconto_fatura_eur',
+        'meu_gas_acrescimo_fatura_eur',
+        
+        # Chaves do "Tarifário Personalizado"
+        'chk_pers_gas_ativo',
+        'pers_gas_energia',
+        'pers_gas_fixo',
+        'pers_gas_tar_energia',
+        'pers_gas_tar_potencia',
+        
+        # Chaves de Filtros e UI
+        'filter_segmento_gas_idx',
+        'filter_faturacao_gas_idx',
+        'filter_pagamento_gas_idx',
+        'filter_tipos_gas_multi',
+        'chk_vista_simplificada_gas',
+        'poupanca_excel_texto_gas',
+        'poupanca_excel_cor_gas',
+        'poupanca_excel_negrito_gas'
+    ]
+
+    # Apagar cada chave se ela existir
+    for key in chaves_a_apagar_gas:
+        if key in st.session_state:
+            del st.session_state[key]
+
+    # Limpar todos os parâmetros do URL
+    st.query_params.clear()
+
+    # Definir explicitamente o estado das checkboxes como Falso
+    st.session_state.chk_meu_tarifario_gas_ativo = False
+    st.session_state.chk_pers_gas_ativo = False
+
+    st.success("Simulador de Gás reiniciado para os valores padrão.")
+
+# --- Título e Botão de Limpeza Geral ---
+
+# Linha 1: Logo e Título
+col_logo, col_titulo = st.columns([1, 5])
+
+with col_logo:
+    st.image("https://raw.githubusercontent.com/tiagofelicia/simulador-tarifarios-eletricidade/refs/heads/main/Logo_Tiago_Felicia.png", width=180)
+
+with col_titulo:
+    st.title("🔥 Tiago Felícia - Simulador de Tarifários de Gás Natural")
+
+st.button(
+    "🧹 Limpar e Reiniciar Simulador",
+    on_click=reiniciar_simulador,
+    help="Repõe os campos do simulador para os valores iniciais.",
+    use_container_width=True
+)
+
+# --- CENÁRIOS PARTILHADOS (URL CANÓNICO E CACHE DE RESULTADOS ENTRE SESSÕES) ---
+# Ordem canónica dos parâmetros do URL; parâmetros desconhecidos não entram no link partilhado
+ORDEM_PARAMETROS_URL_GAS = [
+    "esc", "mun", "con_kwh", "con_m3", "pcs", "mibgas", "ts", "acp", "cont",
+    "m_a", "m_e", "m_f", "m_te", "m_tf", "m_de", "m_dtf", "m_df", "m_af",
+    "p_a", "p_e", "p_f", "p_te", "p_tf",
+]
+PARAMETROS_URL_TEXTO_GAS = {"esc", "mun"}
+TAMANHO_CACHE_RESULTADOS_GAS = 512
+
+def canonicalizar_parametros_url_gas(parametros_url):
+    """
+    Forma canónica dos parâmetros do URL: ordem fixa, números normalizados ("135.0" -> "135")
+    e valores codificados. O mesmo cenário dá sempre a mesma query string.
+    """
+    pares_canonicos = []
+    for nome_parametro in ORDEM_PARAMETROS_URL_GAS:
+        if nome_parametro not in parametros_url:
+            continue
+        valor = str(parametros_url[nome_parametro])
+        if nome_parametro not in PARAMETROS_URL_TEXTO_GAS:
+            try:
+                valor = f"{float(valor):.10g}"
+            except (ValueError, TypeError):
+                pass
+        pares_canonicos.append((nome_parametro, valor))
+    return urllib.parse.urlencode(pares_canonicos)
+
+def calcular_chave_cenario_gas(parametros_cenario):
+    """Chave (sha1) de um cenário a partir dos parâmetros efetivos do cálculo (dict serializável)."""
+    return hashlib.sha1(json.dumps(parametros_cenario, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=TAMANHO_CACHE_RESULTADOS_GAS)
+def calcular_resultados_cenario_cache(chave_cenario, _funcao_calculo):
+    """
+    Resultados dos tarifários de um cenário, partilhados entre sessões: quem abre o mesmo link
+    (mesmos dados, período e opções) recebe os resultados já calculados.
+    """
+    return _funcao_calculo()
+
+# --- DADOS DA TABELA AGGRID ---
+# Decomposições usadas nos tooltips: vão para o browser num único array por linha ('tt_dados'),
+# pela ordem desta lista, em vez de 19 colunas ocultas
+COLUNAS_TOOLTIP_GAS = [
+    'tooltip_fixo_comerc_sem_tar', 'tooltip_fixo_tar_bruta', 'tooltip_fixo_ts_aplicada_flag', 'tooltip_fixo_ts_desconto_valor',
+    'tooltip_energia_comerc_sem_tar', 'tooltip_energia_tar_bruta', 'tooltip_energia_ts_aplicada_flag', 'tooltip_energia_ts_desconto_valor',
+    'tt_cte_energia_siva', 'tt_cte_fixo_siva', 'tt_cte_isp_siva', 'tt_cte_tos_fixo_siva', 'tt_cte_tos_var_siva',
+    'tt_cte_total_siva', 'tt_cte_valor_iva_6_total', 'tt_cte_valor_iva_23_total',
+    'tt_cte_subtotal_civa', 'tt_cte_desc_finais_valor', 'tt_cte_acres_finais_valor'
+]
+INDICES_TOOLTIP_GAS = {nome_coluna: indice for indice, nome_coluna in enumerate(COLUNAS_TOOLTIP_GAS)}
+CASAS_DECIMAIS_TOOLTIP_GAS = 5 # Os tooltips mostram no máximo 4 casas decimais
+COLUNA_ID_LINHA_GAS = 'id_linha'
+
+def compactar_dados_aggrid_gas(df_tabela):
+    """
+    Prepara o DataFrame enviado ao AgGrid: as colunas de COLUNAS_TOOLTIP_GAS são juntas num só
+    array numérico arredondado por linha ('tt_dados'; flags como 1/0) e removidas.
+    As restantes colunas (incluindo COLUNA_ID_LINHA_GAS) ficam iguais.
+    """
+    colunas_tooltip = [col for col in COLUNAS_TOOLTIP_GAS if col in df_tabela.columns]
+    df_compacto = df_tabela.drop(columns=colunas_tooltip)
+    matriz_tooltip = np.zeros((len(df_tabela), len(COLUNAS_TOOLTIP_GAS)))
+    for col in colunas_tooltip:
+        matriz_tooltip[:, INDICES_TOOLTIP_GAS[col]] = pd.to_numeric(df_tabela[col], errors='coerce').astype(float).fillna(0.0).to_numpy()
+    df_compacto['tt_dados'] = np.round(matriz_tooltip, CASAS_DECIMAIS_TOOLTIP_GAS).tolist()
+    return df_compacto
+
+# Botão de exportação que lê o estado da grelha no browser no momento do clique (sem reruns a cada
+# ordenação/filtro). A grelha publica a API em window[NOME_API_GRELHA_GAS] (ver get_row_style_js).
+NOME_API_GRELHA_GAS = '__apiGrelhaTarifariosGas'
+componente_estado_grelha = components.declare_component(
+    "estado_grelha",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "componentes", "estado_grelha")
+)
+
+def _linhas_por_ids_gas(df_tabela_completa, ids_linhas, nomes_linhas=None):
+    """
+    Linhas de df_tabela_completa pela ordem de ids_linhas (ids de COLUNA_ID_LINHA_GAS).
+    Devolve None se os ids (ou os nomes, quando indicados) não forem da tabela atual.
+    """
+    ids_visiveis = pd.to_numeric(pd.Series(ids_linhas, dtype=object), errors='coerce')
+    if ids_visiveis.isna().any() or not ids_visiveis.isin(df_tabela_completa.index).all():
+        return None
+    ids_visiveis = ids_visiveis.astype(int).to_numpy()
+    if nomes_linhas is not None and 'NomeParaExibir' in df_tabela_completa.columns:
+        if not np.array_equal(pd.Series(nomes_linhas, dtype=object).astype(str).to_numpy(), df_tabela_completa.loc[ids_visiveis, 'NomeParaExibir'].astype(str).to_numpy()):
+            return None
+    return df_tabela_completa.loc[ids_visiveis].reset_index(drop=True)
+
+def linhas_da_grelha_gas(grid_response, df_tabela_completa):
+    """
+    Devolve as linhas de df_tabela_completa pela ordem e filtro atuais da grelha, a partir apenas
+    dos ids de linha devolvidos pelo AgGrid. Sem resposta da grelha, ou se a resposta for de uma
+    tabela anterior, devolve None.
+    """
+    if not grid_response or grid_response['data'] is None:
+        return None
+    df_grelha = pd.DataFrame(grid_response['data'])
+    if COLUNA_ID_LINHA_GAS not in df_grelha.columns:
+        return None
+    nomes_grelha = df_grelha['NomeParaExibir'].tolist() if 'NomeParaExibir' in df_grelha.columns else None
+    return _linhas_por_ids_gas(df_tabela_completa, df_grelha[COLUNA_ID_LINHA_GAS].tolist(), nomes_grelha)
+
+def linhas_do_estado_capturado_gas(estado_capturado, df_tabela_completa):
+    """
+    Linhas da tabela segundo o estado capturado pelo botão de exportação (ids visíveis pela ordem
+    do ecrã, já com filterModel/sortModel aplicados no browser). None se não houver captura válida
+    para a tabela atual (ex.: a grelha ainda não tinha sido desenhada, ou o cenário mudou).
+    """
+    if not estado_capturado or estado_capturado.get('ids') is None:
+        return None
+    return _linhas_por_ids_gas(df_tabela_completa, estado_capturado['ids'], estado_capturado.get('nomes'))
+
+@st.cache_resource(show_spinner=False)
+def construir_opcoes_grelha_gas(colunas_e_tipos, vista_simplificada, colunas_visiveis_presentes):
+    """
+    Definição estática da grelha de resultados (colunas, JsCode de estilos/tooltips/renderers),
+    construída uma vez por processo para cada combinação de colunas e vista. O que muda a cada
+    rerun (mín/máx do gradiente, nº de dias no cabeçalho) é aplicado por aplicar_dados_grelha_gas.
+    """
+    df_estrutura = pd.DataFrame({nome_coluna: pd.Series(dtype=tipo_coluna) for nome_coluna, tipo_coluna in colunas_e_tipos})
+    colunas_grelha = df_estrutura.columns
+    gb = GridOptionsBuilder.from_dataframe(df_estrutura) 
+    
+    # Na vista simplificada só o nome do tarifário quebra linha (menos medições de altura no browser)
+    gb.configure_default_column(
+        sortable=True,
+        resizable=True,
+        editable=False,
+        wrapText=not vista_simplificada,
+        autoHeight=not vista_simplificada,
+        wrapHeaderText=True,
+        autoHeaderHeight=True,
+        headerClass="center-header"
+    )
+
+    # --- 1. DEFINIÇÕES JAVASCRIPT AVANÇADAS ---
+
+    # Componente de Tooltip Personalizado
+    custom_tooltip_component_js = JsCode("""
+        class CustomTooltip { /* ...... */ 
+            init(params) {
+                this.eGui = document.createElement('div');
+                this.eGui.innerHTML = params.value; 
+                this.eGui.style.backgroundColor = 'white'; this.eGui.style.color = 'black';
+                this.eGui.style.border = '1px solid #ccc'; this.eGui.style.padding = '10px';
+                this.eGui.style.borderRadius = '6px'; this.eGui.style.boxShadow = '0 2px 5px rgba(0,0,0,0.15)';
+                this.eGui.style.maxWidth = '400px'; this.eGui.style.fontSize = '1.1em';
+                this.eGui.style.fontFamily = 'Arial, sans-serif'; this.eGui.style.whiteSpace = 'normal';
+            }
+            getGui() { return this.eGui; }
+        }
+    """)
+
+    # Estilos de Célula para Nomes de Tarifário
+    cor_fundo_indexado_gas_css = "#FFE699" 
+    cor_texto_indexado_gas_css = "black"
+    cor_fundo_fixo_gas_css = "#f0f0f0"     
+    cor_texto_fixo_gas_css = "#333333"
+    cor_fundo_personalizado_gas_css = "#92D050"
+    cor_texto_personalizado_gas_css = "white"
+
+    cell_style_nome_tarifario_js = JsCode(f"""
+    function(params) {{
+        let styleToApply = {{ textAlign: 'center', borderRadius: '6px', padding: '10px 10px' }};                                  
+        if (params.data) {{
+            const tipoTarifario = params.data.tipo; 
+            const nomeTarifario = params.data.NomeParaExibir;
+
+            if (tipoTarifario === 'Pessoal' && nomeTarifario && nomeTarifario.startsWith('O Meu Tarifário')) {{
+                styleToApply.backgroundColor = 'red';
+                styleToApply.color = 'white';
+                styleToApply.fontWeight = 'bold';
+            }} else if (tipoTarifario === 'Pessoal') {{ 
+                /* Isto apanha o "Tarifário Personalizado" que também usa tipo 'Pessoal' */
+                styleToApply.backgroundColor = '{cor_fundo_personalizado_gas_css}';
+                styleToApply.color = '{cor_texto_personalizado_gas_css}';
+                styleToApply.fontWeight = 'bold';
+            }} else if (tipoTarifario === 'Indexado') {{
+                styleToApply.backgroundColor = '{cor_fundo_indexado_gas_css}';
+                styleToApply.color = '{cor_texto_indexado_gas_css}';                
+            }} else if (tipoTarifario === 'Fixo') {{
+                styleToApply.backgroundColor = '{cor_fundo_fixo_gas_css}';
+                styleToApply.color = '{cor_texto_fixo_gas_css}';
+            }}
+            return styleToApply;
+        }}
+        return styleToApply; 
+    }}
+    """)
+
+    # Tooltips JS para Termo Fixo e Energia
+    tooltip_termo_fixo_gas_js = JsCode(f"""
+    function(params) {{
+        if (!params.data) {{ return String(params.value); }}
+        const d = params.data.tt_dados || [];
+        const comercializador = parseFloat(d[{INDICES_TOOLTIP_GAS['tooltip_fixo_comerc_sem_tar']}] || 0);
+        const tarBruta = parseFloat(d[{INDICES_TOOLTIP_GAS['tooltip_fixo_tar_bruta']}] || 0);
+        const tsAplicada = d[{INDICES_TOOLTIP_GAS['tooltip_fixo_ts_aplicada_flag']}] === 1;
+        const descontoTSValor = parseFloat(d[{INDICES_TOOLTIP_GAS['tooltip_fixo_ts_desconto_valor']}] || 0);
+        const formatPrice = (num) => (typeof num === 'number' && !isNaN(num)) ? num.toFixed(4) : 'N/A';
+        let tooltipParts = ["<b>Decomposição Termo Fixo (s/IVA):</b>"];
+        tooltipParts.push("Comercializador (s/TAR): " + formatPrice(comercializador) + " €/dia");
+        tooltipParts.push("TAR (Tarifa Acesso Redes): " + formatPrice(tarBruta) + " €/dia");
+        if (tsAplicada === true && descontoTSValor > 0) {{
+            tooltipParts.push("Desconto Tarifa Social: -" + formatPrice(descontoTSValor) + " €/dia");
+        }}
+        tooltipParts.push("----------------------------------------------------");
+        tooltipParts.push("<b>Custo Final : " + formatPrice(parseFloat(params.value)) + " €/dia</b>");
+        return tooltipParts.join("<br>");
+    }}""")
+    tooltip_termo_energia_gas_js = JsCode(f"""
+    function(params) {{
+        if (!params.data) {{ return String(params.value); }}
+        const d = params.data.tt_dados || [];
+        const comercializador = parseFloat(d[{INDICES_TOOLTIP_GAS['tooltip_energia_comerc_sem_tar']}] || 0);
+        const tarBruta = parseFloat(d[{INDICES_TOOLTIP_GAS['tooltip_energia_tar_bruta']}] || 0);
+        const tsAplicada = d[{INDICES_TOOLTIP_GAS['tooltip_energia_ts_aplicada_flag']}] === 1;
+        const descontoTSValor = parseFloat(d[{INDICES_TOOLTIP_GAS['tooltip_energia_ts_desconto_valor']}] || 0);
+        const formatPrice = (num) => (typeof num === 'number' && !isNaN(num)) ? num.toFixed(4) : 'N/A';
+        let tooltipParts = ["<b>Decomposição Energia (s/IVA):</b>"];
+        tooltipParts.push("Comercializador (s/TAR): " + formatPrice(comercializador) + " €/kWh");
+        tooltipParts.push("TAR (Tarifa Acesso Redes): " + formatPrice(tarBruta) + " €/kWh");
+        if (tsAplicada === true && descontoTSValor > 0) {{
+            tooltipParts.push("Desconto Tarifa Social: -" + formatPrice(descontoTSValor) + " €/kWh");
+        }}
+        tooltipParts.push("----------------------------------------------------");
+        tooltipParts.push("<b>Custo Final : " + formatPrice(parseFloat(params.value)) + " €/kWh</b>");
+        return tooltipParts.join("<br>");
+    }}""")
+    tooltip_custo_total_gas_js = JsCode(f"""
+    function(params) {{
+        if (!params.data) {{ return String(params.value); }}
+        const formatCurrency = (num) => (typeof num === 'number' && !isNaN(num)) ? num.toFixed(2) : 'N/A';
+        const nomeTarifario = params.data.NomeParaExibir || "Tarifário";
+        let tooltipParts = [ "<i>" + nomeTarifario + "</i>", "<b>Decomposição Custo Total:</b>", "------------------------------------" ];
+        const d = params.data.tt_dados || [];
+        const energia_siva = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_energia_siva']}] || 0);
+        const fixo_siva = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_fixo_siva']}] || 0);
+        const isp_siva = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_isp_siva']}] || 0);
+        const tos_fixo_siva = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_tos_fixo_siva']}] || 0);
+        const tos_var_siva = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_tos_var_siva']}] || 0);
+        const total_siva = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_total_siva']}] || 0);
+        const iva_6 = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_valor_iva_6_total']}] || 0);
+        const iva_23 = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_valor_iva_23_total']}] || 0);
+        const subtotal_civa = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_subtotal_civa']}] || 0);
+        const desc_finais = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_desc_finais_valor']}] || 0);
+        const acres_finais = parseFloat(d[{INDICES_TOOLTIP_GAS['tt_cte_acres_finais_valor']}] || 0);
+        tooltipParts.push("Total Energia s/IVA: " + formatCurrency(energia_siva) + " €");
+        tooltipParts.push("Total Termo Fixo s/IVA: " + formatCurrency(fixo_siva) + " €");
+        if (isp_siva !== 0) {{ tooltipParts.push("ISP s/IVA: " + formatCurrency(isp_siva) + " €"); }}
+        if (tos_fixo_siva !== 0 || tos_var_siva !== 0) {{ tooltipParts.push("Taxa Ocup. Subsolo (TOS): " + formatCurrency(tos_fixo_siva + tos_var_siva) + " €"); }}
+        tooltipParts.push("<b>Subtotal s/IVA: " + formatCurrency(total_siva) + " €</b>");
+        tooltipParts.push("------------------------------------");
+        if (iva_6 !== 0) {{ tooltipParts.push("Valor IVA (6%): " + formatCurrency(iva_6) + " €"); }}
+        if (iva_23 !== 0) {{ tooltipParts.push("Valor IVA (23%): " + formatCurrency(iva_23) + " €"); }}
+        tooltipParts.push("<b>Subtotal c/IVA: " + formatCurrency(subtotal_civa) + " €</b>");
+        if (desc_finais !== 0 || acres_finais !== 0) {{
+            tooltipParts.push("------------------------------------");
+            if (desc_finais !== 0) {{ tooltipParts.push("Outros Descontos: -" + formatCurrency(desc_finais) + " €"); }}
+            if (acres_finais !== 0) {{ tooltipParts.push("Outros Acréscimos: +" + formatCurrency(acres_finais) + " €"); }}
+            tooltipParts.push("------------------------------------");
+        }}
+        tooltipParts.push("<b>Custo Total c/IVA: " + formatCurrency(parseFloat(params.value)) + " €</b>");
+        return tooltipParts.join("<br>");
+    }}""")
+
+    # Renderizador de Link/Notas
+    link_tooltip_renderer_js = JsCode("""
+        class LinkTooltipRenderer {
+            init(params) {
+                this.eGui = document.createElement('div');
+                let displayText = params.value; 
+                let url = params.data.LinkAdesao; 
+                if (url && typeof url === 'string' && url.toLowerCase().startsWith('http')) {
+                    this.eGui.innerHTML = `<a href="${url}" target="_blank" title="Aderir/Saber mais: ${url}" style="text-decoration: underline; color: inherit;">${displayText}</a>`;
+                } else {
+                    this.eGui.innerHTML = `<span title="${displayText}">${displayText}</span>`;
+                }
+            }
+            getGui() { return this.eGui; }
+        }
+    """)
+    
+    # Getter de Tooltip de Notas
+    tooltip_nome_tarifario_getter_js = JsCode("""
+        function(params) {
+            if (!params.data) { return params.value || ''; }
+            const nomeExibir = params.data.NomeParaExibir || '';
+            const notas = params.data.info_notas || ''; 
+            let tooltipHtmlParts = [];
+            if (nomeExibir) {
+                tooltipHtmlParts.push("<strong>" + nomeExibir + "</strong>");
+            }
+            if (notas) {
+                const notasHtml = notas.replace(/\\n/g, ' ').replace(/\n/g, ' ');
+                tooltipHtmlParts.push("<small style='display: block; margin-top: 5px;'><i>" + notasHtml + "</i></small>");
+            }
+            if (tooltipHtmlParts.length > 0) {
+                return tooltipHtmlParts.join('<br>');
+            }
+            return ''; 
+        }
+    """)
+
+    # Gradiente de Cor Genérico
+    cell_style_gradiente_custo_js = JsCode("""
+    function(params) {
+        const colName = params.colDef.field;
+        const value = parseFloat(params.value);
+        const minMaxConfig = (params.context && params.context.minMaxConfig) || {}; 
+        
+        let style = { textAlign: 'center', borderRadius: '6px', padding: '10px 10px' }; 
+
+        if (isNaN(value) || !minMaxConfig[colName]) { return style; }
+        const min_val = minMaxConfig[colName].min;
+        const max_val = minMaxConfig[colName].max;
+        if (max_val === min_val) { style.backgroundColor = 'lightgrey'; return style; }
+        
+        const normalized_value = Math.max(0, Math.min(1, (value - min_val) / (max_val - min_val)));
+        const cL={r:99,g:190,b:123},cM={r:255,g:255,b:255},cH={r:248,g:105,b:107}; 
+        let r, g, b;
+        if (normalized_value < 0.5) {
+            const t = normalized_value / 0.5; 
+            r = Math.round(cL.r * (1 - t) + cM.r * t); g = Math.round(cL.g * (1 - t) + cM.g * t); b = Math.round(cL.b * (1 - t) + cM.b * t);
+        } else {
+            const t = (normalized_value - 0.5) / 0.5;
+            r = Math.round(cM.r * (1 - t) + cH.r * t); g = Math.round(cM.g * (1 - t) + cH.g * t); b = Math.round(cM.b * (1 - t) + cH.b * t);
+        }
+        style.backgroundColor = `rgb(${r},${g},${b})`;
+        if ((r * 0.299 + g * 0.587 + b * 0.114) < 140) { 
+            style.color = 'white';
+        } else {
+            style.color = 'black';
+        }
+        return style;
+    }
+    """)
+    
+    # --- Estilo de Linha para aplicar negrito ---
+    get_row_style_js = JsCode("""
+    function(params) {
+        // Publica a API da grelha para o botão de exportação (NOME_API_GRELHA_GAS)
+        if (params.api) { window.__apiGrelhaTarifariosGas = params.api; }
+        if (params.data && params.data.tipo === 'Pessoal') {
+            // Aplica negrito a toda a linha se o 'tipo' for 'Pessoal'
+            // (Isto apanha tanto 'O Meu Tarifário' como 'Tarifário Personalizado')
+            return { 'fontWeight': 'bold' };
+        }
+        return null; // Sem estilo de linha para Fixo ou Indexado
+    }
+    """)
+
+
+    # --- 2. CONFIGURAÇÃO DAS COLUNAS ---
+
+    formatter_eur_5dec = JsCode("function(params) { if(params.value == null) return ''; return Number(params.value).toFixed(5); }") 
+    formatter_eur_2dec = JsCode("function(params) { if(params.value == null) return ''; return '€ ' + Number(params.value).toFixed(2); }")
+
+    is_visible_comerc = 'Comercializador' in colunas_visiveis_presentes 
+    gb.configure_column("Comercializador", headerName="Comercializador", minWidth=150, flex=1.5, 
+                        filter='agTextColumnFilter', cellStyle=cell_style_nome_tarifario_js,
+                        hide=(not is_visible_comerc)) 
+    
+    # Coluna 2: Tarifário (Usa Link/Tooltip E Estilo de Cor)
+    gb.configure_column("NomeParaExibir", headerName="Tarifário", minWidth=250, flex=2.5, filter='agTextColumnFilter', 
+                        wrapText=True, autoHeight=True,
+                        cellStyle=cell_style_nome_tarifario_js,
+                        cellRenderer=link_tooltip_renderer_js,
+                        tooltipValueGetter=tooltip_nome_tarifario_getter_js,
+                        tooltipComponent=custom_tooltip_component_js)
+    
+    # Coluna 3: Total (Usa Gradiente (sem negrito) e Tooltip Total)
+    gb.configure_column("Total Período (€)", headerName="Total (€)", type=["numericColumn"], 
+                        valueFormatter=formatter_eur_2dec, 
+                        cellStyle=cell_style_gradiente_custo_js, 
+                        minWidth=130, flex=1,
+                        tooltipValueGetter=tooltip_custo_total_gas_js,
+                        tooltipComponent=custom_tooltip_component_js)
+
+    # Coluna 4: Energia (Usa Gradiente (sem negrito) e Tooltip Energia)
+    gb.configure_column("Termo Energia (€/kWh)", headerName="Energia (€/kWh)", type=["numericColumn"], 
+                        valueFormatter=formatter_eur_5dec, minWidth=120, flex=1, 
+                        cellStyle=cell_style_gradiente_custo_js, 
+                        tooltipValueGetter=tooltip_termo_energia_gas_js,
+                        tooltipComponent=custom_tooltip_component_js)
+                        
+    # Coluna 5: Fixo (Usa Gradiente (sem negrito) e Tooltip Fixo)
+    gb.configure_column("Termo Fixo (€/dia)", headerName="Fixo (€/dia)", type=["numericColumn"], 
+                        valueFormatter=formatter_eur_5dec, minWidth=120, flex=1, 
+                        cellStyle=cell_style_gradiente_custo_js, 
+                        tooltipValueGetter=tooltip_termo_fixo_gas_js,
+                        tooltipComponent=custom_tooltip_component_js)
+
+    # Colunas de Detalhe (com lógica hide)
+    set_filter_params = { 'buttons': ['apply', 'reset'], 'excelMode': 'mac', 'suppressMiniFilter': False, }
+    colunas_texto_detalhe = ['tipo', 'Segmento', 'Faturação', 'Pagamento']
+    for col_name in colunas_texto_detalhe:
+        if col_name in colunas_grelha:
+            is_visible = col_name in colunas_visiveis_presentes
+            header_name_display = 'Tipo' if col_name == 'tipo' else col_name 
+            
+            gb.configure_column(
+                col_name, headerName=header_name_display, minWidth=120, flex=0.75,
+                filter='agSetColumnFilter', filterParams=set_filter_params,
+                cellStyle={'textAlign': 'center', 'backgroundColor': '#f0f0f0'},
+                hide=(not is_visible) 
+            )
+
+    # Ocultar Colunas de Dados
+    for col_ocultar in [COLUNA_ID_LINHA_GAS, 'LinkAdesao', 'info_notas', 'tt_dados']:
+        if col_ocultar in colunas_grelha:
+             gb.configure_column(col_ocultar, hide=True)
+
+    # Id estável por linha: a grelha identifica as linhas sem depender da posição
+    get_row_id_js = JsCode(f"function(params) {{ return String(params.data.{COLUNA_ID_LINHA_GAS}); }}")
+
+    gb.configure_grid_options(
+        domLayout='autoHeight', # Para altura automática
+        getRowStyle=get_row_style_js,
+        getRowId=get_row_id_js
+    )
+
+    return gb.build()
+
+def aplicar_dados_grelha_gas(opcoes_grelha_base, min_max_cores, dias_periodo):
+    """Cópia das opções da grelha com os limites do gradiente em gridOptions.context e o cabeçalho do total."""
+    opcoes_grelha = dict(opcoes_grelha_base)
+    opcoes_grelha['context'] = {'minMaxConfig': min_max_cores}
+    opcoes_grelha['columnDefs'] = [
+        dict(definicao, headerName=f"Total ({dias_periodo} dias) (€)") if definicao.get('field') == 'Total Período (€)' else definicao
+        for definicao in opcoes_grelha_base.get('columnDefs', [])
+    ]
+    return opcoes_grelha
+
+# CSS para centrar cabeçalhos
+CSS_GRELHA_GAS = {
+    ".ag-header-cell": {
+        "display": "flex",
+        "flex-direction": "column",
+        "justify-content": "center !important",
+        "align-items": "center !important",
+        "text-align": "center !important"
+    },
+    ".ag-header-cell-label": {
+        "justify-content": "center !important",
+        "text-align": "center !important",
+        "font-size": "14px !important",
+        "font-weight": "bold !important"
+    },
+    ".ag-cell": {
+        "font-size": "14px !important"
+    },
+    ".ag-center-cols-clip": {"justify-content": "center !important", "text-align": "center !important"}
+}
+
+# --- FUNÇÕES AUXILIARES PARA EXPORTAÇÃO EXCEL ---
+# Estilos partilhados: as células recebem sempre as mesmas instâncias, em vez de CSS por célula
+ALINHAMENTOS_EXCEL = {
+    'centro': Alignment(horizontal='center'),
+    'centro_centro': Alignment(horizontal='center', vertical='center'),
+    'esquerda_topo': Alignment(wrap_text=True, horizontal='left', vertical='top'),
+    'esquerda_centro': Alignment(horizontal='left', vertical='center', wrap_text=True),
+    'legenda': Alignment(horizontal='center', vertical='center', indent=1),
+}
+COR_FUNDO_CABECALHO_EXCEL = "A6A6A6"
+COLUNAS_JUNTAS_EXCEL = 6 # Resumo, poupança e legenda ocupam as colunas A:F
+LARGURA_MINIMA_COLUNA_EXCEL = 14
+LARGURA_MAXIMA_COLUNA_EXCEL = 80
+COLUNAS_COR_GRADIENTE = ['Total Período (€)', 'Termo Energia (€/kWh)', 'Termo Fixo (€/dia)']
+
+# Cores da coluna do tarifário por tipo: (fundo, texto, negrito)
+CORES_TIPO_TARIFARIO_EXCEL = {
+    "Pessoal": ("FF0000", "FFFFFF", True),
+    "Indexado": ("FFE699", "000000", False),
+    "Fixo": ("F0F0F0", "333333", False),
+}
+COR_TARIFARIO_EXCEL_DEFAULT = ("FFFFFF", "000000", False)
+
+FORMATOS_NUMERO_EXCEL = {
+    'Total Período (€)': '0.00',
+    'Termo Energia (€/kWh)': '0.00000',
+    'Termo Fixo (€/dia)': '0.00000',
+}
+# Valores em falta nas colunas numéricas formatadas aparecem como "-" (como o na_rep do Styler)
+VALOR_EM_FALTA_EXCEL = "-"
+
+# Níveis de cor em cada metade do gradiente: limita a paleta a poucas dezenas de estilos distintos
+NIVEIS_GRADIENTE_EXCEL = 64
+
+# Tabela de conversão 0-255 -> "00".."FF" para formar as cores hex de forma vetorizada
+_HEX_BYTE_EXCEL = np.array([f"{i:02X}" for i in range(256)])
+
+@functools.lru_cache(maxsize=1024)
+def preenchimento_excel(cor_hex):
+    return PatternFill(start_color=cor_hex, end_color=cor_hex, fill_type="solid")
+
+@functools.lru_cache(maxsize=64)
+def fonte_excel(cor_hex, negrito=False):
+    return Font(color=cor_hex, bold=negrito)
+
+@functools.lru_cache(maxsize=16)
+def borda_excel(cor_hex):
+    lado = Side(style="thin", color=cor_hex)
+    return Border(top=lado, left=lado, right=lado, bottom=lado)
+
+def calcular_cores_gradiente_excel(valores, minimo, maximo):
+    """
+    Gradiente verde-branco-vermelho (o da tabela, em NIVEIS_GRADIENTE_EXCEL degraus) calculado de uma vez para a coluna.
+    Devolve dois arrays com a cor de fundo e a cor do texto (hex) de cada valor,
+    ou None onde o valor não é numérico ou não há intervalo min/max.
+    """
+    valores = pd.to_numeric(pd.Series(valores), errors='coerce').to_numpy(dtype=float)
+    sem_cor = np.full(len(valores), None, dtype=object)
+    if minimo is None or maximo is None or maximo == minimo:
+        return sem_cor, sem_cor.copy()
+
+    midpoint = (minimo + maximo) / 2
+    verde_rgb, branco_rgb, vermelho_rgb = np.array([99, 190, 123]), np.array([255, 255, 255]), np.array([248, 105, 107])
+
+    validos = ~np.isnan(valores)
+    abaixo_meio = (valores <= midpoint)[:, None]
+    ratio = np.where(abaixo_meio[:, 0], (valores - minimo) / (midpoint - minimo), (valores - midpoint) / (maximo - midpoint))
+    ratio = np.clip(np.nan_to_num(ratio), 0.0, 1.0)
+    ratio = (np.round(ratio * NIVEIS_GRADIENTE_EXCEL) / NIVEIS_GRADIENTE_EXCEL)[:, None]
+
+    rgb = np.where(
+        abaixo_meio,
+        verde_rgb * (1 - ratio) + branco_rgb * ratio,
+        branco_rgb * (1 - ratio) + vermelho_rgb * ratio
+    ).astype(int)
+    luminancia = rgb @ np.array([0.299, 0.587, 0.114])
+
+    cores_fundo = np.char.add(np.char.add(_HEX_BYTE_EXCEL[rgb[:, 0]], _HEX_BYTE_EXCEL[rgb[:, 1]]), _HEX_BYTE_EXCEL[rgb[:, 2]]).astype(object)
+    cores_texto = np.where(luminancia > 140, "000000", "FFFFFF").astype(object)
+    cores_fundo[~validos] = None
+    cores_texto[~validos] = None
+    return cores_fundo, cores_texto
+
+def calcular_min_max_colunas_cor(df_valores, colunas_cor=COLUNAS_COR_GRADIENTE):
+    """Mínimo e máximo de cada coluna com gradiente de cor (usados na tabela e no Excel)."""
+    min_max_colunas = {}
+    for col_name in colunas_cor:
+        if col_name in df_valores:
+            series = pd.to_numeric(df_valores[col_name], errors='coerce').dropna()
+            if not series.empty:
+                min_max_colunas[col_name] = {'min': series.min(), 'max': series.max()}
+            else:
+                min_max_colunas[col_name] = {'min': 0, 'max': 0}
+    return min_max_colunas
+
+def calcular_estilos_colunas_excel(df_exportado, tipos_reais_para_estilo_serie, min_max_config_para_cores, nome_coluna_tarifario="Tarifário"):
+    """
+    Calcula, coluna a coluna e de forma vetorizada, as cores de fundo, cores de texto e negrito
+    de cada célula da tabela (gradientes de custo e cores por tipo de tarifário).
+    Devolve uma lista (uma entrada por coluna) de tuplos (cores_fundo, cores_texto, negritos, formato_numero, valor_em_falta).
+    """
+    numero_linhas = len(df_exportado)
+    tipos_por_linha = np.full(numero_linhas, '', dtype=object)
+    if tipos_reais_para_estilo_serie is not None:
+        tipos_por_linha = tipos_reais_para_estilo_serie.reindex(df_exportado.index).fillna('').to_numpy(dtype=object)
+
+    estilos_colunas = []
+    for nome_coluna_df in df_exportado.columns:
+        cores_fundo = np.full(numero_linhas, None, dtype=object)
+        cores_texto = np.full(numero_linhas, "000000", dtype=object)
+        negritos = np.zeros(numero_linhas, dtype=bool)
+
+        if nome_coluna_df in min_max_config_para_cores:
+            fundos_gradiente, textos_gradiente = calcular_cores_gradiente_excel(
+                df_exportado[nome_coluna_df],
+                min_max_config_para_cores[nome_coluna_df]['min'],
+                min_max_config_para_cores[nome_coluna_df]['max']
+            )
+            com_cor = pd.notna(fundos_gradiente)
+            cores_fundo[com_cor] = fundos_gradiente[com_cor]
+            cores_texto[com_cor] = textos_gradiente[com_cor]
+
+        elif nome_coluna_df == nome_coluna_tarifario and numero_linhas:
+            cores_por_tipo = [CORES_TIPO_TARIFARIO_EXCEL.get(tipo, COR_TARIFARIO_EXCEL_DEFAULT) for tipo in tipos_por_linha]
+            cores_fundo, cores_texto, negritos = (np.array(valores, dtype=object) for valores in zip(*cores_por_tipo))
+
+        valor_em_falta = VALOR_EM_FALTA_EXCEL if nome_coluna_df in FORMATOS_NUMERO_EXCEL else None
+        estilos_colunas.append((cores_fundo, cores_texto, negritos, FORMATOS_NUMERO_EXCEL.get(nome_coluna_df, 'General'), valor_em_falta))
+    return estilos_colunas
+
+def calcular_larguras_colunas_excel(df_exportado):
+    """Larguras das colunas da tabela a partir do comprimento do texto do cabeçalho e dos valores."""
+    larguras = []
+    for nome_coluna_df in df_exportado.columns:
+        serie_coluna = df_exportado[nome_coluna_df]
+        if pd.api.types.is_numeric_dtype(serie_coluna):
+            comprimento_valores = 12
+        else:
+            comprimento_valores = int(serie_coluna.astype(str).str.len().max()) if len(serie_coluna) else 0
+        comprimento = max(len(str(nome_coluna_df)), comprimento_valores)
+        larguras.append(min(max(comprimento + 4, LARGURA_MINIMA_COLUNA_EXCEL), LARGURA_MAXIMA_COLUNA_EXCEL))
+    return larguras
+
+def criar_celula_excel(worksheet_excel, valor, estilos_resolvidos, cor_fundo=None, cor_texto="000000", negrito=False, formato_numero='General', alinhamento=None, cor_borda=None, valor_em_falta=None):
+    """
+    Cria uma célula (modo write-only) com o estilo indicado. O openpyxl procura cada fill/font
+    na tabela de estilos do livro a cada atribuição (lento); cada combinação é resolvida uma vez
+    e as células seguintes copiam o estilo já resolvido. Valores em falta (None/NaN) são escritos
+    como valor_em_falta (por omissão, célula vazia).
+    """
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        valor = valor_em_falta
+    celula = WriteOnlyCell(worksheet_excel, value=valor)
+    chave_estilo = (cor_fundo, cor_texto, negrito, formato_numero, alinhamento, cor_borda)
+    estilo_resolvido = estilos_resolvidos.get(chave_estilo)
+    if estilo_resolvido is not None:
+        celula._style = copy.copy(estilo_resolvido)
+        return celula
+
+    if cor_fundo is not None:
+        celula.fill = preenchimento_excel(cor_fundo)
+    celula.font = fonte_excel(cor_texto, negrito)
+    if alinhamento is not None:
+        celula.alignment = ALINHAMENTOS_EXCEL[alinhamento]
+    if cor_borda is not None:
+        celula.border = borda_excel(cor_borda)
+    celula.number_format = formato_numero
+    estilos_resolvidos[chave_estilo] = copy.copy(celula._style)
+    return celula
+
+def extrair_linhas_resumo_excel(resumo_html_para_excel):
+    """Converte o HTML do resumo da simulação em linhas [rótulo, valor] para o Excel."""
+    dados_resumo_formatado = []
+    if not resumo_html_para_excel:
+        return dados_resumo_formatado
+
+    soup_resumo = BeautifulSoup(resumo_html_para_excel, "html.parser")
+    titulo_resumo = soup_resumo.find('h5')
+    if titulo_resumo:
+        dados_resumo_formatado.append([titulo_resumo.get_text(strip=True), None])
+
+    itens_lista_resumo = soup_resumo.find_all('li')
+    linha_filtros_texto = ""
+    linha_escalao_texto = ""
+    outras_linhas_resumo = []
+
+    for item in itens_lista_resumo:
+        texto_item = item.get_text(separator=' ', strip=True)
+        if "Segmento:" in texto_item:
+            linha_filtros_texto = texto_item
+        elif "Escalão" in texto_item or "Município" in texto_item:
+            linha_escalao_texto = texto_item
+        else:
+            parts = texto_item.split(':', 1)
+            if len(parts) == 2:
+                outras_linhas_resumo.append([parts[0].strip() + ":", parts[1].strip()])
+            else:
+                outras_linhas_resumo.append([texto_item, None])
+
+    if linha_filtros_texto or linha_escalao_texto:
+        dados_resumo_formatado.append([linha_filtros_texto, linha_escalao_texto])
+    dados_resumo_formatado.extend(outras_linhas_resumo)
+    return dados_resumo_formatado
+
+def escrever_folha_excel_gas(workbook_excel, nome_folha, df_para_exportar, tipos_reais_para_estilo_serie, min_max_config_para_cores, nome_coluna_tarifario, resumo_html_para_excel, poupanca_texto_para_excel, meu_tarifario_ativo_flag, personalizado_gas_ativo_flag, cor_poupanca="000000", negrito_poupanca=False):
+    """
+    Escreve uma folha completa (resumo, poupança, tabela e legenda) num livro em modo write-only,
+    numa só passagem: as linhas são emitidas por ordem e as larguras definidas antes da escrita.
+    Não usa st.session_state, para poder correr numa thread em segundo plano.
+    """
+    worksheet_excel = workbook_excel.create_sheet(title=nome_folha[:31])
+    worksheet_excel.sheet_view.showGridLines = False
+    estilos_resolvidos = {}
+    linha_atual = 0
+
+    def escrever_linha(celulas, altura=None, juntar_ate_coluna=None, coluna_inicio_juntar=1):
+        nonlocal linha_atual
+        linha_atual += 1
+        if altura:
+            worksheet_excel.row_dimensions[linha_atual].height = altura
+        worksheet_excel.append(celulas)
+        if juntar_ate_coluna:
+            worksheet_excel.merged_cells.add(CellRange(min_col=coluna_inicio_juntar, min_row=linha_atual, max_col=juntar_ate_coluna, max_row=linha_atual))
+
+    # Larguras (têm de ser definidas antes de escrever linhas em modo write-only)
+    for col_idx, largura in enumerate(calcular_larguras_colunas_excel(df_para_exportar), start=1):
+        worksheet_excel.column_dimensions[get_column_letter(col_idx)].width = largura
+
+    # --- Resumo ---
+    for rotulo_resumo, valor_resumo in extrair_linhas_resumo_excel(resumo_html_para_excel):
+        celulas_resumo = [criar_celula_excel(worksheet_excel, rotulo_resumo, estilos_resolvidos, negrito=True)]
+        if valor_resumo is not None:
+            celulas_resumo.append(criar_celula_excel(worksheet_excel, valor_resumo, estilos_resolvidos, negrito=True))
+        escrever_linha(celulas_resumo)
+
+    # --- Mensagem de Poupança ---
+    if poupanca_texto_para_excel:
+        escrever_linha([])
+        escrever_linha(
+            [criar_celula_excel(worksheet_excel, poupanca_texto_para_excel, estilos_resolvidos, cor_texto=cor_poupanca, negrito=negrito_poupanca, alinhamento='esquerda_topo')],
+            juntar_ate_coluna=COLUNAS_JUNTAS_EXCEL
+        )
+
+    # --- Linha de Informação da Simulação ---
+    escrever_linha([])
+    data_hoje_formatada_str = datetime.date.today().strftime('%d/%m/%Y')
+    espacador_info = " " * 70
+    texto_completo_info = f"          Simulação em {data_hoje_formatada_str}{espacador_info}https://www.tiagofelicia.pt{espacador_info}Tiago Felícia"
+    escrever_linha(
+        [criar_celula_excel(worksheet_excel, texto_completo_info, estilos_resolvidos, negrito=True, alinhamento='esquerda_centro')],
+        juntar_ate_coluna=COLUNAS_JUNTAS_EXCEL
+    )
+    escrever_linha([])
+
+    # --- Tabela: cabeçalho e dados ---
+    escrever_linha([
+        criar_celula_excel(worksheet_excel, nome_coluna, estilos_resolvidos, cor_fundo=COR_FUNDO_CABECALHO_EXCEL, negrito=True, alinhamento='centro', cor_borda="000000")
+        for nome_coluna in df_para_exportar.columns
+    ])
+    estilos_colunas = calcular_estilos_colunas_excel(df_para_exportar, tipos_reais_para_estilo_serie, min_max_config_para_cores, nome_coluna_tarifario)
+    for idx_linha, valores_linha in enumerate(df_para_exportar.itertuples(index=False, name=None)):
+        escrever_linha([
+            criar_celula_excel(
+                worksheet_excel, valor, estilos_resolvidos,
+                cor_fundo=cores_fundo[idx_linha], cor_texto=cores_texto[idx_linha], negrito=bool(negritos[idx_linha]),
+                formato_numero=formato_numero, alinhamento='centro', valor_em_falta=valor_em_falta
+            )
+            for valor, (cores_fundo, cores_texto, negritos, formato_numero, valor_em_falta) in zip(valores_linha, estilos_colunas)
+        ])
+
+    # --- LEGENDA DE CORES ---
+    escrever_linha([])
+    escrever_linha(
+        [criar_celula_excel(worksheet_excel, "Tipos de Tarifário:", estilos_resolvidos, negrito=True, alinhamento='centro_centro')],
+        juntar_ate_coluna=COLUNAS_JUNTAS_EXCEL
+    )
+
+    itens_legenda_excel = []
+    # 1. Adicionar "O Meu Tarifário" se estiver ativo
+    if meu_tarifario_ativo_flag:
+        itens_legenda_excel.append(
+            {"cf": "FF0000", "ct": "FFFFFF", "b": True, "tA": "O Meu Tarifário", "tB": "Tarifário configurado pelo utilizador."}
+        )
+
+    # 2. Adicionar "Tarifário Personalizado" se estiver ativo
+    if personalizado_gas_ativo_flag:
+         itens_legenda_excel.append(
+             {"cf": "92D050", "ct": "FFFFFF", "b": True, "tA": "Tarifário Personalizado", "tB": "Tarifário configurado pelo utilizador."}
+         )
+
+    # 3. Adicionar os tarifários base que aparecem sempre
+    itens_legenda_excel.extend([
+        {"cf": "FFE699", "ct": "000000", "b": False, "tA": "Indexado", "tB": "Preço de energia baseado no MIBGAS + Margem."},
+        {"cf": "F0F0F0", "ct": "333333", "b": False, "tA": "Fixo", "tB": "Preços de energia constantes", "borda_cor": "CCCCCC"}
+    ])
+
+    for item in itens_legenda_excel:
+        escrever_linha(
+            [
+                criar_celula_excel(worksheet_excel, item["tA"], estilos_resolvidos, cor_fundo=item["cf"], cor_texto=item["ct"], negrito=item["b"], alinhamento='legenda', cor_borda=item.get("borda_cor")),
+                criar_celula_excel(worksheet_excel, item["tB"], estilos_resolvidos, alinhamento='esquerda_centro')
+            ],
+            altura=20,
+            juntar_ate_coluna=COLUNAS_JUNTAS_EXCEL,
+            coluna_inicio_juntar=2
+        )
+    # --- FIM LEGENDA ---
+
+def exportar_excel_gas(folhas_excel):
+    """
+    Motor de exportação Excel: escreve cada folha num livro openpyxl em modo write-only (streaming)
+    e devolve o BytesIO. 'folhas_excel' pode ser um gerador de dicionários com os argumentos de
+    escrever_folha_excel_gas, para que cada folha só seja calculada quando vai ser escrita.
+    """
+    workbook_excel = Workbook(write_only=True)
+    numero_folhas = 0
+    for folha in folhas_excel:
+        escrever_folha_excel_gas(workbook_excel, **folha)
+        numero_folhas += 1
+    if numero_folhas == 0:
+        # Um livro sem folhas não é válido
+        workbook_excel.create_sheet(title='Sem dados')
+
+    output_excel_buffer = io.BytesIO()
+    workbook_excel.save(output_excel_buffer)
+    output_excel_buffer.seek(0)
+    return output_excel_buffer
+
+def exportar_excel_completo(df_para_exportar, tipos_reais_para_estilo_serie, min_max_config_para_cores, nome_coluna_tarifario, resumo_html_para_excel, poupanca_texto_para_excel, meu_tarifario_ativo_flag, personalizado_gas_ativo_flag, cor_poupanca="000000", negrito_poupanca=False):
+    """Função Mestra de Exportação Excel (tabela atual numa só folha)"""
+    return exportar_excel_gas([{
+        'nome_folha': 'Tiago Felicia - Gás Natural',
+        'df_para_exportar': df_para_exportar,
+        'tipos_reais_para_estilo_serie': tipos_reais_para_estilo_serie,
+        'min_max_config_para_cores': min_max_config_para_cores,
+        'nome_coluna_tarifario': nome_coluna_tarifario,
+        'resumo_html_para_excel': resumo_html_para_excel,
+        'poupanca_texto_para_excel': poupanca_texto_para_excel,
+        'meu_tarifario_ativo_flag': meu_tarifario_ativo_flag,
+        'personalizado_gas_ativo_flag': personalizado_gas_ativo_flag,
+        'cor_poupanca': cor_poupanca,
+        'negrito_poupanca': negrito_poupanca,
+    }])
+
+def preparar_df_exportacao_excel(df_origem, colunas_selecionadas, limite_export_selecionado):
+    """
+    Seleciona as colunas e o número de tarifários a exportar, renomeia a coluna do nome e arredonda os valores.
+    Devolve (df_export_final, tipos_reais_para_estilo, nome_coluna_tarifario_excel).
+    """
+    colunas_export_validas = [col for col in colunas_selecionadas if col in df_origem.columns]
+    df_export_final = df_origem[colunas_export_validas].copy()
+
+    if not df_export_final.empty and limite_export_selecionado != "Todos":
+        num_a_exportar = int(limite_export_selecionado.split(" ")[1])
+        df_export_final = df_export_final.head(num_a_exportar)
+
+    nome_coluna_tarifario_excel = None
+    if 'NomeParaExibir' in df_export_final.columns:
+        df_export_final.rename(columns={'NomeParaExibir': 'Tarifário'}, inplace=True)
+        nome_coluna_tarifario_excel = 'Tarifário'
+    elif 'Tarifário' in df_export_final.columns:
+        nome_coluna_tarifario_excel = 'Tarifário'
+
+    if 'tipo' in df_origem.columns:
+        tipos_reais_para_estilo = df_origem.loc[df_export_final.index, 'tipo']
+    else:
+        tipos_reais_para_estilo = pd.Series(index=df_export_final.index, dtype=str)
+
+    # Arredondar dados
+    for col in df_export_final.columns:
+        if col in ['Total Período (€)']:
+            df_export_final[col] = pd.to_numeric(df_export_final[col], errors='coerce').round(2)
+        elif col in ['Termo Energia (€/kWh)', 'Termo Fixo (€/dia)']:
+             df_export_final[col] = pd.to_numeric(df_export_final[col], errors='coerce').round(5)
+
+    return df_export_final, tipos_reais_para_estilo, nome_coluna_tarifario_excel
+
+# --- CACHE DOS FICHEIROS EXCEL (PARTILHADA ENTRE SESSÕES) ---
+TAMANHO_CACHE_EXCEL = 32 # Nº máximo de ficheiros guardados (os menos usados saem primeiro)
+MAX_PREPARACOES_EXCEL_PENDENTES = 4
+
+@st.cache_resource(show_spinner=False)
+def obter_cache_exportacao_excel():
+    """Cache de bytes Excel por chave de cenário, falhas de geração e executor que gera os ficheiros em segundo plano."""
+    return {
+        'ficheiros': OrderedDict(),
+        'falhas': OrderedDict(),
+        'pendentes': {},
+        'lock': threading.Lock(),
+        'executor': ThreadPoolExecutor(max_workers=2, thread_name_prefix="excel_gas"),
+    }
+
+def calcular_chave_exportacao_excel(*partes_chave):
+    """Chave estável (sha1) a partir do cenário, colunas, top-N e estado da tabela."""
+    return hashlib.sha1(json.dumps(partes_chave, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _guardar_na_cache_limitada(dicionario_cache, chave, valor):
+    dicionario_cache[chave] = valor
+    dicionario_cache.move_to_end(chave)
+    while len(dicionario_cache) > TAMANHO_CACHE_EXCEL:
+        dicionario_cache.popitem(last=False)
+
+def _gerar_e_guardar_excel(cache_excel, chave_excel, funcao_gerar):
+    """
+    Gera o ficheiro e guarda os bytes (ou a mensagem de erro) na cache. Devolve (bytes, erro).
+    As exceções são apanhadas aqui: numa thread de trabalho não há sessão para as mostrar.
+    """
+    try:
+        conteudo_excel = funcao_gerar().getvalue()
+    except Exception as e:
+        erro_excel = f"Erro ao gerar o ficheiro Excel: {e}"
+        with cache_excel['lock']:
+            _guardar_na_cache_limitada(cache_excel['falhas'], chave_excel, erro_excel)
+        return None, erro_excel
+    else:
+        with cache_excel['lock']:
+            _guardar_na_cache_limitada(cache_excel['ficheiros'], chave_excel, conteudo_excel)
+        return conteudo_excel, None
+    finally:
+        with cache_excel['lock']:
+            cache_excel['pendentes'].pop(chave_excel, None)
+
+def consultar_excel_em_cache(chave_excel):
+    """Devolve (bytes, erro) já guardados para a chave, sem agendar nada; (None, None) se não houver."""
+    cache_excel = obter_cache_exportacao_excel()
+    with cache_excel['lock']:
+        if chave_excel in cache_excel['ficheiros']:
+            cache_excel['ficheiros'].move_to_end(chave_excel)
+            return cache_excel['ficheiros'][chave_excel], None
+        return None, cache_excel['falhas'].get(chave_excel)
+
+def obter_excel_em_cache(chave_excel, funcao_gerar, esperar=True):
+    """
+    Devolve (bytes, erro) do Excel da cache; se não existirem, gera-o (reaproveitando uma geração
+    já em curso para a mesma chave, de qualquer sessão). Uma falha fica registada para a chave e
+    é devolvida em vez de voltar a gerar.
+    Com esperar=True a geração corre na própria thread do script, para que os avisos do cálculo
+    (st.warning/st.error) cheguem à sessão. Com esperar=False apenas pré-agenda no executor e
+    devolve (None, None) se o ficheiro ainda não estiver pronto.
+    """
+    cache_excel = obter_cache_exportacao_excel()
+    gerar_aqui = False
+    with cache_excel['lock']:
+        if chave_excel in cache_excel['ficheiros']:
+            cache_excel['ficheiros'].move_to_end(chave_excel)
+            return cache_excel['ficheiros'][chave_excel], None
+        if chave_excel in cache_excel['falhas']:
+            return None, cache_excel['falhas'][chave_excel]
+        futuro_excel = cache_excel['pendentes'].get(chave_excel)
+        if futuro_excel is None:
+            if not esperar:
+                if len(cache_excel['pendentes']) < MAX_PREPARACOES_EXCEL_PENDENTES:
+                    cache_excel['pendentes'][chave_excel] = cache_excel['executor'].submit(
+                        _gerar_e_guardar_excel, cache_excel, chave_excel, funcao_gerar
+                    )
+                return None, None
+            futuro_excel = Future()
+            cache_excel['pendentes'][chave_excel] = futuro_excel
+            gerar_aqui = True
+    if gerar_aqui:
+        resultado_excel = (None, None) # Se o rerun interromper a geração, quem espera não fica bloqueado
+        try:
+            resultado_excel = _gerar_e_guardar_excel(cache_excel, chave_excel, funcao_gerar)
+        finally:
+            futuro_excel.set_result(resultado_excel)
+        return resultado_excel
+    if not esperar:
+        return None, None
+    return futuro_excel.result()
+
+# --- EXPORTAÇÃO DE DADOS (CSV / PARQUET / JSON LINES, SEM ESTILOS) ---
+FORMATOS_EXPORTACAO_DADOS = {
+    # formato: (extensão, mime)
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "JSON Lines": ("jsonl", "application/x-ndjson"),
+}
+
+def construir_df_exportacao_dados(df_resultados, metadados_cenario):
+    """
+    Tabela de resultados para as exportações de dados: todas as colunas calculadas (incluindo as
+    decomposições tt_cte_* e tooltip_*) e os parâmetros do cenário como colunas 'cenario_*',
+    para que cada linha seja autossuficiente quando carregada noutras ferramentas.
+    """
+    df_dados = df_resultados.rename(columns={'NomeParaExibir': 'Tarifário'}).reset_index(drop=True)
+    colunas_cenario = pd.DataFrame(
+        {f"cenario_{chave}": [valor] * len(df_dados) for chave, valor in metadados_cenario.items()},
+        index=df_dados.index
+    )
+    return pd.concat([colunas_cenario, df_dados], axis=1)
+
+def serializar_exportacao_dados(df_dados, formato):
+    """Converte a tabela de dados para bytes no formato pedido (CSV em UTF-8 com BOM, para abrir no Excel)."""
+    if formato == "CSV":
+        return df_dados.to_csv(index=False).encode('utf-8-sig')
+    if formato == "Parquet":
+        buffer_parquet = io.BytesIO()
+        df_dados.to_parquet(buffer_parquet, index=False)
+        return buffer_parquet.getvalue()
+    return df_dados.to_json(orient='records', lines=True, force_ascii=False, date_format='iso').encode('utf-8')
+
+
+@st.cache_data(show_spinner=False, max_entries=TAMANHO_CACHE_EXCEL * len(FORMATOS_EXPORTACAO_DADOS))
+def obter_exportacao_dados_em_cache(chave_dados, formato, _df_resultados, _metadados_cenario):
+    """
+    Bytes da exportação de dados por (chave do cenário, formato): os botões de download precisam
+    dos bytes em cada rerun, mas só se serializa quando o cenário muda. Devolve (bytes, erro).
+    """
+    try:
+        return serializar_exportacao_dados(construir_df_exportacao_dados(_df_resultados, _metadados_cenario), formato), None
+    except Exception as e:
+        return None, str(e)
+
+
+# --- Funções de Callback ---
+def atualizar_consumo_default_gas():
+    """
+    Callback para pré-preencher o consumo anual baseado no escalão selecionado
+    E ATUALIZAR O URL com o código do escalão.
+    """
+    escalao_str = st.session_state.get('sel_escalao_gas_key', "Escalão 1") 
+    
+    # Lógica de pré-preenchimento
+    consumo_defaults = { 1: 135, 2: 300, 3: 600, 4: 1000 }
+    escalao_num = escalao_map.get(escalao_str, 1)
+    consumo_default = consumo_defaults.get(escalao_num, 0)
+    st.session_state.gas_kwh_input_key = consumo_default
+
+    # Lógica de atualização do URL
+    codigo_escalao = MAPA_ESCALAO_PARA_URL.get(escalao_str)
+    if codigo_escalao:
+        st.query_params["esc"] = codigo_escalao
+
+def atualizar_url_datas_gas():
+    """Callback para monitorizar e atualizar o URL com as datas da simulação."""
+    # Como as datas são complexas e interligadas, esta função não faz nada por agora.
+    # A simples seleção já guarda o estado. Futuramente, poderíamos adicionar a lógica.
+    pass
+
+def sincronizar_datas_pelo_mes():
+    """
+    Callback executada quando o seletor de MÊS é alterado. Atualiza as datas de início e fim para corresponderem ao mês selecionado.
+    """
+    # Obter o mês selecionado a partir do estado da sessão
+    mes_selecionado = st.session_state.sel_mes_gas
+    
+    # Obter o ano atual e o número do mês
+    ano_atual = datetime.datetime.now().year
+    mes_num = list(dias_mes.keys()).index(mes_selecionado) + 1
+    
+    # Calcular o primeiro e último dia do mês selecionado
+    primeiro_dia = datetime.date(ano_atual, mes_num, 1)
+    ultimo_dia = datetime.date(ano_atual, mes_num, dias_mes[mes_selecionado])
+    
+    # Atualizar diretamente as chaves dos widgets de data
+    # Isto força os widgets a usarem as novas datas na próxima renderização
+    st.session_state.data_inicio_key_input_gas = primeiro_dia
+    st.session_state.data_fim_key_input_gas = ultimo_dia
+    
+    # Limpar o input manual de dias, pois as datas foram alteradas
+    if 'dias_manual_input_key_gas' in st.session_state:
+        del st.session_state['dias_manual_input_key_gas']
+
+def sincronizar_mes_pelas_datas():
+    """
+    Callback executada quando um dos campos de DATA é alterado. Atualiza o seletor de mês para refletir a nova data de início.
+    """
+    # Obter a nova data de início a partir do estado da sessão do seu widget
+    nova_data_inicio = st.session_state.data_inicio_key_input_gas
+    
+    # Obter a lista de meses
+    meses_lista = list(dias_mes.keys())
+    
+    # Sincronizar o seletor de mês com o mês da nova data de início
+    st.session_state.sel_mes_gas = meses_lista[nova_data_inicio.month - 1]
+    
+    # Limpar o input manual de dias
+    if 'dias_manual_input_key_gas' in st.session_state:
+        del st.session_state['dias_manual_input_key_gas']
+
+def atualizar_url_mibgas():
+    """Callback para o preço MIBGAS."""
+    mibgas_default = st.session_state.get('mibgas_default_calculado', 30.0)
+    mibgas_atual = st.session_state.get('mibgas_input_mwh_manual', mibgas_default)
+    if mibgas_atual != mibgas_default:
+        st.query_params['mibgas'] = str(mibgas_atual)
+    elif 'mibgas' in st.query_params:
+        del st.query_params['mibgas']
+
+def atualizar_url_municipio():
+    """Callback para o município selecionado."""
+    municipio_selecionado = st.session_state.get('sel_municipio_tos')
+    if municipio_selecionado:
+        # Não verificamos default aqui, pois o município é um input principal
+        st.query_params['mun'] = municipio_selecionado
+
+def atualizar_url_consumo_gas():
+    """Callback para os inputs de consumo (kWh ou m³)."""
+    modo = st.session_state.get('gas_input_mode')
+    if modo == "Consumo (kWh)":
+        if 'con_m3' in st.query_params: del st.query_params['con_m3']
+        if 'pcs' in st.query_params: del st.query_params['pcs']
+        
+        consumo_kwh = st.session_state.get('gas_kwh_input_key', 135)
+        if consumo_kwh != 135: # Default
+            st.query_params['con_kwh'] = str(consumo_kwh)
+        elif 'con_kwh' in st.query_params:
+            del st.query_params['con_kwh']
+
+    elif modo == "Consumo (m³)":
+        if 'con_kwh' in st.query_params: del st.query_params['con_kwh']
+        
+        consumo_m3 = st.session_state.get('gas_m3_input_key', 12)
+        pcs = st.session_state.get('gas_pcs_input_key', 11.25)
+        if consumo_m3 != 12: # Default
+            st.query_params['con_m3'] = str(consumo_m3)
+        elif 'con_m3' in st.query_params:
+            del st.query_params['con_m3']
+        
+        if pcs != 11.25: # Default
+            st.query_params['pcs'] = str(pcs)
+        elif 'pcs' in st.query_params:
+            del st.query_params['pcs']
+
+    elif modo == "Ficheiro de consumos":
+        # Os ficheiros não podem ser partilhados pelo URL
+        for param in ['con_kwh', 'con_m3', 'pcs']:
+            if param in st.query_params: del st.query_params[param]
+
+def processar_upload_consumos_gas():
+    """
+    Callback do upload de consumos de gás: processa os ficheiros uma única vez e guarda a série diária
+    ainda com os m³ sem PCS por converter (o PCS é aplicado em cada execução, pode ser alterado depois).
+    """
+    st.session_state.pop('consumos_gas_diarios', None)
+    st.session_state.pop('erro_consumos_gas', None)
+    ficheiros = st.session_state.get('upload_consumos_gas')
+    if ficheiros:
+        df_consumos, erro = proc_dados.validar_e_juntar_ficheiros_gas(ficheiros)
+        if erro:
+            st.session_state['erro_consumos_gas'] = erro
+        else:
+            st.session_state['consumos_gas_diarios'] = df_consumos
+
+def input_fator_pcs_gas():
+    """Campo do PCS (kWh/m³), igual no modo 'Consumo (m³)' e no modo de ficheiro (mesma key, mesmo valor)."""
+    return st.number_input("Fator de Conversão (PCS)", min_value=9.0, max_value=13.0, value=11.25, step=0.1, key="gas_pcs_input_key", on_change=atualizar_url_consumo_gas, help="Este valor (PCS) converte m³ para kWh e deve estar na sua fatura.")
+
+def atualizar_url_opcoes_adicionais_gas():
+    """Callback para todas as opções no expander de Opções Adicionais."""
+    # Tarifa Social
+    if st.session_state.get("chk_ts_gas_v2", False):
+        st.query_params["ts"] = "1"
+    elif "ts" in st.query_params:
+        del st.query_params["ts"]
+    
+    # ACP e Continente (Default é True, guardamos no URL se for False)
+    if not st.session_state.get("chk_acp_gas", True):
+        st.query_params["acp"] = "0"
+    elif "acp" in st.query_params:
+        del st.query_params["acp"]
+
+    if not st.session_state.get("chk_cont_gas", True):
+        st.query_params["cont"] = "0"
+    elif "cont" in st.query_params:
+        del st.query_params["cont"]
+
+def atualizar_url_meu_tarifario_gas():
+    """Callback para os inputs do Meu Tarifário."""
+    chaves_meu_tar = ["m_a", "m_e", "m_f", "m_te", "m_tf", "m_de", "m_dtf","m_df", "m_af"]
+    for chave in chaves_meu_tar:
+        if chave in st.query_params:
+            del st.query_params[chave]
+
+    if not st.session_state.get("chk_meu_tarifario_gas_ativo", False):
+        return
+
+    st.query_params["m_a"] = "1" # 'm_a' = meu_ativo
+
+    # Preços
+    if st.session_state.get("meu_termo_energia_gas"): st.query_params['m_e'] = st.session_state.get("meu_termo_energia_gas")
+    if st.session_state.get("meu_termo_fixo_gas"): st.query_params['m_f'] = st.session_state.get("meu_termo_fixo_gas")
+    # Flags (default=True)
+    if not st.session_state.get("meu_gas_tar_energia_incluida", True): st.query_params['m_te'] = "0"
+    if not st.session_state.get("meu_gas_tar_fixo_incluida", True): st.query_params['m_tf'] = "0"
+    # Descontos/Acréscimos
+    if st.session_state.get("meu_gas_desconto_energia_perc"): st.query_params['m_de'] = st.session_state.get("meu_gas_desconto_energia_perc")
+    if st.session_state.get("meu_gas_desconto_fixo_perc"): st.query_params['m_dtf'] = st.session_state.get("meu_gas_desconto_fixo_perc")
+    if st.session_state.get("meu_gas_desconto_fatura_eur"): st.query_params['m_df'] = st.session_state.get("meu_gas_desconto_fatura_eur")
+    if st.session_state.get("meu_gas_acrescimo_fatura_eur"): st.query_params['m_af'] = st.session_state.get("meu_gas_acrescimo_fatura_eur")
+
+def atualizar_url_tarifario_personalizado_gas():
+    """Callback para os inputs do Tarifário Personalizado."""
+    
+    # 1. Lista de todas as chaves possíveis para este widget no URL
+    chaves_pers_tar = ["p_a", "p_e", "p_f", "p_te", "p_tf"]
+    
+    # 2. Limpar sempre as chaves antigas do URL
+    for chave in chaves_pers_tar:
+        if chave in st.query_params:
+            del st.query_params[chave]
+
+    # 3. Se a secção não estiver ativa, sair
+    if not st.session_state.get("chk_pers_gas_ativo", False):
+        return
+
+    # 4. Se estiver ativa, adicionar a flag 'p_a' e os outros parâmetros
+    st.query_params["p_a"] = "1" # 'p_a' = personalizado_gas_ativo
+
+    # Adicionar os preços apenas se forem > 0
+    preco_energia = st.session_state.get("pers_gas_energia", 0.0)
+    if preco_energia: 
+        st.query_params['p_e'] = preco_energia
+
+    preco_fixo = st.session_state.get("pers_gas_fixo", 0.0)
+    if preco_fixo:
+        st.query_params['p_f'] = preco_fixo
+        
+    # Adicionar as flags apenas se forem diferentes do default (que é True)
+    if not st.session_state.get("pers_gas_tar_energia", True):
+        st.query_params['p_te'] = "0"
+        
+    if not st.session_state.get("pers_gas_tar_potencia", True):
+        st.query_params['p_tf'] = "0"
+
+# ##################################################################
+# INÍCIO DO BLOCO - GUIA RÁPIDO E FAQ
+# ##################################################################
+
+with st.expander("❓ Como Usar o Simulador de Tarifários de Gás Natural (Guia Rápido)", expanded=False):
+    st.markdown("""
+    Bem-vindo! Esta ferramenta ajuda-o a descobrir o tarifário de gás natural mais económico para si. Siga os passos abaixo para começar a poupar.
+
+    #### **Passo 1: Defina o Período e o seu Perfil de Consumo**
+    Primeiro, configure as bases da sua simulação.
+    
+    1.  **Selecione o Período:** Escolha o **mês** ou as **datas** para as quais pretende simular a sua fatura.
+    2.  **Defina o Escalão e Município:** Indique o seu **Escalão de Consumo** (pode encontrá-lo na sua fatura) e o seu **Município**. O município é essencial para calcular corretamente a Taxa de Ocupação do Subsolo (TOS).
+    3.  **Insira o Consumo:** Pode inserir o seu consumo de duas formas:
+        * **Consumo (kWh):** O valor final de energia que aparece na sua fatura.
+        * **Consumo (m³):** O volume de gás consumido, que também encontra na fatura. Terá de indicar o **Fator de Conversão (PCS)**, que converte m³ para kWh.
+
+    #### **Passo 2: ⚙️ Refine a Simulação (Opcional)**
+    Depois de inserir os seus dados principais, pode ajustar os detalhes.
+
+    * **Preço MIBGAS:** Se estiver a analisar tarifários indexados, pode ajustar o preço médio esperado do MIBGAS (€/MWh). O simulador já sugere um valor com base em dados históricos e de futuros.
+    * **Opções Adicionais:** No *expander* de "Opções Adicionais", pode ativar benefícios como a **Tarifa Social** (apenas para escalões 1 e 2) ou incluir descontos específicos de parcerias (ACP, Continente).
+    * **O Meu Tarifário:** Use esta secção para introduzir os preços da sua fatura atual. Assim, pode compará-la diretamente com todas as ofertas do mercado e ver exatamente quanto pode poupar.
+
+    #### **Passo 3: 🏆 Encontre a Melhor Tarifa**
+    A tabela de resultados no final da página é a sua ferramenta principal.
+
+    * **Ordenar por Custo:** Clique no cabeçalho da coluna **"Total Período (€)"** para ordenar os tarifários do mais barato para o mais caro.
+    * **Explorar Detalhes:** Passe o rato sobre os preços (**Termo Fixo** e **Termo Energia**) ou sobre o **custo total** para ver um resumo detalhado dos cálculos, incluindo todas as taxas e impostos.
+    * **Filtrar Resultados:** Use os filtros no topo da tabela para refinar a sua pesquisa por tipo de tarifário (Fixo, Indexado), segmento, etc.
+    * **O Seu Pódio:** No final, a secção **"🏆 O Seu Pódio da Poupança"** destaca as 3 opções mais económicas para si.
+
+    > **Dica Pro:**
+
+    * **Use "O Meu Tarifário" como Ponto de Partida:** A forma mais poderosa de usar o simulador é introduzir os dados da sua fatura atual na secção "O Meu Tarifário". Verá imediatamente uma comparação direta e saberá se o seu contrato atual é competitivo ou exatamente quanto pode poupar ao mudar.
+    * **Teste Cenários com o MIBGAS:** Se está a considerar um tarifário indexado, não altere o preço MIBGAS na primeira simulação. Depois, experimente inserir um valor mais alto (cenário pessimista) e um mais baixo (cenário otimista) para perceber a sensibilidade do custo final às variações do mercado.
+    * **Não Ignore o Município:** A escolha do seu município é crucial. Afeta diretamente o valor da Taxa de Ocupação do Subsolo (TOS) e qual o Comercializador de Último Recurso (CUR) aplicável, influenciando o custo final da Tarifa Regulada.
+    * **Explore os Filtros:** Se procura algo específico, como um tarifário com fatura eletrónica e débito direto, use os filtros no topo da tabela. Muitas vezes, as ofertas mais económicas encontram-se aqui."""      
+    )
+
+with st.expander("❔ Perguntas Frequentes (FAQ)", expanded=False):
+    st.markdown("""
+    ### Perguntas Gerais
+
+    **P: De onde vêm os dados dos tarifários e dos preços de mercado (MIBGAS)?**
+    
+    **R:** Todos os dados dos tarifários são recolhidos a partir das informações públicas disponibilizadas pelos comercializadores nos seus websites. Os preços do mercado ibérico de gás (MIBGAS) são obtidos de fontes oficiais. Os dados são atualizados regularmente para refletir as condições atuais do mercado.
+
+    **P: Tenho um tarifário com o mesmo nome que o do simulador, mas tem valores diferentes na energia e/ou termo fixo, porquê?**
+    
+    **R:** Muitos comercializadores alteram os valores nos seus tarifários mas mantêm as denominações dos mesmos. Este simulador só tem os valores para a última versão do tarifário.
+
+    **P: O simulador é 100% preciso?**
+    
+    **R:** O objetivo é ser o mais preciso possível. Para tarifários **fixos**, a precisão é muito elevada. Para tarifários **indexados**, o custo final é uma estimativa baseada nos preços médios do MIBGAS para o período selecionado. Variações diárias no preço do gás podem levar a pequenas diferenças no custo final.
+    
+    ---
+    
+    ### Dados e Períodos   
+    **P: Qual a diferença entre escolher um Mês e um Período de Datas manual?**
+    
+    **R:** Estas são as diferenças:
+    * **Escolher um Mês**: É a forma mais simples. O simulador seleciona automaticamente o primeiro e o último dia desse mês.
+    * **Selecionar Datas**: Oferece total flexibilidade para analisar um período específico (ex: uma semana, uma quinzena).
+                
+    ---
+    
+    ### Funcionalidades do Simulador
+
+    **P: Como funciona a secção "O Meu Tarifário"?**
+    
+    **R:** Esta secção permite-lhe introduzir os preços da sua fatura atual (**Termo Fixo** em €/dia e **Termo de Energia** em €/kWh) para comparar diretamente com todas as outras ofertas do mercado. É fundamental verificar na sua fatura se os preços que insere já incluem as **TAR (Tarifas de Acesso às Redes)**.
+
+    **P: Onde encontro os valores do "Termo Fixo" e "Termo de Energia" na minha fatura?**
+
+    **R:** Estes valores estão normalmente na secção de detalhe da sua fatura. Procure por:
+    * **Termo Fixo (ou Termo de Disponibilidade):** Um valor em **€/dia**. Multiplique-o pelo número de dias do período de faturação para obter o custo total do termo fixo.
+    * **Termo de Energia (ou Custo da Energia):** Um valor em **€/kWh**. Este é o preço que paga por cada kWh de gás consumido.
+    Certifique-se de que insere os valores **sem IVA** para que o simulador possa fazer os cálculos corretamente.
+
+    **P: Para que serve a secção "Comparar outro Tarifário Personalizado?"**
+    
+    **R:** Esta funcionalidade permite-lhe criar um cenário hipotético com os seus próprios preços. É ideal para simular uma oferta que recebeu e que ainda não está na lista ou para testar o impacto de futuras alterações de preços.
+                
+    **P: Os valores MIBGAS para datas futuras são reais?**
+    
+    **R:** Não. Os valores MIBGAS apresentados para datas futuras baseiam-se nos preços do mercado de futuros. Estes valores representam a expectativa do mercado, mas não são uma garantia. Servem como a melhor estimativa disponível para simular custos em tarifários indexados para períodos que ainda não ocorreram.
+
+    **P: Com que frequência são atualizados os tarifários e os preços de mercado?**
+
+    **R:** Os dados são atualizados regularmente para refletir as alterações nos preçários dos comercializadores e as variações do mercado de gás (MIBGAS). Pode consultar a data da última atualização dos valores de mercado na secção **"Datas de Referência"**, no final da página.                    
+
+    **P: Como são tratados descontos especiais como os do ACP ou Continente?**
+    
+    **R:** O simulador tenta replicar as condições comerciais o mais fielmente possível. Para a parceria **Goldenergy/ACP**, pode optar por incluir o valor da quota mensal no custo final. Para os tarifários **Galp/Continente**, o simulador calcula o valor do desconto em Cartão Continente e subtrai-o ao custo total, refletindo a poupança real na sua carteira. Pode ativar ou desativar estas opções na secção "Opções Adicionais de Simulação".                
+
+    **P: O que está incluído no "Total Período (€)"? É o valor final da fatura?**
+    
+    **R:** Sim, o valor "Total Período (€)" representa a sua fatura final estimada. Ele inclui a soma de várias componentes:
+                
+    1.  **Custo da Energia**: O consumo (kWh) multiplicado pelo Termo de Energia (€/kWh).
+                
+    2.  **Custo do Termo Fixo**: O Termo Fixo (€/dia) multiplicado pelo número de dias.
+                
+    3.  **Taxas e Impostos especiais**: A Taxa de Ocupação do Subsolo (TOS), o Imposto sobre os Produtos Petrolíferos (ISP).
+                
+    4.  **IVA**: O IVA é aplicado a 6% ou 23% sobre cada componente, de acordo com as regras em vigor.
+                
+    5. **Descontos/Acréscimos**: Quaisquer descontos de fatura ou acréscimos (como a quota ACP) são aplicados ao valor final.
+
+    Pode ver a decomposição detalhada de todos estes custos passando o rato por cima do valor na coluna "Total Período (€)".
+
+     **P: A tabela de resultados tem muitas opções. Como posso encontrar rapidamente o que procuro?**
+    
+    **R:** A tabela é interativa! Pode:
+
+    * **Ordenar**: Clique no cabeçalho de qualquer coluna (como "Total (€)" ou "Fixo (€/dia)") para ordenar os resultados do mais baixo para o mais alto, ou vice-versa.
+
+    * **Filtrar**: Use os filtros no topo da tabela para refinar a sua pesquisa por tipo de tarifário (Fixo, Indexado), segmento (Residencial, Empresarial), ou por opções de faturação e pagamento.
+
+    * **Pesquisar**: Na vista detalhada, pode usar a pesquisa dentro das colunas "Comercializador" e "Tarifário" para encontrar uma oferta específica.
+               
+    ---
+    
+    ### Termos e Conceitos
+
+    **P: O que é um tarifário de gás indexado?**
+    
+    **R:** Um tarifário indexado tem um preço de energia que varia de acordo com o preço do mercado grossista de gás (MIBGAS). Este tipo de tarifário pode oferecer uma poupança significativa quando os preços de mercado estão baixos, mas também implica um risco maior se os preços subirem.
+
+    **P: O que é o Escalão de Consumo?**
+    
+    **R:** É uma faixa de consumo anual (medido em m³) que determina os preços aplicados ao seu contrato. Existem 4 escalões para clientes domésticos e pequenos negócios. Pode encontrar o seu escalão na sua fatura de gás.
+
+    **P: O que são as TAR (Tarifas de Acesso às Redes) no gás?**
+    
+    **R:** Tal como na eletricidade, as TAR no gás pagam pelo uso das infraestruturas (armazenamento, transporte e distribuição). São definidas pela ERSE. Alguns comercializadores apresentam os preços já com as TAR incluídas, enquanto outros as mostram em separado. O simulador lida com ambas as situações.
+
+    **P: O que é o Fator de Conversão (PCS)?**
+    
+    **R:** O seu contador mede o gás em volume (metros cúbicos, m³), mas a energia que ele contém (o seu Poder Calorífico Superior, ou PCS) pode variar ligeiramente. O PCS é o fator que converte o volume (m³) em energia (kWh). Este valor está sempre indicado na sua fatura e é necessário se optar por inserir o seu consumo em m³.
+
+    **P: O que é a TOS (Taxa de Ocupação do Subsolo)?**
+
+    **R:** É uma taxa municipal pelo uso do subsolo público para a passagem das condutas de gás. O valor varia de município para município, sendo por isso crucial selecionar o seu corretamente.
+    """)
+
+# ##################################################################
+# FIM DO BLOCO
+# ##################################################################
+
+# --- Inputs do Utilizador ---
+st.subheader("⚙️ Insira os seus dados de simulação de Gás Natural")
+
+# --- BLOCO DE DEFINIÇÃO DE DATAS ---
+dias_mes = {"Janeiro":31,"Fevereiro":29,"Março":31,"Abril":30,"Maio":31,"Junho":30,"Julho":31,"Agosto":31,"Setembro":30,"Outubro":31,"Novembro":30,"Dezembro":31}
+ano_atual_para_bissexto = datetime.datetime.now().year
+if not ((ano_atual_para_bissexto % 4 == 0 and ano_atual_para_bissexto % 100 != 0) or (ano_atual_para_bissexto % 400 == 0)):
+    dias_mes["Fevereiro"] = 28
+
+# Lógica de inicialização (executada apenas uma vez)
+if 'session_initialized_dates_gas' not in st.session_state:
+    hoje = datetime.date.today()
+    data_inicial_default = hoje + datetime.timedelta(days=1)
+    
+    ano_final, mes_final = (data_inicial_default.year, data_inicial_default.month + 1)
+    if mes_final > 12:
+        mes_final = 1
+        ano_final += 1
+    
+    dias_no_mes_final = monthrange(ano_final, mes_final)[1]
+    dia_final = min(data_inicial_default.day, dias_no_mes_final)
+    
+    data_final_bruta = datetime.date(ano_final, mes_final, dia_final)
+    data_final_default = data_final_bruta - datetime.timedelta(days=1)
+    
+    # Define os valores iniciais para as chaves dos widgets
+    st.session_state.sel_mes_gas = list(dias_mes.keys())[data_inicial_default.month - 1]
+    st.session_state.data_inicio_key_input_gas = data_inicial_default
+    st.session_state.data_fim_key_input_gas = data_final_default
+    st.session_state.session_initialized_dates_gas = True
+
+# --- Widgets com as novas callbacks ---
+col_mes, col_data_i, col_data_f, col_dias_calc, col_dias_man = st.columns(5)
+
+with col_mes:
+    mes = st.selectbox(
+        "Mês", 
+        list(dias_mes.keys()), 
+        key="sel_mes_gas", 
+        on_change=sincronizar_datas_pelo_mes,
+        help="Selecione um mês para preencher automaticamente as datas. Se o mês escolhido já tiver terminado, o valor do MIBGAS é final, se ainda estiver em curso será com Futuros."
+    )
+
+data_minima_permitida = datetime.date(2025, 1, 1)
+data_maxima_permitida = datetime.date(2026, 9, 30)
+
+with col_data_i:
+    data_inicio = st.date_input(
+        "Data Inicial", 
+        min_value=data_minima_permitida, 
+        max_value=data_maxima_permitida, 
+        format="DD/MM/YYYY", 
+        key="data_inicio_key_input_gas", 
+        on_change=sincronizar_mes_pelas_datas,
+        help="A partir de 01/01/2025. Se não modificar as datas ou o mês, será calculado a partir do dia seguinte ao atual."
+    )
+with col_data_f:
+    data_fim = st.date_input(
+        "Data Final", 
+        min_value=data_minima_permitida, 
+        max_value=data_maxima_permitida, 
+        format="DD/MM/YYYY", 
+        key="data_fim_key_input_gas", 
+        on_change=sincronizar_mes_pelas_datas,
+        help="De Data Inicial a 30/09/2026. Se não modificar as datas ou o mês, será calculado até um mês após a data inicial."
+    )
+
+# A lógica de cálculo dos dias lê os valores diretamente dos widgets
+dias_default_calculado = (data_fim - data_inicio).days + 1 if data_fim >= data_inicio else 0
+
+with col_dias_calc:
+    gfx.exibir_metrica_personalizada("Dias (pelas datas)", f"{dias_default_calculado} dias")
+
+with col_dias_man:
+    # O valor por defeito do input manual é sempre o calculado a partir das datas
+    dias_manual_input_val = st.number_input(
+        "Nº Dias (manual)", 
+        min_value=1, 
+        value=dias_default_calculado, 
+        step=1, 
+        key="dias_manual_input_key_gas",
+        help="Pode alterar os dias de forma manual, mas dê preferência às datas ou mês, para ter dados mais fidedignos nos tarifários indexados."
+    )
+
+# Decisão final sobre o número de dias a usar
+if pd.isna(dias_manual_input_val) or dias_manual_input_val <= 0 or dias_manual_input_val == dias_default_calculado:
+    dias = dias_default_calculado
+else:
+    dias = int(dias_manual_input_val)
+
+st.write(f"Dias considerados: **{dias} dias**")
+
+# --- Sub-períodos de vigência das constantes (TAR, ISP, ...) ---
+CONSTANTES = calc.obter_constantes_em_vigor(CONSTANTES_COM_VIGENCIA, data_inicio)
+if dias == dias_default_calculado:
+    segmentos_vigencia = calc.dividir_periodo_por_vigencia(CONSTANTES_COM_VIGENCIA, data_inicio, data_fim)
+else:
+    # Com dias definidos manualmente não há datas fiáveis para dividir o período
+    segmentos_vigencia = [{'data_inicio': data_inicio, 'data_fim': data_fim, 'dias': dias, 'constantes': CONSTANTES}]
+
+if len(segmentos_vigencia) > 1:
+    texto_segmentos = ", ".join(f"{seg['data_inicio'].strftime('%d/%m/%Y')} a {seg['data_fim'].strftime('%d/%m/%Y')}" for seg in segmentos_vigencia)
+    gfx.exibir_info_personalizada(f"O período inclui mudanças de TAR/constantes e será calculado em {len(segmentos_vigencia)} sub-períodos: {texto_segmentos}.")
+
+# --- Ponderação da média MIBGAS pelo perfil de consumo ---
+# Com um ficheiro de consumos carregado, os indexados são faturados dia a dia com esses consumos
+consumos_gas_ficheiro = None
+consumos_gas_precisam_pcs = False
+if st.session_state.get('gas_input_mode') == "Ficheiro de consumos":
+    consumos_gas_brutos = st.session_state.get('consumos_gas_diarios')
+    if consumos_gas_brutos is not None:
+        # Os m³ sem PCS no ficheiro são convertidos com o PCS atual (campo mostrado junto ao upload)
+        consumos_gas_precisam_pcs = proc_dados.tem_consumos_gas_sem_pcs(consumos_gas_brutos)
+        consumos_gas_ficheiro = proc_dados.converter_consumos_gas_kwh(consumos_gas_brutos, st.session_state.get('gas_pcs_input_key', 11.25))
+
+OPCOES_PONDERACAO_MIBGAS = ["Média simples", "Perfil sazonal (graus-dia)", "Perfil diário (ficheiro)"]
+if consumos_gas_ficheiro is not None:
+    ponderacao_mibgas = "Consumos do ficheiro (dia a dia)"
+    gfx.exibir_info_personalizada("MIBGAS: os tarifários indexados são calculados dia a dia com os consumos do ficheiro carregado.")
+else:
+    ponderacao_mibgas = st.radio(
+        "Média MIBGAS do período",
+        OPCOES_PONDERACAO_MIBGAS,
+        horizontal=True,
+        key="ponderacao_mibgas_gas",
+        help="A média simples dá o mesmo peso a todos os dias. As opções ponderadas dão mais peso aos dias de maior consumo (mais frios), como acontece na fatura de um tarifário indexado."
+    )
+
+perfil_consumo_diario_gas = None
+if ponderacao_mibgas == "Perfil diário (ficheiro)":
+    ficheiro_perfil_gas = st.file_uploader(
+        "Perfil de consumo diário (CSV/Excel: data, kWh)",
+        type=['csv', 'xlsx'],
+        key="upload_perfil_consumo_gas"
+    )
+    if ficheiro_perfil_gas is not None:
+        perfil_consumo_diario_gas, erro_perfil_gas = proc_dados.processar_perfil_consumo_gas(ficheiro_perfil_gas)
+        if erro_perfil_gas:
+            st.error(erro_perfil_gas)
+    else:
+        st.info("Sem ficheiro carregado, é usado o perfil sazonal.")
+
+serie_mibgas_diaria = calc.preparar_serie_mibgas_diaria_cache(versao_mibgas, mibgas_df)
+
+def calcular_media_mibgas_periodo(inicio, fim):
+    """Média MIBGAS (€/MWh) para [inicio, fim], simples ou ponderada conforme a opção escolhida."""
+    if mibgas_df.empty:
+        return 0.0
+    if consumos_gas_ficheiro is not None:
+        media_dia_a_dia = calc.calcular_media_mibgas_consumos_diarios(consumos_gas_ficheiro, serie_mibgas_diaria, inicio, fim)
+        if media_dia_a_dia:
+            return media_dia_a_dia
+    if ponderacao_mibgas in ["Média simples", "Consumos do ficheiro (dia a dia)"]:
+        return calc.calcular_media_mibgas_datas_cache(versao_mibgas, mibgas_df, inicio, fim)
+    return calc.calcular_media_mibgas_ponderada(serie_mibgas_diaria, inicio, fim, perfil_consumo_diario_gas)
+
+# Input MIBGAS
+# Calcular o default ANTES de desenhar o widget
+media_mibgas_calculada = calcular_media_mibgas_periodo(data_inicio, data_fim)
+
+# Se o cálculo falhar, usar o default das Constantes
+if media_mibgas_calculada == 0.0:
+     mibgas_default_const = calc.obter_constante("MIBGAS_Default", CONSTANTES)
+     if mibgas_default_const != 0.0:
+         media_mibgas_calculada = mibgas_default_const
+     else:
+         media_mibgas_calculada = 30.0 # Fallback final
+
+# Guardar o default calculado para a callback do MIBGAS
+st.session_state['mibgas_default_calculado'] = media_mibgas_calculada
+
+# O valor default do input é a média que acabámos de calcular
+mibgas_input_mwh = st.number_input(
+    "Preço MIBGAS (€/MWh)",
+    min_value=0.0,
+    value=media_mibgas_calculada, # Default é o valor calculado
+    step=1.0,
+    format="%.2f",
+    key="mibgas_input_mwh_manual", # Key para o input manual
+    on_change=atualizar_url_mibgas,
+    help=f"Valor médio esperado do MIBGAS. O valor pré-preenchido ({media_mibgas_calculada:.2f} €/MWh) é a média ({ponderacao_mibgas.lower()}) calculada para o período selecionado."
+)
+
+# Adicionar Alertas
+if mibgas_input_mwh != media_mibgas_calculada:
+    # Usar as funções de alerta (se existirem em graficos.py) ou st.info/st.warning
+    diferenca_mibgas_perc = (mibgas_input_mwh / media_mibgas_calculada - 1) * 100 if media_mibgas_calculada != 0 else 0
+    
+    if mibgas_input_mwh < media_mibgas_calculada:
+        st.warning(
+            f"⚠️ **Aviso:** O valor MIBGAS inserido ({mibgas_input_mwh:.2f} €) é **{abs(diferenca_mibgas_perc):.1f}% inferior** à média calculada ({media_mibgas_calculada:.2f} €) para o período selecionado."
+        )
+    else:
+        st.info(
+            f"ℹ️ **Nota:** O valor MIBGAS inserido ({mibgas_input_mwh:.2f} €) é **{diferenca_mibgas_perc:.1f}% superior** à média calculada ({media_mibgas_calculada:.2f} €) para o período selecionado."
+        )
+
+# --- INÍCIO DO BLOCO DO GRÁFICO MIBGAS ---
+with st.expander("📊 Ver Gráfico de Evolução dos Preços Médios Diários MIBGAS no Período"):
+    
+    # 1. Obter a data que separa os preços Spot dos Futuros (da aba 'Info')
+    data_split_mibgas = None
+    if not info_tab.empty:
+        linha_data_split = info_tab[info_tab['Descricao'] == 'Ultima Data MIBGAS SPOT']
+        if not linha_data_split.empty:
+            valor_data = linha_data_split['Data'].iloc[0]
+            if pd.notna(valor_data):
+                try:
+                    data_split_mibgas = pd.to_datetime(valor_data).date()
+                except Exception:
+                    st.warning("Não foi possível ler a data de referência dos valores MIBGAS SPOT.")
+
+    # 2. Preparar e gerar o gráfico apenas se tivermos a data de split
+    if data_split_mibgas:
+        with st.spinner("A gerar gráfico MIBGAS..."):
+            # Preparação dos dados e HTML em cache por versão dos dados MIBGAS e período
+            html_grafico_mibgas = gfx.gerar_html_grafico_mibgas_cache(
+                versao_mibgas,
+                serie_mibgas_diaria,
+                data_inicio,
+                data_fim,
+                data_split_mibgas
+            )
+            
+            # 3. Exibir o HTML do gráfico
+            if html_grafico_mibgas:
+                st.components.v1.html(html_grafico_mibgas, height=320)
+            else:
+                st.info("Não existem dados MIBGAS disponíveis para o período selecionado para gerar o gráfico.")
+    else:
+        st.warning("A data de referência para os valores MIBGAS não está definida na aba 'Info' do ficheiro Excel.")
+# --- FIM DO BLOCO DO GRÁFICO MIBGAS ---
+
+# --- BLOCO DE INPUTS DE GÁS ---
+st.markdown("##### Defina o seu perfil de consumo")
+
+col_esc, col_mun, col_cur = st.columns(3)
+
+with col_esc:
+    # Escalão é selecionado (Default E1) e chama o callback
+    escalao_map = {
+        "Escalão 1 (Consumo até 220 m³/ano)": 1,
+        "Escalão 2 (Consumo 221 a 500 m³/ano)": 2,
+        "Escalão 3 (Consumo 501 a 1.000 m³/ano)": 3,
+        "Escalão 4 (Consumo 1.001 a 10.000 m³/ano)": 4
+    }
+    escalao_selecionado_str = st.selectbox(
+        "Selecione o seu Escalão de Consumo",
+        options=list(escalao_map.keys()),
+        index=0, # Default para Escalão 1
+        key="sel_escalao_gas_key",
+        on_change=atualizar_consumo_default_gas,
+        help="Indique o seu **Escalão de Consumo** (pode encontrá-lo na sua fatura)"
+    )
+    escalao_num = escalao_map[escalao_selecionado_str]
+
+with col_mun:
+    # --- Definir default para o 10º item ---
+    lista_municipios = sorted(tos_municipios['Município'].dropna().unique(), key=normalizar_para_ordenacao)
+    
+    # Definir o 10º item (índice 9) como padrão
+    default_index_municipio = 9 
+    # Safety check: se a lista tiver menos de 10 itens, usa o primeiro (índice 0)
+    if len(lista_municipios) <= default_index_municipio: 
+        default_index_municipio = 0
+        
+    municipio_selecionado = st.selectbox(
+        "⚠️ Selecione o seu Município",
+        options=lista_municipios,
+        key="sel_municipio_tos",
+        on_change=atualizar_url_municipio,
+        help="O **Município** é essencial para calcular corretamente a Taxa de Ocupação do Subsolo (TOS)."
+    )
+
+# --- Mostrar o CUR correspondente ---
+with col_cur:
+    cur_selecionado_nome = ""
+    linha_tos_cur = pd.DataFrame() # Inicializar como DataFrame vazio
+    
+    if municipio_selecionado:
+        linha_tos_cur = tos_municipios[tos_municipios['Município'] == municipio_selecionado]
+        if not linha_tos_cur.empty and 'CUR' in linha_tos_cur.columns:
+            cur_selecionado_nome = linha_tos_cur.iloc[0].get('CUR', 'N/D')
+    
+    gfx.exibir_metrica_personalizada("Comercializador de Último Recurso (CUR)", cur_selecionado_nome if cur_selecionado_nome else "N/D")
+
+# --- Inputs de Consumo (Com lógica de pré-preenchimento) ---
+input_mode = st.radio(
+    "Como prefere inserir o consumo?",
+    ["Consumo (kWh)", "Consumo (m³)", "Ficheiro de consumos"],
+    horizontal=True, index=0, key="gas_input_mode",
+    on_change=atualizar_url_consumo_gas,
+    help="**Consumo (kWh):** O valor final de energia que aparece na sua fatura. **Consumo (m³):** O volume de gás consumido, que também encontra na fatura. Terá de indicar o **Fator de Conversão (PCS)**, que converte m³ para kWh. **Ficheiro de consumos:** Consumos diários ou leituras exportados do distribuidor; os tarifários indexados são calculados dia a dia."
+)
+
+consumo_kwh = 0
+
+# Verificamos se o callback já correu ou se é a primeira execução
+if 'gas_kwh_input_key' not in st.session_state:
+    atualizar_consumo_default_gas() # Chamar na primeira execução para definir o default (135)
+
+if input_mode == "Consumo (kWh)":
+    consumo_kwh = st.number_input(
+        "Consumo (kWh)", 
+        min_value=0, 
+        step=10, 
+        key="gas_kwh_input_key", # Key ligada ao callback
+        on_change=atualizar_url_consumo_gas
+    )
+elif input_mode == "Consumo (m³)":
+    col_m3_1, col_m3_2 = st.columns(2)
+    with col_m3_1:
+        consumo_m3 = st.number_input("Consumo (m³)", min_value=0, value=12, step=1, key="gas_m3_input_key", on_change=atualizar_url_consumo_gas)
+    with col_m3_2:
+        fator_pcs = input_fator_pcs_gas()
+    
+    consumo_kwh = consumo_m3 * fator_pcs
+    gfx.exibir_metrica_personalizada("Consumo (kWh) Calculado", f"{consumo_kwh:.0f} kWh")
+else:
+    st.file_uploader(
+        "Ficheiros de consumos do distribuidor (CSV/Excel)",
+        type=['csv', 'xlsx'],
+        accept_multiple_files=True,
+        key="upload_consumos_gas",
+        on_change=processar_upload_consumos_gas,
+        help="Aceita consumos diários em kWh, consumos em m³ (com coluna PCS ou o PCS indicado abaixo) ou leituras do contador em m³. Só é considerado o consumo dentro das datas selecionadas."
+    )
+    if st.session_state.get('erro_consumos_gas'):
+        st.error(st.session_state['erro_consumos_gas'])
+    if consumos_gas_precisam_pcs:
+        input_fator_pcs_gas()
+
+    if consumos_gas_ficheiro is not None:
+        consumo_kwh, dias_com_dados = calc.somar_consumos_gas_periodo(consumos_gas_ficheiro, data_inicio, data_fim)
+        gfx.exibir_metrica_personalizada("Consumo (kWh) do ficheiro no período", f"{consumo_kwh:.0f} kWh")
+        if dias_com_dados < dias_default_calculado:
+            st.warning(
+                f"O ficheiro só tem consumos para {dias_com_dados} dos {dias_default_calculado} dias do período selecionado "
+                f"(dados de {consumos_gas_ficheiro['Data'].min().strftime('%d/%m/%Y')} a {consumos_gas_ficheiro['Data'].max().strftime('%d/%m/%Y')}). "
+                "Ajuste as datas para o período coberto pelo ficheiro."
+            )
+
+# --- Calcular consumo pro-rata para o período ---
+consumo_kwh_periodo_final = 0.0
+if dias > 0 and consumo_kwh > 0:
+    consumo_kwh_periodo_final = consumo_kwh / dias
+    gfx.exibir_info_personalizada(f"O consumo médio diario para {dias} dias é de {consumo_kwh_periodo_final:.2f} kWh.")
+elif dias <= 0:
+    st.error("O número de dias da simulação não pode ser zero.")
+    st.stop()
+else:
+    st.warning("Consumo é zero. Os cálculos de custo de energia e taxas variáveis serão zero.")
+
+
+# --- Obter valores TOS ---
+tos_fixo_dia_selecionado = 0.0
+tos_variavel_kwh_selecionado = 0.0
+if municipio_selecionado != "Outro":
+    linha_tos = tos_municipios[tos_municipios['Município'] == municipio_selecionado]
+    if not linha_tos.empty:
+        try:
+            if 'TOS_Fixo_Dia' in linha_tos.columns:
+                 tos_fixo_dia_selecionado = float(linha_tos.iloc[0]['TOS_Fixo_Dia'])
+            else:
+                 tos_fixo_dia_selecionado = float(linha_tos.iloc[0]['TOS_Fixo_Dia (€/dia)']) # Fallback
+                 
+            if 'TOS_Variavel_kWh' in linha_tos.columns:
+                tos_variavel_kwh_selecionado = float(linha_tos.iloc[0]['TOS_Variavel_kWh'])
+            else:
+                tos_variavel_kwh_selecionado = float(linha_tos.iloc[0]['TOS_Variavel_kWh (€/kWh)']) # Fallback
+                
+        except Exception as e:
+            st.error(f"Erro ao ler valores TOS para {municipio_selecionado}. Verifique nomes das colunas na aba TOS. {e}")
+            tos_fixo_dia_selecionado = 0.0
+            tos_variavel_kwh_selecionado = 0.0
+
+
+# --- Opções Adicionais ---
+with st.expander("➕ Opções Adicionais de Simulação (Gás Natural)"):
+    
+    # --- Widget ISP ---
+    isp_gas_default = calc.obter_constante('ISP_Gas_eur_kwh', CONSTANTES)
+    
+    isp_gas_manual_input = st.number_input(
+        "ISP Gás (€/kWh)",
+        min_value=0.0,
+        value=isp_gas_default,
+        step=0.0001,
+        format="%.6f", 
+        key="gas_isp_manual_input",
+        on_change=atualizar_url_opcoes_adicionais_gas,
+        help=f"Imposto Especial de Consumo (ISP). Default ({isp_gas_default})."
+    )
+    # TS Condicional
+    if escalao_num in [1, 2]:
+        st.markdown(r"##### Benefícios e Condições Especiais (para Escalões 1 e 2)") # Título condicional
+        tarifa_social_gas = st.checkbox("Aplicar Tarifa Social de Gás Natural?", key="chk_ts_gas_v2", on_change=atualizar_url_opcoes_adicionais_gas, help="A Tarifa Social de Gás Natural aplica-se apenas aos escalões 1 e 2.")
+    else:
+        tarifa_social_gas = False
+        if 'chk_ts_gas_v2' in st.session_state: 
+            st.session_state.chk_ts_gas_v2 = False
+
+    # Outros descontos
+    st.markdown("##### Parcerias e Descontos Específicos")
+    col_op1, col_op2 = st.columns(2)
+    with col_op1:
+        acp_gas = st.checkbox("Incluir quota ACP", key="chk_acp_gas", value=True, on_change=atualizar_url_opcoes_adicionais_gas, help="Inclui o valor da quota do ACP (4,80 €/mês) no valor do tarifário da parceria GE/ACP.",)
+    with col_op2:
+        desconto_continente_gas = st.checkbox("Desconto Continente", key="chk_cont_gas", value=True, on_change=atualizar_url_opcoes_adicionais_gas, help="Comparar o custo total incluindo o desconto do valor do cupão Continente no tarifário Galp&Continente.")
+
+
+# --- "O Meu Tarifário" de Gás ---
+help_O_Meu_Tarifario_Gas = """
+Para preencher os valores de acordo com o seu tarifário, ou com outro qualquer que queira comparar.
+
+**Atenção às notas sobre as TAR.**
+    """
+meu_tarifario_gas_ativo = st.checkbox("**Comparar com O Meu Tarifário de Gás Natural?**", key="chk_meu_tarifario_gas_ativo", on_change=atualizar_url_meu_tarifario_gas, help=help_O_Meu_Tarifario_Gas)
+
+if meu_tarifario_gas_ativo:
+    with st.container(border=True):
+
+        st.subheader("🧾 O Meu Tarifário (Gás Natural)")
+        
+        col_meu1, col_meu2 = st.columns(2)
+        with col_meu1:
+            st.number_input("Preço Energia (€/kWh)", min_value=0.0, step=0.001, format="%g", key="meu_termo_energia_gas", on_change=atualizar_url_meu_tarifario_gas)
+        with col_meu2:
+            st.number_input("Preço Termo Fixo (€/dia)", min_value=0.0, step=0.001, format="%g", key="meu_termo_fixo_gas", on_change=atualizar_url_meu_tarifario_gas)
+
+        col_meu_flag1, col_meu_flag2 = st.columns(2)
+        with col_meu_flag1:
+            st.checkbox("TAR incluída no Preço Energia?", value=True, key="meu_gas_tar_energia_incluida", on_change=atualizar_url_meu_tarifario_gas)
+        with col_meu_flag2:
+            st.checkbox("TAR incluída no Preço Termo Fixo?", value=True, key="meu_gas_tar_fixo_incluida", on_change=atualizar_url_meu_tarifario_gas)
+            
+        st.markdown("###### Descontos e Acréscimos (Meu Tarifário)")
+        col_desc1, col_desc2, col_desc3, col_desc4 = st.columns(4)
+        with col_desc1:
+            st.number_input("Desconto Energia (%)", min_value=0.0, max_value=100.0, step=0.1, key="meu_gas_desconto_energia_perc", on_change=atualizar_url_meu_tarifario_gas)
+        with col_desc2:
+            st.number_input("Desconto Termo Fixo (%)", min_value=0.0, max_value=100.0, step=0.1, key="meu_gas_desconto_fixo_perc", on_change=atualizar_url_meu_tarifario_gas)
+        with col_desc3:
+            st.number_input("Desconto Fatura (€)", min_value=0.0, step=0.01, format="%.2f", key="meu_gas_desconto_fatura_eur", on_change=atualizar_url_meu_tarifario_gas)
+        with col_desc4:
+            st.number_input("Acréscimo Fatura (€)", min_value=0.0, step=0.01, format="%.2f", key="meu_gas_acrescimo_fatura_eur", on_change=atualizar_url_meu_tarifario_gas)
+
+# --- BLOCO DO TARIFÁRIO PERSONALIZADO ---
+help_Personalizado_Gas = """
+Crie tarifário personalizado para comparar com os seus consumos. Ideal para comparar outro tarifário extra. Não permite descontos e acréscimos que existem em 'O Meu Tarifário'.
+
+**Atenção às notas sobre as TAR.**
+    """
+personalizado_gas_ativo = st.checkbox(
+    "**Comparar outro Tarifário Personalizado? (simplificado)**",
+    key="chk_pers_gas_ativo", on_change=atualizar_url_tarifario_personalizado_gas,
+    help=help_Personalizado_Gas
+)
+
+if personalizado_gas_ativo:
+    with st.container(border=True):
+        st.subheader("Tarifário Personalizado (Gás Natural)")
+        col_s1, col_s2 = st.columns(2)
+        with col_s1:
+            # O widget atualiza o session_state e o cálculo principal irá lê-lo.
+            st.number_input("Preço Energia (€/kWh)", key="pers_gas_energia", min_value=0.0, step=0.001, format="%g", on_change=atualizar_url_tarifario_personalizado_gas)
+        with col_s2:
+            st.number_input("Preço Termo Fixo (€/dia)", key="pers_gas_fixo", min_value=0.0, step=0.001, format="%g", on_change=atualizar_url_tarifario_personalizado_gas)
+
+        col_opt1, col_opt2 = st.columns(2)
+        with col_opt1:
+            st.checkbox("TAR incluída no Preço Energia?", value=True, key="pers_gas_tar_energia", on_change=atualizar_url_tarifario_personalizado_gas)
+        with col_opt2:
+            st.checkbox("TAR incluída no Preço Termo Fixo?", value=True, key="pers_gas_tar_potencia", on_change=atualizar_url_tarifario_personalizado_gas)
+
+# --- FIM DO BLOCO PERSONALIZADO ---
+
+# --- Helper Function ---
+def get_filter_options_for_multiselect_gas(dataframe_gas, column_name):
+    """Obtém opções únicas de filtro a partir da aba mestre de gás."""
+    if column_name not in dataframe_gas.columns:
+        return []
+    options = dataframe_gas[column_name].dropna().unique()
+    return sorted([opt for opt in options if opt and str(opt).lower() != 'pessoal'])
+
+st.markdown("---") # Separador
+st.subheader("🔍 Filtros da Tabela de Resultados")
+
+# --- UI DE FILTROS ---
+col_titulo_resultados, col_btn_limpar = st.columns([3,1]) # Ajustar a proporção conforme necessário
+
+# --- Botão Limpar Filtros ---
+with col_btn_limpar:
+    st.write("") # Truque para alinhar verticalmente o botão (adiciona espaço no topo)
+    st.write("")
+    if st.button("🧹 Remover Todos os Filtros", key="btn_remover_filtros_gas", use_container_width=True, help="Remover Todos os Filtros"):
+        # Keys de SelectBox (reset para índice 0)
+        st.session_state.filter_segmento_gas_idx = 0  # Default "Residencial"
+        st.session_state.filter_faturacao_gas_idx = 0 # Default "Todas"
+        st.session_state.filter_pagamento_gas_idx = 0 # Default "Todos"
+        # Key de MultiSelect (reset para lista vazia)
+        st.session_state.filter_tipos_gas_multi = []
+        st.rerun()
+
+# Colocamos os 4 filtros e o botão de limpar, todos juntos.
+filt_col1, filt_col2, filt_col3, filt_col4 = st.columns(4)
+
+# --- Filtro de Segmento ---
+with filt_col1:
+    # 1. Definir a lista de opções
+    opcoes_filtro_segmento_user = ["Residencial", "Empresarial", "Ambos"] 
+    
+    # 2. Encontrar o índice da opção default ("Residencial")
+    default_index_segmento = opcoes_filtro_segmento_user.index("Residencial") # Isto será 0
+    
+    selected_segmento_user = st.selectbox(
+        "Segmento", 
+        opcoes_filtro_segmento_user, 
+        index=st.session_state.get("filter_segmento_gas_idx", default_index_segmento), # Usa o índice de "Residencial"
+        key="filter_segmento_gas_selectbox",
+        help="Escolha o segmento para a simulação."
+    )
+    st.session_state.filter_segmento_gas_idx = opcoes_filtro_segmento_user.index(selected_segmento_user)
+
+# --- Filtro de Tipo ---
+with filt_col2:
+    tipos_options_ms = get_filter_options_for_multiselect_gas(tarifas_gas_master, 'tipo') 
+    
+    help_text_formatado_gas = """
+    Deixe em branco para mostrar todos os tipos.
+    * **Fixo**: Preço de energia constante.
+    * **Indexado**: Preço da energia baseado na média do MIBGAS para o período.
+    """
+    selected_tipos = st.multiselect("Tipo(s) de Tarifário", tipos_options_ms,
+                                  default=st.session_state.get("filter_tipos_gas_multi", []),
+                                  key="filter_tipos_gas_multi",
+                                  help=help_text_formatado_gas)
+
+# --- Filtro de Faturação ---
+with filt_col3:
+    opcoes_faturacao_user = ["Todas", "Fatura eletrónica", "Fatura em papel"]
+    selected_faturacao_user = st.selectbox(
+        "Faturação",
+        opcoes_faturacao_user,
+        index=st.session_state.get("filter_faturacao_gas_idx", 0), # Default "Todas"
+        key="filter_faturacao_gas_selectbox",
+        help="Escolha o tipo de faturação pretendido."
+    )
+    st.session_state.filter_faturacao_gas_idx = opcoes_faturacao_user.index(selected_faturacao_user)
+
+# --- Filtro de Pagamento ---
+with filt_col4:
+    opcoes_pagamento_user = ["Todos", "Débito Direto", "Multibanco", "Numerário/Payshop/CTT"]
+    selected_pagamento_user = st.selectbox(
+        "Pagamento",
+        opcoes_pagamento_user,
+        index=st.session_state.get("filter_pagamento_gas_idx", 0), # Default "Todos"
+        key="filter_pagamento_gas_selectbox",
+        help="Escolha o método de pagamento."
+    )
+    st.session_state.filter_pagamento_gas_idx = opcoes_pagamento_user.index(selected_pagamento_user)
+# --- FIM: UI DE FILTRO ---
+
+
+# --- INÍCIO: LÓGICA DE FILTRAGEM PANDAS (PRÉ-CÁLCULO) ---
+
+# --- Obter o Link do CUR para o Município selecionado ---
+link_cur_municipio = ""
+if not linha_tos_cur.empty and 'site_adesao' in linha_tos_cur.columns:
+    link_cur_municipio = linha_tos_cur.iloc[0].get('site_adesao', '-')
+    if pd.isna(link_cur_municipio):
+        link_cur_municipio = "-"
+
+with st.spinner("A filtrar e preparar dados..."):
+    # 1. Limpeza de Tipos de Dados
+    try:
+        tarifas_gas_master['Escalão'] = pd.to_numeric(tarifas_gas_master['escalao'], errors='coerce').fillna(0).astype(int)
+        tarifas_gas_master['Disponibilidade'] = tarifas_gas_master['disponibilidade'].str.strip().str.lower()
+        cols_texto_filtro = ['segmento', 'tipo', 'faturacao', 'pagamento']
+        for col in cols_texto_filtro:
+            if col in tarifas_gas_master.columns:
+                tarifas_gas_master[col] = tarifas_gas_master[col].astype(str).str.strip()
+            
+    except Exception as e:
+        st.error(f"Erro ao tentar limpar os tipos de dados das tarifas de gás: {e}.")
+        st.stop()
+
+    # 2. Filtro PRIMÁRIO (Standalone e Escalão)
+    df_gas_processar = tarifas_gas_master[
+        (tarifas_gas_master['escalao'] == escalao_num) &
+        ( (tarifas_gas_master['disponibilidade'] == 'g_so') | (tarifas_gas_master['disponibilidade'] == 'ambos') )
+    ].copy()
+
+    if df_gas_processar.empty and not meu_tarifario_gas_ativo:
+         st.error(f"Não foram encontrados tarifários de gás standalone ('g_so' ou 'ambos') para o Escalão {escalao_num} na sua base de dados (antes dos filtros de tabela). Verifique os dados no Excel.")
+         st.stop()
+
+    # 3. Aplicar Filtros da UI (a todos os escalões, para a exportação de todos os escalões)
+    df_a_filtrar = tarifas_gas_master[
+        (tarifas_gas_master['disponibilidade'] == 'g_so') | (tarifas_gas_master['disponibilidade'] == 'ambos')
+    ].copy()
+
+    # 3.1. Lógica para o filtro de Segmento
+    if selected_segmento_user != "Ambos":
+        segmentos_para_filtrar = []
+        if selected_segmento_user == "Residencial":
+            segmentos_para_filtrar.extend(["Doméstico", "Doméstico e Não Doméstico"]) 
+        elif selected_segmento_user == "Empresarial":
+            segmentos_para_filtrar.extend(["Não Doméstico", "Doméstico e Não Doméstico"])
+        
+        if 'segmento' in df_a_filtrar.columns:
+            df_a_filtrar = df_a_filtrar[df_a_filtrar['segmento'].isin(segmentos_para_filtrar)]
+        else:
+            st.warning("Filtro 'Segmento' não aplicado: Coluna 'segmento' não encontrada na aba 'Tarifas_Gas_Master'.")
+
+    # 3.2. Lógica para o filtro de Tipo (Multiselect)
+    if selected_tipos: # Aplicar apenas se a lista NÃO estiver vazia
+        if 'tipo' in df_a_filtrar.columns:
+             df_a_filtrar = df_a_filtrar[df_a_filtrar['tipo'].isin(selected_tipos)]
+        else:
+             st.warning("Filtro 'Tipo' não aplicado: Coluna 'tipo' (minúscula) não encontrada.")
+
+    # 3.3. Lógica para o filtro de Faturação
+    if selected_faturacao_user != "Todas":
+        faturacao_para_filtrar = []
+        if selected_faturacao_user == "Fatura eletrónica":
+            faturacao_para_filtrar.extend(["Fatura eletrónica", "Fatura eletrónica, Fatura em papel"])
+        elif selected_faturacao_user == "Fatura em papel":
+             faturacao_para_filtrar.extend(["Fatura eletrónica, Fatura em papel", "Fatura em papel"]) 
+        
+        if 'faturacao' in df_a_filtrar.columns:
+            df_a_filtrar = df_a_filtrar[df_a_filtrar['faturacao'].isin(faturacao_para_filtrar)]
+        else:
+            st.warning("Filtro 'Faturação' não aplicado: Coluna 'faturacao' não encontrada.")
+
+    # 3.4. Lógica para o filtro de Pagamento
+    if selected_pagamento_user != "Todos":
+        pagamento_para_filtrar = []
+        if selected_pagamento_user == "Débito Direto":
+            pagamento_para_filtrar.extend(["Débito Direto", "Débito Direto, Multibanco", "Débito Direto, Multibanco, Numerário/Payshop/CTT"])
+        elif selected_pagamento_user == "Multibanco":
+            pagamento_para_filtrar.extend(["Multibanco", "Débito Direto, Multibanco", "Débito Direto, Multibanco, Numerário/Payshop/CTT"])
+        elif selected_pagamento_user == "Numerário/Payshop/CTT":
+            pagamento_para_filtrar.extend(["Numerário/Payshop/CTT", "Débito Direto, Multibanco, Numerário/Payshop/CTT"])
+        
+        if 'pagamento' in df_a_filtrar.columns:
+            df_a_filtrar = df_a_filtrar[df_a_filtrar['pagamento'].isin(pagamento_para_filtrar)]
+        else:
+            st.warning("Filtro 'Pagamento' não aplicado: Coluna 'pagamento' não encontrada.")
+
+    df_tarifas_filtradas_todos_escaloes = df_a_filtrar
+    df_a_filtrar = df_tarifas_filtradas_todos_escaloes[df_tarifas_filtradas_todos_escaloes['escalao'] == escalao_num]
+
+# --- FIM DA LÓGICA DE FILTRAGEM PANDAS ---
+
+# --- INÍCIO DO CÁLCULO (Sobre o DF filtrado: df_a_filtrar) ---
+with st.spinner(f"A calcular custos para os {len(df_a_filtrar)} tarifários de gás filtrados..."):
+    
+    resultados_list_gas = []
+    
+    # --- Definir se é um mês de faturação completo (para taxas fixas mensais) ---
+    is_billing_month = 28 <= dias <= 31
+
+    # MIBGAS e ISP acompanham cada sub-período, exceto se o utilizador os alterou manualmente
+    for segmento in segmentos_vigencia:
+        segmento['mibgas_mwh'] = mibgas_input_mwh
+        if len(segmentos_vigencia) > 1 and mibgas_input_mwh == media_mibgas_calculada and not mibgas_df.empty:
+            media_mibgas_segmento = calcular_media_mibgas_periodo(segmento['data_inicio'], segmento['data_fim'])
+            if media_mibgas_segmento:
+                segmento['mibgas_mwh'] = media_mibgas_segmento
+        segmento['isp_gas_kwh'] = isp_gas_manual_input
+        if isp_gas_manual_input == isp_gas_default:
+            segmento['isp_gas_kwh'] = calc.obter_constante('ISP_Gas_eur_kwh', segmento['constantes'])
+
+    # Com ficheiro de consumos, cada sub-período recebe o consumo real desses dias
+    pesos_consumo_segmentos = None
+    if consumos_gas_ficheiro is not None and len(segmentos_vigencia) > 1:
+        consumos_segmentos = [calc.somar_consumos_gas_periodo(consumos_gas_ficheiro, seg['data_inicio'], seg['data_fim'])[0] for seg in segmentos_vigencia]
+        if sum(consumos_segmentos) > 0:
+            pesos_consumo_segmentos = consumos_segmentos
+
+    def calcular_resultados_tarifarios_gas(df_tarifas, escalao_calculo):
+        """Calcula o custo de cada tarifário de df_tarifas para o escalão indicado (tabela principal e exportação de todos os escalões)."""
+        resultados_tarifarios = []
+        for _, linha_tarifa in df_tarifas.iterrows():
+            resultado_calculo = calc.calcular_custo_gas_por_segmentos(
+                lambda segmento, consumo_segmento: calc.calcular_custo_gas_completo(
+                    linha_tarifa,
+                    consumo_segmento, 
+                    segmento['dias'],                      
+                    escalao_calculo,
+                    tarifa_social_gas,
+                    segmento['constantes'],
+                    tos_fixo_dia_selecionado,
+                    tos_variavel_kwh_selecionado,
+                    segmento['mibgas_mwh'],
+                    segmento['isp_gas_kwh'],
+                    acp_gas,
+                    desconto_continente_gas,
+                    VALOR_QUOTA_ACP_MENSAL,
+                    dias_periodo_total=dias
+                ),
+                segmentos_vigencia,
+                consumo_kwh,
+                pesos_consumo=pesos_consumo_segmentos
+            )
+        
+            if resultado_calculo:
+                # --- LÓGICA DE LINK DINÂMICO ---
+                nome_tarifa_atual = str(resultado_calculo.get('NomeParaExibir', '')).lower()
+            
+                if "tarifa regulada" in nome_tarifa_atual and link_cur_municipio:
+                    # Se for tarifa regulada, usa o link do CUR do município
+                    resultado_calculo['LinkAdesao'] = link_cur_municipio
+                else:
+                    # Caso contrário, usa o link (se existir) da aba Tarifas_Gas_Master
+                    resultado_calculo['LinkAdesao'] = linha_tarifa.get('site_adesao', '-')
+
+                resultado_calculo['info_notas'] = linha_tarifa.get('notas', '')
+                resultados_tarifarios.append(resultado_calculo)
+        return resultados_tarifarios
+
+    # Iterar e Calcular sobre o DataFrame JÁ FILTRADO (em cache pelo cenário, entre sessões)
+    parametros_cenario_gas = {
+        'versao_catalogo': versao_catalogo_gas,
+        'versao_mibgas': versao_mibgas,
+        'tarifarios': df_a_filtrar.index.tolist(),
+        'escalao': int(escalao_num),
+        'consumo_kwh': round(float(consumo_kwh), 6),
+        'dias': int(dias),
+        'segmentos': [
+            (seg['data_inicio'], seg['data_fim'], int(seg['dias']), round(float(seg['mibgas_mwh']), 6), round(float(seg['isp_gas_kwh']), 8))
+            for seg in segmentos_vigencia
+        ],
+        'pesos_consumo': [round(float(peso), 6) for peso in pesos_consumo_segmentos] if pesos_consumo_segmentos else None,
+        'tos': (tos_fixo_dia_selecionado, tos_variavel_kwh_selecionado),
+        'tarifa_social': bool(tarifa_social_gas),
+        'acp': bool(acp_gas),
+        'desconto_continente': bool(desconto_continente_gas),
+        'quota_acp': VALOR_QUOTA_ACP_MENSAL,
+        'link_cur': link_cur_municipio,
+    }
+    resultados_list_gas.extend(calcular_resultados_cenario_cache(
+        calcular_chave_cenario_gas(parametros_cenario_gas),
+        lambda: calcular_resultados_tarifarios_gas(df_a_filtrar, escalao_num)
+    ))
+
+    # Calcular "O Meu Tarifário" (é calculado SEPARADAMENTE)
+    if meu_tarifario_gas_ativo:
+        resultado_meu_gas = calc.calcular_custo_gas_por_segmentos(
+            lambda segmento, consumo_segmento: calc.calcular_custo_meu_tarifario_gas(
+                st.session_state,
+                consumo_segmento,
+                segmento['dias'],
+                escalao_num,
+                tarifa_social_gas,
+                segmento['constantes'],
+                tos_fixo_dia_selecionado,
+                tos_variavel_kwh_selecionado,
+                segmento['isp_gas_kwh'],
+                fracao_periodo=segmento['dias'] / dias
+            ),
+            segmentos_vigencia,
+            consumo_kwh,
+            pesos_consumo=pesos_consumo_segmentos
+        )
+        if resultado_meu_gas:
+            resultados_list_gas.append(resultado_meu_gas) # Adicionado à lista de resultados
+
+    # --- CÁLCULO DO TARIFÁRIO PERSONALIZADO ---
+    if personalizado_gas_ativo: # 'personalizado_gas_ativo' é o estado do checkbox
+        
+        # Criar o dicionário de inputs diretamente a partir das keys dos widgets (definidas no bloco UI)
+        inputs_personalizado_gas = {
+            'pers_gas_energia': st.session_state.get('pers_gas_energia', 0.0),
+            'pers_gas_fixo': st.session_state.get('pers_gas_fixo', 0.0),
+            'pers_gas_tar_energia': st.session_state.get('pers_gas_tar_energia', True),
+            'pers_gas_tar_fixo': st.session_state.get('pers_gas_tar_potencia', True)
+        }
+
+        # Só calcular se houver algum preço definido
+        if (float(inputs_personalizado_gas.get('pers_gas_energia', 0.0) or 0.0) > 0 or float(inputs_personalizado_gas.get('pers_gas_fixo', 0.0) or 0.0) > 0):
+            
+            resultado_personalizado_gas = calc.calcular_custo_gas_por_segmentos(
+                lambda segmento, consumo_segmento: calc.calcular_custo_personalizado_gas(
+                    inputs_personalizado_gas,
+                    consumo_segmento,
+                    segmento['dias'],
+                    escalao_num,
+                    tarifa_social_gas,
+                    segmento['constantes'],
+                    tos_fixo_dia_selecionado,
+                    tos_variavel_kwh_selecionado,
+                    segmento['isp_gas_kwh']
+                ),
+                segmentos_vigencia,
+                consumo_kwh,
+                pesos_consumo=pesos_consumo_segmentos
+            )
+            if resultado_personalizado_gas:
+                resultados_list_gas.append(resultado_personalizado_gas)
+
+
+    if not resultados_list_gas:
+        st.warning("Nenhum tarifário corresponde aos filtros selecionados ou nenhum custo pôde ser calculado. Por favor, ajuste os filtros ou clique em 'Limpar'.")
+        st.stop()
+    
+    st.markdown("---")
+
+    # --- CONSTRUIR RESUMO DA SIMULAÇÃO ---
+    cor_texto_resumo = "#333333" 
+    resumo_html_parts = [
+        f"<div style='background-color: #f9f9f9; border: 1px solid #ddd; padding: 15px; border-radius: 6px; margin-bottom: 25px; color: {cor_texto_resumo};'>"
+    ]
+    resumo_html_parts.append(f"<h5 style='margin-top:0; color: {cor_texto_resumo};'>Resumo da Simulação (Gás Natural):</h5>")
+    resumo_html_parts.append("<ul style='list-style-type: none; padding-left: 0;'>")
+
+    # Linha de Filtros
+    linha_filtros = (
+        f"<b>Segmento:</b> {selected_segmento_user} &nbsp;&nbsp;|&nbsp;&nbsp; "
+        f"<b>Faturação:</b> {selected_faturacao_user} &nbsp;&nbsp;|&nbsp;&nbsp; "
+        f"<b>Pagamento:</b> {selected_pagamento_user}"
+    )
+    resumo_html_parts.append(f"<li style='margin-bottom: 5px;'>{linha_filtros}</li>")
+    
+    # Linha Escalão e Município
+    linha_escalao_municipio = f"<b>{escalao_selecionado_str}</b> | <b>Município:</b> {municipio_selecionado}"
+    resumo_html_parts.append(f"<li style='margin-bottom: 5px;'>{linha_escalao_municipio}</li>")
+
+    # Linha de Consumo
+    resumo_html_parts.append(f"<li style='margin-bottom: 5px;'><b>Consumo Total: {consumo_kwh:.0f} kWh</b></li>")
+
+    # Linha Datas e Dias
+    usou_dias_manuais = False
+    if pd.notna(dias_manual_input_val) and dias_manual_input_val > 0 and int(dias_manual_input_val) != dias_default_calculado:
+        usou_dias_manuais = True
+    
+    if usou_dias_manuais:
+        resumo_html_parts.append(f"<li style='margin-bottom: 5px;'><b>Período:</b> {dias} dias (definido manualmente)</li>")
+    else:
+        resumo_html_parts.append(f"<li style='margin-bottom: 5px;'><b>Período:</b> De {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')} ({dias} dias)</li>")
+
+    # Linha MIBGAS
+    resumo_html_parts.append(f"<li style='margin-bottom: 5px;'><b>MIBGAS:</b> {mibgas_input_mwh:.2f} €/MWh</li>")
+
+    # Linha Tarifa Social
+    if tarifa_social_gas:
+        resumo_html_parts.append(f"<li style='margin-bottom: 5px; color: red;'><b>Benefício Aplicado:</b> Tarifa Social (Gás)</li>")
+
+    resumo_html_parts.append("</ul></div>")
+    html_resumo_final = "".join(resumo_html_parts)
+    st.markdown(html_resumo_final, unsafe_allow_html=True)
+
+    # --- TÍTULO DOS RESULTADOS ---
+    # --- Processamento final e exibição da tabela de resultados ---
+    st.subheader("💰 Tiago Felícia - Tarifários de Gás Natural")
+
+    vista_simplificada = st.checkbox(
+        "📱 Ativar vista simplificada (ideal em ecrãs menores)",
+        value=True,
+        key="chk_vista_simplificada_gas"
+    )
+    sincronizar_grelha_gas = st.checkbox(
+        "🔄 Enviar cada ordenação/filtro da tabela para a exportação",
+        value=False,
+        key="chk_sincronizar_grelha_gas",
+        help="Desligado: ordenar e filtrar a tabela é feito só no browser, sem recalcular a página; os filtros e a ordenação da tabela são lidos quando carrega no botão de exportação do Excel. Ligado: cada ordenação/filtro recalcula a página."
+    )
+
+    st.write("**Total** com todos os componentes, taxas e impostos e **valores unitários** de **Energia e Fixo** sem IVA.")
+    st.write("**O nome do tarifário tem link para mais informações/adesão sobre o mesmo.**")
+
+    st.markdown("➡️ [**Exportar Tabela para Excel**](#exportar-excel-detalhada-gas)")
+
+    df_resultados_gas_final = pd.DataFrame(resultados_list_gas)
+    
+        # --- BLOCO PARA EXIBIR POUPANÇA ---
+    try:
+        # Inicializar/resetar variáveis do session_state (com keys específicas para gás)
+        st.session_state.poupanca_excel_texto_gas = ""
+        st.session_state.poupanca_excel_cor_gas = "000000"  # Preto
+        st.session_state.poupanca_excel_negrito_gas = False
+
+        if meu_tarifario_gas_ativo and not df_resultados_gas_final.empty:
+            meu_tarifario_linha = df_resultados_gas_final[df_resultados_gas_final['NomeParaExibir'].str.contains("O Meu Tarifário", case=False, na=False)]
+
+            if not meu_tarifario_linha.empty:
+                custo_meu_tarifario = meu_tarifario_linha['Total Período (€)'].iloc[0]
+                nome_meu_tarifario_ui = meu_tarifario_linha['NomeParaExibir'].iloc[0]
+
+                if pd.notna(custo_meu_tarifario):
+                    outros_tarifarios_ui_df = df_resultados_gas_final[
+                        (df_resultados_gas_final['tipo'] != 'Pessoal')
+                    ]
+                    
+                    nome_coluna_total = 'Total Período (€)'
+                    
+                    custos_outros_validos_ui = outros_tarifarios_ui_df[nome_coluna_total].dropna()
+
+                    mensagem_poupanca_html_ui = "" 
+
+                    if not custos_outros_validos_ui.empty:
+                        custo_minimo_outros_ui = custos_outros_validos_ui.min()
+                        linha_mais_barata_outros_ui = outros_tarifarios_ui_df.loc[outros_tarifarios_ui_df[nome_coluna_total] == custo_minimo_outros_ui].iloc[0]
+                        nome_tarifario_mais_barato_outros_ui = linha_mais_barata_outros_ui['NomeParaExibir']
+
+                        if custo_meu_tarifario > custo_minimo_outros_ui:
+                            poupanca_abs_ui = custo_meu_tarifario - custo_minimo_outros_ui
+                            poupanca_rel_ui = (poupanca_abs_ui / custo_meu_tarifario) * 100 if custo_meu_tarifario != 0 else 0
+                            
+                            mensagem_poupanca_html_ui = (
+                                f"<span style='color:red; font-weight:bold;'>Poupança entre '{nome_meu_tarifario_ui}' ({custo_meu_tarifario:.2f} €) e o mais económico da lista, "
+                                f"'{nome_tarifario_mais_barato_outros_ui}' ({custo_minimo_outros_ui:.2f} €): </span>"
+                                f"<span style='color:red; font-weight:bold;'>{poupanca_abs_ui:.2f} €</span> "
+                                f"<span style='color:red; font-weight:bold;'>({poupanca_rel_ui:.2f} %).</span>"
+                            )
+                            # Guardar para Excel
+                            st.session_state.poupanca_excel_texto_gas = (
+                                f"Poupança entre '{nome_meu_tarifario_ui}' ({custo_meu_tarifario:.2f} €) e o mais económico da lista, "
+                                f"'{nome_tarifario_mais_barato_outros_ui}' ({custo_minimo_outros_ui:.2f} €): "
+                                f"{poupanca_abs_ui:.2f} € ({poupanca_rel_ui:.2f} %)."
+                            )
+                            st.session_state.poupanca_excel_cor_gas = "FF0000" # Vermelho
+                            st.session_state.poupanca_excel_negrito_gas = True
+                        
+                        elif custo_meu_tarifario <= custo_minimo_outros_ui:
+                            mensagem_poupanca_html_ui = f"<span style='color:green; font-weight:bold;'>Parabéns! O seu tarifário ('{nome_meu_tarifario_ui}' - {custo_meu_tarifario:.2f}€) já é o mais económico ou está entre os mais económicos da lista!</span>"
+                            st.session_state.poupanca_excel_texto_gas = f"Parabéns! O seu tarifário ('{nome_meu_tarifario_ui}' - {custo_meu_tarifario:.2f}€) já é o mais económico ou está entre os mais económicos da lista!"
+                            st.session_state.poupanca_excel_cor_gas = "008000" # Verde
+                            st.session_state.poupanca_excel_negrito_gas = True
+                    
+                    if mensagem_poupanca_html_ui:
+                        st.markdown(mensagem_poupanca_html_ui, unsafe_allow_html=True)
+
+    except Exception as e_poupanca: 
+        st.error(f"Erro ao processar a informação de poupança para UI (Gás): {e_poupanca}")
+        st.session_state.poupanca_excel_texto_gas = "Erro ao calcular a informação de poupança."
+    # --- FIM DO BLOCO DE POUPANÇA ---
+    
+    df_resultados_gas_final = df_resultados_gas_final.sort_values(by="Total Período (€)", ascending=True).reset_index(drop=True)
+
+    # --- Lógica de Colunas Visíveis ---
+    colunas_visiveis_presentes = []
+    
+    colunas_base_energia = ['Termo Energia (€/kWh)'] 
+    coluna_fixo_gas = 'Termo Fixo (€/dia)'
+    
+    if vista_simplificada:
+        colunas_base_visivel = ['NomeParaExibir', 'Total Período (€)']
+        colunas_visiveis_presentes = colunas_base_visivel + colunas_base_energia
+        if coluna_fixo_gas in df_resultados_gas_final.columns:
+            colunas_visiveis_presentes.append(coluna_fixo_gas)
+    else:
+        colunas_base_visivel = ['NomeParaExibir', 'Total Período (€)']
+        colunas_visiveis_presentes = colunas_base_visivel + colunas_base_energia
+        if coluna_fixo_gas in df_resultados_gas_final.columns:
+            colunas_visiveis_presentes.append(coluna_fixo_gas)
+        colunas_visiveis_presentes.extend(['tipo', 'Comercializador', 'Segmento', 'Faturação', 'Pagamento'])
+
+    colunas_visiveis_presentes = [col for col in colunas_visiveis_presentes if col in df_resultados_gas_final.columns]
+
+    # --- Colunas Essenciais para JS (Tooltips e Estilos) ---
+    colunas_essenciais_js = [COLUNA_ID_LINHA_GAS, 'tipo', 'NomeParaExibir', 'LinkAdesao', 'info_notas'] 
+    colunas_para_aggrid_final = list(dict.fromkeys(colunas_visiveis_presentes + colunas_essenciais_js + COLUNAS_TOOLTIP_GAS))
+    colunas_para_aggrid_final = [col for col in colunas_para_aggrid_final if col in df_resultados_gas_final.columns or col == COLUNA_ID_LINHA_GAS]
+
+    # Tabela completa fica no servidor (exportações); o browser recebe a versão compacta
+    df_aggrid_completo = df_resultados_gas_final.assign(**{COLUNA_ID_LINHA_GAS: df_resultados_gas_final.index})[colunas_para_aggrid_final]
+    df_aggrid_display = compactar_dados_aggrid_gas(df_aggrid_completo)
+
+    # Definição estática da grelha (em cache) + dados que mudam a cada rerun
+    opcoes_grelha_base_gas = construir_opcoes_grelha_gas(
+        tuple((col, str(tipo)) for col, tipo in df_aggrid_display.dtypes.items()),
+        vista_simplificada,
+        tuple(colunas_visiveis_presentes)
+    )
+    colunas_para_ocultar_final = ['LinkAdesao', 'info_notas'] + COLUNAS_TOOLTIP_GAS
+    min_max_data_for_js = calcular_min_max_colunas_cor(df_aggrid_display)
+    gridOptions = aplicar_dados_grelha_gas(opcoes_grelha_base_gas, min_max_data_for_js, dias)
+
+    # --- 3. RENDERIZAR O AGGRID ---
+    grid_response = AgGrid(
+        df_aggrid_display, 
+        gridOptions=gridOptions,
+        custom_css=CSS_GRELHA_GAS,
+        fit_columns_on_grid_load=True,
+        theme='alpine',
+        allow_unsafe_jscode=True,
+        key="aggrid_gas_standalone_v16_bold_fix",
+        enable_enterprise_modules=True,
+        tooltipShowDelay=200, 
+        tooltipMouseTrack=True,
+        # Por omissão a grelha não provoca reruns; o estado é lido pelo botão de exportação
+        update_mode=(GridUpdateMode.FILTERING_CHANGED | GridUpdateMode.SORTING_CHANGED) if sincronizar_grelha_gas else GridUpdateMode.NO_UPDATE
+    )
+
+    # --- BLOCO DE EXPORTAÇÃO EXCEL ---
+    # Parâmetros do cenário (chave da cache do Excel e metadados das exportações de dados)
+    metadados_cenario_gas = {
+        'data_inicio': data_inicio.isoformat(),
+        'data_fim': data_fim.isoformat(),
+        'dias': int(dias),
+        'consumo_kwh': float(consumo_kwh),
+        'escalao': int(escalao_num),
+        'municipio': municipio_selecionado,
+        'mibgas_eur_mwh': float(mibgas_input_mwh),
+        'media_mibgas': ponderacao_mibgas,
+        'isp_eur_kwh': float(isp_gas_manual_input),
+        'tarifa_social': bool(tarifa_social_gas),
+        'acp': bool(acp_gas),
+        'desconto_continente': bool(desconto_continente_gas),
+        'filtro_segmento': selected_segmento_user,
+        'filtro_tipos': ", ".join(selected_tipos),
+        'filtro_faturacao': selected_faturacao_user,
+        'filtro_pagamento': selected_pagamento_user,
+        'versao_catalogo': versao_catalogo_gas,
+        'versao_mibgas': versao_mibgas,
+    }
+    st.markdown("<a id='exportar-excel-detalhada-gas'></a>", unsafe_allow_html=True)
+    st.markdown("---")
+    with st.expander("📥 Exportar Tabela Detalhada para Excel"):
+
+        opcoes_export_excel_gas = []
+        default_cols_excel_gas = []
+
+        if 'colunas_visiveis_presentes' in locals() and isinstance(colunas_visiveis_presentes, list):
+            opcoes_export_excel_gas.extend(colunas_visiveis_presentes)
+            default_cols_excel_gas = list(colunas_visiveis_presentes)
+
+        colunas_tooltip_dados_para_export = colunas_para_ocultar_final 
+        for col_tooltip in colunas_tooltip_dados_para_export:
+            if col_tooltip in df_aggrid_completo.columns and col_tooltip not in opcoes_export_excel_gas:
+                opcoes_export_excel_gas.append(col_tooltip)
+
+        colunas_para_exportar_excel_selecionadas = st.multiselect(
+            "Selecione as colunas para exportar para Excel (Gás):",
+            options=opcoes_export_excel_gas, 
+            default=default_cols_excel_gas,
+            key="cols_export_excel_selector_gas"
+        )
+        
+        opcoes_limite_export = ["Todos"] + [f"Top {i}" for i in [10, 20, 30, 40, 50]]
+        limite_export_selecionado = st.selectbox(
+            "Número de tarifários a exportar (ordenados pelo 'Total (€)' atual da tabela):",
+            options=opcoes_limite_export,
+            index=0, 
+            key="limite_tarifarios_export_excel_gas"
+        )
+
+        exportar_todos_escaloes_gas = st.checkbox(
+            "Exportar todos os escalões (uma folha por escalão)",
+            key="chk_export_todos_escaloes_gas",
+            help="Calcula os tarifários dos 4 escalões com o consumo e os filtros atuais e exporta cada escalão numa folha. Não inclui 'O Meu Tarifário' nem o Tarifário Personalizado."
+        )
+
+        def gerar_folhas_todos_escaloes_gas():
+            """Gera as folhas do Excel escalão a escalão (cada escalão só é calculado quando vai ser escrito)."""
+            for escalao_folha in [1, 2, 3, 4]:
+                df_tarifas_escalao = df_tarifas_filtradas_todos_escaloes[df_tarifas_filtradas_todos_escaloes['escalao'] == escalao_folha]
+                resultados_escalao = calcular_resultados_tarifarios_gas(df_tarifas_escalao, escalao_folha)
+                if not resultados_escalao:
+                    continue
+                df_resultados_escalao = pd.DataFrame(resultados_escalao).sort_values(by="Total Período (€)").reset_index(drop=True)
+                df_export_escalao, tipos_escalao, nome_coluna_tarifario_escalao = preparar_df_exportacao_excel(
+                    df_resultados_escalao, colunas_para_exportar_excel_selecionadas, limite_export_selecionado
+                )
+                yield {
+                    'nome_folha': f"Escalão {escalao_folha}",
+                    'df_para_exportar': df_export_escalao,
+                    'tipos_reais_para_estilo_serie': tipos_escalao,
+                    'min_max_config_para_cores': calcular_min_max_colunas_cor(df_export_escalao),
+                    'nome_coluna_tarifario': nome_coluna_tarifario_escalao,
+                    'resumo_html_para_excel': None,
+                    'poupanca_texto_para_excel': "",
+                    'meu_tarifario_ativo_flag': False,
+                    'personalizado_gas_ativo_flag': False,
+                }
+
+        if not colunas_para_exportar_excel_selecionadas:
+            st.warning("Por favor, selecione pelo menos uma coluna para exportar.")
+        else:
+            # Estado atual da tabela (filtros/ordenação feitos na grelha), a partir dos ids de linha.
+            # Sem sincronização, o estado é lido no browser pelo próprio botão de exportação.
+            pedido_excel_gas = False
+            if sincronizar_grelha_gas:
+                df_dados_filtrados_da_grid = linhas_da_grelha_gas(grid_response, df_aggrid_completo)
+                aviso_estado_grelha_gas = "A tabela ainda não enviou os filtros/ordenação atuais: o ficheiro contém todos os tarifários, ordenados pelo total."
+                nota_estado_grelha_gas = None
+            else:
+                estado_capturado_gas = componente_estado_grelha(
+                    rotulo="📸 Preparar Excel com os filtros e a ordenação atuais da tabela",
+                    nome_api=NOME_API_GRELHA_GAS,
+                    coluna_id=COLUNA_ID_LINHA_GAS,
+                    key="estado_grelha_export_gas",
+                    default=None
+                )
+                # Cada clique tem um carimbo próprio: só o rerun desse clique conta como pedido de exportação
+                if estado_capturado_gas and estado_capturado_gas.get('clique') != st.session_state.get('clique_estado_grelha_gas_processado'):
+                    st.session_state['clique_estado_grelha_gas_processado'] = estado_capturado_gas.get('clique')
+                    pedido_excel_gas = True
+                df_dados_filtrados_da_grid = linhas_do_estado_capturado_gas(estado_capturado_gas, df_aggrid_completo)
+                if estado_capturado_gas is None:
+                    aviso_estado_grelha_gas = "Ainda não carregou no botão acima: o ficheiro contém todos os tarifários ordenados pelo total, não os filtros/ordenação que vê na tabela."
+                else:
+                    aviso_estado_grelha_gas = "Não foi possível ler o estado da tabela (ou a tabela mudou desde o último clique): o ficheiro contém todos os tarifários ordenados pelo total. Carregue novamente no botão acima."
+                nota_estado_grelha_gas = "Ficheiro com os filtros/ordenação da tabela no momento do último clique no botão acima. Se alterou a tabela depois, carregue novamente no botão."
+
+            if df_dados_filtrados_da_grid is None:
+                df_dados_filtrados_da_grid = df_aggrid_completo.copy()
+            else:
+                aviso_estado_grelha_gas = None
+
+            colunas_export_validas = [col for col in colunas_para_exportar_excel_selecionadas if col in df_dados_filtrados_da_grid.columns]
+            estado_grelha_gas = int(pd.util.hash_pandas_object(df_dados_filtrados_da_grid[colunas_export_validas], index=False).sum()) if colunas_export_validas else 0
+
+            poupanca_texto_excel = st.session_state.get('poupanca_excel_texto_gas', "")
+            cor_poupanca_excel = st.session_state.get('poupanca_excel_cor_gas', "000000")
+            negrito_poupanca_excel = st.session_state.get('poupanca_excel_negrito_gas', False)
+
+            chave_excel_gas = calcular_chave_exportacao_excel(
+                metadados_cenario_gas, colunas_para_exportar_excel_selecionadas, limite_export_selecionado,
+                exportar_todos_escaloes_gas, estado_grelha_gas, html_resumo_final,
+                poupanca_texto_excel, cor_poupanca_excel, negrito_poupanca_excel,
+                meu_tarifario_gas_ativo, personalizado_gas_ativo, datetime.date.today()
+            )
+
+            def construir_gerador_excel_gas():
+                """Função de geração do ficheiro (só preparada quando é preciso gerar)."""
+                if exportar_todos_escaloes_gas:
+                    return lambda: exportar_excel_gas(gerar_folhas_todos_escaloes_gas())
+                # Recebe cópias dos dados: pode correr numa thread sem acesso à sessão
+                df_export_final, tipos_reais_para_estilo, nome_coluna_tarifario_excel = preparar_df_exportacao_excel(
+                    df_dados_filtrados_da_grid, colunas_para_exportar_excel_selecionadas, limite_export_selecionado
+                )
+                return functools.partial(
+                    exportar_excel_completo,
+                    df_export_final,
+                    tipos_reais_para_estilo,
+                    min_max_data_for_js,
+                    nome_coluna_tarifario_excel,
+                    html_resumo_final,
+                    poupanca_texto_excel,
+                    meu_tarifario_gas_ativo,
+                    personalizado_gas_ativo,
+                    cor_poupanca=cor_poupanca_excel,
+                    negrito_poupanca=negrito_poupanca_excel
+                )
+
+            if not exportar_todos_escaloes_gas and (df_dados_filtrados_da_grid.empty or not colunas_export_validas):
+                st.info("Tabela de Gás está vazia ou sem as colunas selecionadas, nada para exportar.")
+            else:
+                output_excel_bytes, erro_excel_gas = consultar_excel_em_cache(chave_excel_gas)
+
+                # Pré-geração em segundo plano, só do ficheiro de um escalão (barato) e uma vez por
+                # chave nesta sessão: normalmente o ficheiro já está pronto quando é pedido.
+                # O ficheiro com todos os escalões recalcula os 4 escalões e só é gerado a pedido.
+                chaves_excel_pre_agendadas = st.session_state.setdefault('chaves_excel_gas_pre_agendadas', set())
+                if (output_excel_bytes is None and erro_excel_gas is None and not exportar_todos_escaloes_gas
+                        and chave_excel_gas not in chaves_excel_pre_agendadas):
+                    chaves_excel_pre_agendadas.add(chave_excel_gas)
+                    obter_excel_em_cache(chave_excel_gas, construir_gerador_excel_gas(), esperar=False)
+
+                if sincronizar_grelha_gas and output_excel_bytes is None:
+                    pedido_excel_gas = st.button("Preparar Download do Ficheiro Excel (Gás)", key="btn_prep_excel_download_gas")
+                if output_excel_bytes is None and pedido_excel_gas:
+                    if erro_excel_gas is None:
+                        with st.spinner("A gerar ficheiro Excel de Gás..."):
+                            output_excel_bytes, erro_excel_gas = obter_excel_em_cache(chave_excel_gas, construir_gerador_excel_gas())
+                    if erro_excel_gas:
+                        st.error(erro_excel_gas)
+
+                if output_excel_bytes is not None:
+                    if not exportar_todos_escaloes_gas:
+                        if aviso_estado_grelha_gas:
+                            st.warning(aviso_estado_grelha_gas)
+                        elif nota_estado_grelha_gas:
+                            st.caption(nota_estado_grelha_gas)
+                    nome_ficheiro_final_dl = f"Tiago_Felicia_Gas_Natural_{data_inicio.strftime('%Y%m%d')}_{data_fim.strftime('%Y%m%d')}_{'Todos_Escaloes' if exportar_todos_escaloes_gas else f'E{escalao_num}'}.xlsx"
+                    st.download_button(
+                        label=f"📥 Descarregar Excel ({nome_ficheiro_final_dl})",
+                        data=output_excel_bytes,
+                        file_name=nome_ficheiro_final_dl,
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        key="btn_dl_excel_gas_completo"
+                    )
+
+    # --- FIM DO BLOCO DE EXPORTAÇÃO EXCEL ---
+
+    # --- EXPORTAÇÃO DE DADOS (CSV / PARQUET / JSON LINES) ---
+    with st.expander("📄 Exportar Dados (CSV, Parquet, JSON Lines)"):
+        st.markdown("Todos os tarifários calculados, com a decomposição completa dos custos e os parâmetros da simulação em cada linha. Sem formatação, prontos para análise.")
+
+        # 'O Meu Tarifário' e o Personalizado dependem de dados da sessão que não estão nos metadados
+        chave_dados_gas = calcular_chave_cenario_gas({
+            **metadados_cenario_gas,
+            'tarifarios_pessoais': df_resultados_gas_final[df_resultados_gas_final['tipo'] == 'Pessoal'].to_dict('records')
+            if 'tipo' in df_resultados_gas_final.columns else [],
+        })
+
+        nome_base_dados_dl = f"Tiago_Felicia_Gas_Natural_{data_inicio.strftime('%Y%m%d')}_{data_fim.strftime('%Y%m%d')}_E{escalao_num}"
+        colunas_botoes_dados = st.columns(len(FORMATOS_EXPORTACAO_DADOS))
+        for coluna_botao, (formato_dados, (extensao_dados, mime_dados)) in zip(colunas_botoes_dados, FORMATOS_EXPORTACAO_DADOS.items()):
+            with coluna_botao:
+                bytes_dados, erro_export_dados = obter_exportacao_dados_em_cache(
+                    chave_dados_gas, formato_dados, df_resultados_gas_final, metadados_cenario_gas
+                )
+                if erro_export_dados:
+                    st.warning(f"Exportação {formato_dados} indisponível: {erro_export_dados}")
+                else:
+                    st.download_button(
+                        label=f"📥 {formato_dados}",
+                        data=bytes_dados,
+                        file_name=f"{nome_base_dados_dl}.{extensao_dados}",
+                        mime=mime_dados,
+                        key=f"btn_dl_dados_gas_{extensao_dados}",
+                        use_container_width=True
+                    )
+    # --- FIM DA EXPORTAÇÃO DE DADOS ---
+
+    # --- INÍCIO: PÓDIO DA POUPANÇA ---
+    st.subheader("🏆 O Seu Pódio da Poupança (Gás)")
+    st.markdown("Estas são as 3 opções mais económicas para si, com base nos seus consumos atuais.")
+
+    # Garantir que o DataFrame está ordenado e o índice está correto
+    df_resultados_ordenado_gas = df_resultados_gas_final.sort_values(by="Total Período (€)").reset_index(drop=True)
+    top3_gas = df_resultados_ordenado_gas.head(3)
+
+    if len(top3_gas) >= 3:
+        custo_referencia = None
+        nome_referencia = ""
+    
+        if meu_tarifario_gas_ativo and not df_resultados_ordenado_gas[df_resultados_ordenado_gas['NomeParaExibir'].str.contains("O Meu Tarifário", na=False)].empty:
+            meu_tar_resultado = df_resultados_ordenado_gas[df_resultados_ordenado_gas['NomeParaExibir'].str.contains("O Meu Tarifário", na=False)].iloc[0]
+            if 'Total Período (€)' in meu_tar_resultado and pd.notna(meu_tar_resultado['Total Período (€)']):
+                custo_referencia = meu_tar_resultado['Total Período (€)']
+                nome_referencia = meu_tar_resultado['NomeParaExibir']
+
+        if custo_referencia is None and not df_resultados_ordenado_gas.empty:
+            # Fallback: Usar o mais caro se o Meu Tarifário não existir
+            pior_tarifario = df_resultados_ordenado_gas.iloc[-1]
+            custo_referencia = pior_tarifario['Total Período (€)']
+            nome_referencia = pior_tarifario['NomeParaExibir']
+    
+        if custo_referencia is not None:
+            st.caption(f"A comparação é feita em relação ao seu ponto de referência ('{nome_referencia}' ({custo_referencia:.2f} €)).")
+    
+            col2, col1, col3 = st.columns([1, 1.2, 1])
+
+            def apresentar_item_podio_gas(coluna, dados_podio, emoji):
+                with coluna:
+                    st.markdown(f"<p style='text-align: center; font-size: 24px;'>{emoji}</p>", unsafe_allow_html=True)
+                    with st.container(border=True):
+                        st.markdown(f"<p style='text-align: center; font-weight: bold;'>{dados_podio['NomeParaExibir']}</p>", unsafe_allow_html=True)
+                        st.metric("Custo Estimado", f"{dados_podio['Total Período (€)']:.2f} €")
+                    
+                        diferenca = dados_podio['Total Período (€)'] - custo_referencia
+                        if diferenca < 0:
+                            st.metric("Poupança", f"{abs(diferenca):.2f} €/mês", delta_color="off")
+                        elif diferenca > 0:
+                            st.metric("Custo Adicional", f"{diferenca:.2f} €/mês", delta=f"{diferenca:.2f} €", delta_color="inverse")
+                        else:
+                            st.metric("Custo", "Igual à referência", delta_color="off")
+
+            apresentar_item_podio_gas(col1, top3_gas.iloc[0], "🥇 1º lugar")
+            apresentar_item_podio_gas(col2, top3_gas.iloc[1], "🥈2º lugar")
+            apresentar_item_podio_gas(col3, top3_gas.iloc[2], "🥉3º lugar")
+
+    st.markdown("---")
+    # --- FIM: PÓDIO DA POUPANÇA ---
+
+# --- SECÇÃO DE PARTILHA POR URL
+st.subheader("🔗 Partilhar Simulação")
+
+# A lógica só é executada se existirem parâmetros no URL
+if st.query_params:
+    
+    # --- URL para o da sua página de Gás Natural ---
+    base_url = "https://tiagofelicia-gas.streamlit.app/" 
+
+    # Query string canónica: o mesmo cenário gera sempre o mesmo link
+    query_string = canonicalizar_parametros_url_gas(st.query_params.to_dict())
+    shareable_link = f"{base_url}?{query_string}"
+
+    # --- Componente HTML/JS para o campo de texto e botão de copiar ---
+    html_componente_copiar = f"""
+    <div style="display: flex; align-items: center; gap: 8px; font-family: sans-serif;">
+        <input 
+            type="text" 
+            id="shareable-link-input-gas" 
+            value="{shareable_link}" 
+            readonly 
+            style="width: 100%; padding: 8px; border-radius: 6px; border: 1px solid #ccc; font-size: 14px;"
+        >
+        <button 
+            id="copy-button-gas" 
+            onclick="copyLinkToClipboardGas()"
+            style="
+                padding: 8px 12px; 
+                border-radius: 6px; 
+                border: 1px solid #ccc;
+                background-color: #f0f2f6; 
+                cursor: pointer;
+                font-size: 14px;
+                white-space: nowrap;
+            "
+        >
+            📋 Copiar Link
+        </button>
+    </div>
+
+    <script>
+    function copyLinkToClipboardGas() {{
+        const linkInput = document.getElementById("shareable-link-input-gas");
+        linkInput.select();
+        linkInput.setSelectionRange(0, 99999); // Para telemóveis
+
+        navigator.clipboard.writeText(linkInput.value).then(() => {{
+            const copyButton = document.getElementById("copy-button-gas");
+            copyButton.innerText = "Copiado!";
+            setTimeout(() => {{
+                copyButton.innerHTML = "&#128203; Copiar Link";
+            }}, 2000);
+        }}).catch(err => {{
+            console.error('Falha ao copiar o link: ', err);
+        }});
+    }}
+    </script>
+    """
+    st.components.v1.html(html_componente_copiar, height=55)
+
+else:
+    st.info("Altere um dos parâmetros da simulação (Escalão, Município, Consumo, etc.) para gerar um link de partilha.")
+
+
+# Legenda das Colunas da Tabela Tarifários de Gás Natural
+st.markdown("---")
+st.subheader("📖 Legenda das Colunas da Tabela Tarifários de Gás Natural")
+st.caption("""
+* **Tarifário**: Nome identificativo do tarifário. Pode incluir notas sobre descontos de fatura específicos.
+* **Tipo**: Indica se o tarifário é:
+    * `Fixo`: Preços de energia e potência são constantes.
+    * `Indexado`: Preço da energia baseado na média do MIBGÁS para o período selecionado.
+    * `Pessoal`: O seu tarifário, conforme introduzido.
+* **Comercializador**: Empresa que oferece o tarifário.
+* **[...] (€/kWh)**: Custo unitário da energia, **sem IVA**.
+    * Para "O Meu Tarifário", este valor já reflete quaisquer descontos percentuais de energia e o desconto da Tarifa Social que tenhas configurado.
+    * Para os outros tarifários, é o preço base sem IVA, já considerando o desconto da Tarifa Social se ativa.
+* **Termo Fixo (€/dia)**: Custo unitário diário do Termo Fixo **sem IVA**.
+    * Para "O Meu Tarifário", este valor já reflete quaisquer descontos percentuais de potência e o desconto da Tarifa Social que tenhas configurado.
+    * Para os outros tarifários, é o preço base sem IVA, já considerando o desconto da Tarifa Social se ativa.
+* **Total (€)**: Valor do custo final estimado da fatura para o período simulado. Este custo inclui:
+    * Custo da energia consumida (com IVA aplicado conforme as regras).
+    * Custo do Termo Fixo (com IVA aplicado conforme as regras).
+    * Taxas adicionais: ISP Gás e TOS.
+    * Quaisquer descontos de fatura em euros (para "O Meu Tarifário" ou especificados nos tarifários).
+""")
+
+# Usar f-strings para construir o HTML da legenda
+st.subheader("🎨 Legenda de Cores por Tipo de Tarifário")
+
+# Definições de cores
+cor_fundo_meu_tarifario_legenda = "red"
+cor_texto_meu_tarifario_legenda = "white"
+cor_fundo_tarifario_personalizado_legenda = "#92D050"
+cor_texto_tarifario_personalizado_legenda = "white"
+cor_fundo_indexado_css = "#FFE699"
+cor_texto_indexado_media_css = "black"
+cor_fundo_fixo_legenda = "#f0f0f0" # Cor ligeiramente cinza para Fixo
+cor_texto_fixo_legenda = "#333333"
+borda_fixo_legenda = "#CCCCCC"     # Borda para o quadrado branco ser visível
+
+# Construir a string HTML da legenda passo a passo
+html_items = ""
+
+# Item: O Meu Tarifário
+if meu_tarifario_gas_ativo:
+    html_items += f"""<div style="display: flex; align-items: center; margin-bottom: 5px;">
+        <div style="width: 18px; height: 18px; background-color: {cor_fundo_meu_tarifario_legenda}; border: 1px solid #ccc; border-radius: 4px; margin-right: 8px;"></div>
+        <span style="background-color: {cor_fundo_meu_tarifario_legenda}; color: {cor_texto_meu_tarifario_legenda}; padding: 2px 6px; border-radius: 4px; font-weight: bold;">O Meu Tarifário</span>
+        <span style="margin-left: 8px;">- Tarifário configurado pelo utilizador.</span>
+    </div>"""
+
+# Item: Tarifário Personalizado
+if personalizado_gas_ativo:
+    html_items += f"""<div style="display: flex; align-items: center; margin-bottom: 5px;">
+        <div style="width: 18px; height: 18px; background-color: {cor_fundo_tarifario_personalizado_legenda}; border: 1px solid #ccc; border-radius: 4px; margin-right: 8px;"></div>
+        <span style="background-color: {cor_fundo_tarifario_personalizado_legenda}; color: {cor_texto_tarifario_personalizado_legenda}; padding: 2px 6px; border-radius: 4px; font-weight: bold;">Tarifário Personalizado</span>
+        <span style="margin-left: 8px;">- Tarifário configurado pelo utilizador.</span>
+    </div>"""
+
+# Item: Indexado
+html_items += f"""<div style="display: flex; align-items: center; margin-bottom: 5px;">
+    <div style="width: 18px; height: 18px; background-color: {cor_fundo_indexado_css}; border: 1px solid #ccc; border-radius: 4px; margin-right: 8px;"></div>
+    <span style="background-color: {cor_fundo_indexado_css}; color: {cor_texto_indexado_media_css}; padding: 2px 6px; border-radius: 4px;">Indexado</span>
+    <span style="margin-left: 8px;">- Preço de energia baseado na média MIBGÁS do período definido.</span>
+</div>"""
+
+# Item: Fixo
+html_items += f"""<div style="display: flex; align-items: center; margin-bottom: 5px;">
+    <div style="width: 18px; height: 18px; background-color: {cor_fundo_fixo_legenda}; border: 1px solid {borda_fixo_legenda}; border-radius: 4px; margin-right: 8px;"></div>
+    <span style="background-color: {cor_fundo_fixo_legenda}; color: {cor_texto_fixo_legenda}; padding: 2px 6px; border-radius: 4px;">Tarifário Fixo</span>
+    <span style="margin-left: 8px;">- Preços de energia constantes.</span>
+</div>"""
+
+# Criar o HTML final e renderizar
+legenda_html_completa = f"""<div style="font-size: 14px;">{html_items}</div>"""
+st.markdown(legenda_html_completa, unsafe_allow_html=True)
+
+# --- DATAS DE REFERÊNCIA ---
+st.markdown("---") # Adiciona um separador visual
+st.subheader("📅 Data de Referência dos Valores de Mercado no simulador")
+
+# Processar e exibir Data_Valores_MIBGAS_SPOT a partir da aba "Info"
+data_mibgas_spot_formatada_str = "Não disponível"
+
+linha_data_mibgas_spot = info_tab[info_tab['Descricao'] == 'Ultima Data MIBGAS SPOT']
+
+if not linha_data_mibgas_spot.empty:
+    data_valores_mibgas_spot = linha_data_mibgas_spot['Data'].iloc[0]
+    if pd.notna(data_valores_mibgas_spot):
+        data_valores_mibgas_spot_temp = None # Variável temporária para a data MIBGAS
+        try:
+            if isinstance(data_valores_mibgas_spot, (datetime.datetime, pd.Timestamp)):
+                data_valores_mibgas_spot_temp = data_valores_mibgas_spot.date()
+            else:
+                timestamp_convertido_mibgas = pd.to_datetime(data_valores_mibgas_spot, errors='coerce')
+                if pd.notna(timestamp_convertido_mibgas):
+                    data_valores_mibgas_spot_temp = timestamp_convertido_mibgas.date()
+            
+            if data_valores_mibgas_spot_temp and isinstance(data_valores_mibgas_spot_temp, datetime.date):
+                data_mibgas_spot_formatada_str = data_valores_mibgas_spot_temp.strftime('%d/%m/%Y')
+            elif data_valores_mibgas_spot:
+                data_mibgas_spot_formatada_str = f"Valor não reconhecido como data ({data_valores_mibgas_spot})"
+        except Exception: # Captura outros erros de conversão
+            if data_valores_mibgas_spot:
+                data_mibgas_spot_formatada_str = f"Erro ao processar valor ({data_valores_mibgas_spot})"
+
+st.markdown(f"**Valores MIBGAS (SPOT) atualizados até** {data_mibgas_spot_formatada_str}")
+# --- FIM DA SECÇÃO ---
+
+# --- INÍCIO DA SECÇÃO DE APOIO ---
+st.markdown("---") # Adiciona um separador visual antes da secção de apoio
+st.subheader("💖 Apoie este Projeto")
+
+st.markdown(
+    "Se quiser apoiar a manutenção do site e o desenvolvimento contínuo deste simulador, "
+    "pode fazê-lo através de uma das seguintes formas:"
+)
+
+# Link para BuyMeACoffee
+st.markdown(
+    "☕ [**Compre-me um café em BuyMeACoffee**](https://buymeacoffee.com/tiagofelicia)"
+)
+
+st.markdown("ou através do botão PayPal:")
+
+# Código HTML para o botão do PayPal
+paypal_button_html = """
+<div style="text-align: left; margin-top: 10px; margin-bottom: 15px;">
+    <form action="https://www.paypal.com/donate" method="post" target="_blank" style="display: inline-block;">
+    <input type="hidden" name="hosted_button_id" value="W6KZHVL53VFJC">
+    <input type="image" src="https://www.paypalobjects.com/pt_PT/PT/i/btn/btn_donate_SM.gif" border="0" name="submit" title="PayPal - The safer, easier way to pay online!" alt="Faça donativos com o botão PayPal">
+    <img alt="" border="0" src="https://www.paypal.com/pt_PT/i/scr/pixel.gif" width="1" height="1">
+    </form>
+</div>
+"""
+st.markdown(paypal_button_html, unsafe_allow_html=True)
+# --- FIM DA SECÇÃO DE APOIO ---
+
+st.markdown("---")
+# Título para as redes sociais
+st.subheader("Redes sociais, onde poderão seguir o projeto:")
+
+# URLs das redes sociais
+url_x = "https://x.com/tiagofelicia"
+url_facebook = "https://www.facebook.com/profile.php?id=61555007360529"
+url_instagram = "https://www.instagram.com/tiago_felicia/"
+url_youtube = "https://youtube.com/@tiagofelicia"
+url_tiktok = "https://www.tiktok.com/@Tiago_Felicia"
+
+icon_url_x = "https://upload.wikimedia.org/wikipedia/commons/thumb/c/cc/X_icon.svg/120px-X_icon.svg.png?20250519203220"
+icon_url_facebook = "https://upload.wikimedia.org/wikipedia/commons/thumb/b/b9/2023_Facebook_icon.svg/120px-2023_Facebook_icon.svg.png"
+icon_url_instagram = "https://upload.wikimedia.org/wikipedia/commons/a/a5/Instagram_icon.png"
+icon_url_youtube = "https://upload.wikimedia.org/wikipedia/commons/thumb/f/fd/YouTube_full-color_icon_%282024%29.svg/120px-YouTube_full-color_icon_%282024%29.svg.png"
+icon_url_tiktok = "https://upload.wikimedia.org/wikipedia/commons/a/a6/Tiktok_icon.svg"
+
+
+svg_icon_style_dark_mode_friendly = "filter: invert(0.8) sepia(0) saturate(1) hue-rotate(0deg) brightness(1.5) contrast(0.8);"
+
+col_social1, col_social2, col_social3, col_social4, col_social5 = st.columns(5)
+
+with col_social1:
+    st.markdown(
+        f"""
+        <a href="{url_x}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
+            <img src="{icon_url_x}" width="40" alt="X" style="margin-bottom: 8px; object-fit: contain;">
+            X
+        </a>
+        """,
+        unsafe_allow_html=True
+    )
+
+with col_social2:
+    st.markdown(
+        f"""
+        <a href="{url_facebook}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
+            <img src="{icon_url_facebook}" width="40" alt="Facebook" style="margin-bottom: 8px; object-fit: contain;">
+            Facebook
+        </a>
+        """,
+        unsafe_allow_html=True
+    )
+
+with col_social3:
+    st.markdown(
+        f"""
+        <a href="{url_instagram}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
+            <img src="{icon_url_instagram}" width="40" alt="Instagram" style="margin-bottom: 8px; object-fit: contain;">
+            Instagram
+        </a>
+        """,
+        unsafe_allow_html=True
+    )
+
+with col_social4:
+    st.markdown(
+        f"""
+        <a href="{url_youtube}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
+            <img src="{icon_url_youtube}" width="40" alt="YouTube" style="margin-bottom: 8px; object-fit: contain;">
+            YouTube
+        </a>
+        """,
+        unsafe_allow_html=True
+    )
+
+with col_social5:
+    st.markdown(
+        f"""
+        <a href="{url_tiktok}" target="_blank" style="text-decoration: none; color: inherit; display: flex; flex-direction: column; align-items: center; text-align: center;">
+            <img src="{icon_url_tiktok}" width="40" alt="Tiktok" style="margin-bottom: 8px; object-fit: contain;">
+            Tiktok
+        </a>
+        """,
+        unsafe_allow_html=True
+    )
+st.markdown("<br>", unsafe_allow_html=True) # Adiciona um espaço vertical
+
+# Texto de Copyright
+ano_copyright = 2025
+nome_autor = "Tiago Felícia"
+texto_copyright_html = f"© {ano_copyright} Todos os direitos reservados | {nome_autor}"
+
+st.markdown(
+    f"<div style='text-align: center; font-size: 0.9em; color: grey;'>{texto_copyright_html}</div>",
+    unsafe_allow_html=True
+)
@@ -1,286 +1,656 @@
-import streamlit as st
-import pandas as pd
-import datetime
-from calendar import monthrange
-import requests
-import io
-
-# --- Carregar ficheiro Excel do GitHub ---
-# --- Para simulador de gás
-@st.cache_data(ttl=1800, show_spinner=False) # Cache por 30 minutos (1800 segundos)
-def carregar_dados_excel_gas(url):
-    xls = pd.ExcelFile(url)
-    try:
-        tarifas_gas_master = xls.parse("Tarifas_Gas_Master")
-    except Exception as e:
-        # Se a aba não existir, criamos um DataFrame vazio para não quebrar a app
-        st.error(f"Atenção: A aba 'Tarifas_Gas_Master' não foi encontrada no Excel. {e}")
-        tarifas_gas_master = pd.DataFrame()
-    try:
-        tos_municipios = xls.parse("TOS")
-        # --- Limpar nomes das colunas da aba TOS ---
-        if not tos_municipios.empty:
-             tos_municipios.columns = [str(c).strip() for c in tos_municipios.columns]
-    except Exception:
-        st.error("Aviso: A aba 'TOS' (Taxa Ocupação Subsolo) não foi encontrada no Excel.")
-        tos_municipios = pd.DataFrame()
-    try:
-        mibgas_df = xls.parse("MIBGAS")
-    except Exception:
-        st.warning("Aviso: A aba 'MIBGAS' não foi encontrada no Excel.")
-        mibgas_df = pd.DataFrame()
-    try:
-        info_tab = xls.parse("Info")
-    except Exception:
-        st.warning("Aviso: A aba 'Info' não foi encontrada no Excel.")
-        info_tab = pd.DataFrame()
-
-    constantes = xls.parse("Constantes")
-    return constantes, tarifas_gas_master, tos_municipios, mibgas_df, info_tab
-
-# --- Carregar ficheiro Excel do GitHub ---
-# --- Para simulador de eletricidade
-@st.cache_data(ttl=1800, show_spinner=False)
-def carregar_dados_excel_elec(url):
-    """
-    Carrega os dados do ficheiro Excel de eletricidade a partir de um URL.
-    Usa 'requests' para descarregar e o motor 'calamine' para ler de forma robusta.
-    """
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        excel_file_in_memory = io.BytesIO(response.content)
-        xls = pd.ExcelFile(excel_file_in_memory, engine='calamine')
-        
-    except requests.exceptions.RequestException as e:
-        st.error(f"Erro ao descarregar o ficheiro Excel do GitHub: {e}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-
-    tarifarios_fixos = xls.parse("Tarifarios_fixos")
-    tarifarios_indexados = xls.parse("Indexados")
-    omie_perdas_ciclos = xls.parse("OMIE_PERDAS_CICLOS")
-
-    omie_perdas_ciclos.columns = [str(c).strip() for c in omie_perdas_ciclos.columns]
-    
-    if 'Data' not in omie_perdas_ciclos.columns and 'DataHora' in omie_perdas_ciclos.columns:
-        temp_dt = pd.to_datetime(omie_perdas_ciclos['DataHora'])
-        omie_perdas_ciclos['Data'] = temp_dt.dt.strftime('%m/%d/%Y')
-        omie_perdas_ciclos['Hora'] = temp_dt.dt.strftime('%H:%M')
-
-    if 'Data' in omie_perdas_ciclos.columns and 'Hora' in omie_perdas_ciclos.columns:
-        omie_perdas_ciclos['DataHora'] = pd.to_datetime(
-            omie_perdas_ciclos['Data'].astype(str) + ' ' + omie_perdas_ciclos['Hora'].astype(str),
-            format='%m/%d/%Y %H:%M',
-            errors='coerce'
-        ).dt.tz_localize(None)
-        
-        omie_perdas_ciclos.dropna(subset=['DataHora'], inplace=True)
-        omie_perdas_ciclos.drop_duplicates(subset=['DataHora'], keep='first', inplace=True)
-    else:
-        st.error("Colunas 'Data' e 'Hora' não encontradas na aba OMIE_PERDAS_CICLOS.")
-
-    constantes = xls.parse("Constantes")
-    return tarifarios_fixos, tarifarios_indexados, omie_perdas_ciclos, constantes
-
-
-
-def processar_ficheiro_consumos(ficheiro_excel):
-    """
-    Lê um ficheiro Excel da E-Redes, com deteção de cabeçalho e ajuste de tempo preciso
-    para alinhar com os timestamps do ficheiro OMIE, aplicando a regra de negócio para 00:00.
-    Agora suporta múltiplos nomes para a coluna de consumo e potência.
-    """
-    try:
-        df_temp = pd.read_excel(ficheiro_excel, header=None, nrows=20)
-        header_row_index = -1
-        coluna_consumo_kw = ""
-        
-        # --- Procurar por uma lista de colunas na ordem desejada ---
-        colunas_procurar_consumo = [
-            'Consumo Simulado (kW)',
-            "Consumo medido na IC, Ativa (kW)",
-            "Consumo registado (kW)",
-            "Consumo registado, Ativa (kW)"
-        ]
-
-        for i, row in df_temp.iterrows():
-            row_values = [str(v).strip() for v in row.values]
-            for nome_coluna in colunas_procurar_consumo:
-                if nome_coluna in row_values:
-                    header_row_index = i
-                    coluna_consumo_kw = nome_coluna
-                    break  # Sai do loop interno assim que encontra uma correspondência
-            if coluna_consumo_kw:
-                break # Sai do loop externo se já encontrou a coluna
-
-        if header_row_index == -1:
-            return None, "Não foi possível encontrar uma linha de cabeçalho com colunas de consumo conhecidas."
-
-        df = pd.read_excel(ficheiro_excel, header=header_row_index)
-        df.columns = [str(c).strip() for c in df.columns]
-        
-        df['Consumo (kWh)'] = pd.to_numeric(df[coluna_consumo_kw], errors='coerce') / 4.0
-
-        # --- Lógica para definir a Potencia_kW_Para_Analise ---
-        if "Consumo registado, Ativa (kW)" in df.columns:
-            df['Potencia_kW_Para_Analise'] = pd.to_numeric(df["Consumo registado, Ativa (kW)"], errors='coerce')
-        elif "Consumo registado (kW)" in df.columns:
-            df['Potencia_kW_Para_Analise'] = pd.to_numeric(df["Consumo registado (kW)"], errors='coerce')
-        else:
-            # Fallback para a coluna de consumo principal, caso as outras não existam
-            df['Potencia_kW_Para_Analise'] = pd.to_numeric(df[coluna_consumo_kw], errors='coerce')
-
-        df.dropna(subset=[coluna_consumo_kw], inplace=True)
-
-        df['DataHora'] = pd.to_datetime(
-            df['Data'].astype(str) + ' ' + df['Hora'].astype(str),
-            errors='coerce'
-        ).dt.tz_localize(None)
-
-        # Ajuste para o timestamp 00:00 (lógica existente mantida)
-        df['DataHora'] = df['DataHora'].apply(
-            lambda ts: ts - pd.Timedelta(minutes=1) if ts.time() == datetime.time(0, 0) else ts
-        )
-        
-        df.dropna(subset=['DataHora', 'Consumo (kWh)'], inplace=True)
-
-        return df[['DataHora', 'Consumo (kWh)', 'Potencia_kW_Para_Analise']], None
-    except Exception as e:
-        return None, f"Erro ao processar ficheiro: {e}"
-
-def validar_e_juntar_ficheiros(lista_de_ficheiros):
-    """
-    Processa uma lista de ficheiros da E-Redes, junta os dados, e filtra para incluir
-    apenas registos a partir de 01/01/2025, alertando o utilizador se dados mais
-    antigos foram ignorados (Lógica Robusta).
-    """
-    if not lista_de_ficheiros:
-        return None, "Nenhum ficheiro carregado."
-
-    dataframes_processados = []
-    intervalos_de_datas = []
-    
-    data_limite_dt = pd.to_datetime('2025-01-01')
-    dados_antigos_encontrados = False # Flag para o aviso
-
-    for ficheiro in lista_de_ficheiros:
-        df_individual, erro = processar_ficheiro_consumos(ficheiro)
-        if erro:
-            return None, f"Erro ao processar o ficheiro '{ficheiro.name}': {erro}"
-        
-        if df_individual.empty:
-            continue
-
-        # --- ALTERAÇÃO PRINCIPAL: Lógica de deteção por contagem de linhas ---
-        
-        # 1. Contar linhas ANTES de filtrar
-        linhas_antes = len(df_individual)
-        
-        # 2. Aplicar o filtro de data
-        df_filtrado = df_individual[df_individual['DataHora'] >= data_limite_dt].copy()
-        
-        # 3. Contar linhas DEPOIS de filtrar
-        linhas_depois = len(df_filtrado)
-        
-        # 4. Se o número de linhas diminuiu, sabemos que dados antigos foram ignorados.
-        if linhas_antes > linhas_depois:
-            dados_antigos_encontrados = True
-
-        # Se o ficheiro ficar vazio após a filtragem, simplesmente ignoramo-lo.
-        if df_filtrado.empty:
-            continue
-
-        # A partir daqui, trabalhamos apenas com o df_filtrado
-        dataframes_processados.append(df_filtrado)
-        min_data = df_filtrado['DataHora'].min()
-        max_data = df_filtrado['DataHora'].max()
-        intervalos_de_datas.append((min_data, max_data))
-
-    if not dataframes_processados:
-        return None, "Nenhum dos ficheiros continha dados válidos a partir de 01/01/2025."
-
-    # Lógica de verificação de sobreposição (mantém-se igual)
-    if len(intervalos_de_datas) > 1:
-        intervalos_ordenados = sorted(intervalos_de_datas, key=lambda x: x[0])
-        for i in range(1, len(intervalos_ordenados)):
-            if intervalos_ordenados[i][0] < intervalos_ordenados[i-1][1]:
-                return None, "Erro: Sobreposição de datas detetada entre os ficheiros."
-
-    df_final_combinado = pd.concat(dataframes_processados, ignore_index=True)
-    df_final_combinado = df_final_combinado.sort_values(by='DataHora').reset_index(drop=True)
-    df_final_combinado = df_final_combinado.drop_duplicates(subset=['DataHora'], keep='first')
-
-    # Lógica de retorno da mensagem (mantém-se igual)
-    mensagem_retorno = None
-    if dados_antigos_encontrados:
-        mensagem_retorno = "Aviso: Foram encontrados e ignorados dados anteriores a 01/01/2025."
-
-    return df_final_combinado, mensagem_retorno
-
-def agregar_consumos_por_periodo(df_consumos, df_omie_ciclos):
-    if df_consumos is None or df_consumos.empty: return {}
-
-    df_merged = pd.merge(df_consumos, df_omie_ciclos, on='DataHora', how='left')
-
-    consumos_agregados = {'Simples': df_merged['Consumo (kWh)'].sum()}
-    
-    for ciclo in ['BD', 'BS', 'TD', 'TS']:
-        if ciclo in df_merged.columns:
-            df_merged[ciclo] = df_merged[ciclo].fillna('Desconhecido')
-            soma_por_periodo = df_merged.groupby(ciclo)['Consumo (kWh)'].sum().to_dict()
-            consumos_agregados[ciclo] = soma_por_periodo
-            
-    return consumos_agregados
-
-def calcular_medias_omie_para_todos_ciclos(df_consumos_periodo, df_omie_completo):
-    """
-    Calcula as médias OMIE para todos os ciclos, com base no intervalo de datas
-    do dataframe de consumos fornecido.
-    """
-    if df_consumos_periodo.empty:
-        return {}
-    
-    min_date = df_consumos_periodo['DataHora'].min()
-    max_date = df_consumos_periodo['DataHora'].max()
-    
-    df_omie_filtrado = df_omie_completo[
-        (df_omie_completo['DataHora'] >= min_date) & 
-        (df_omie_completo['DataHora'] <= max_date)
-    ].copy()
-
-    if df_omie_filtrado.empty:
-        return {}
-
-    omie_medios = {'S': df_omie_filtrado['OMIE'].mean()}
-    for ciclo in ['BD', 'BS', 'TD', 'TS']:
-        if ciclo in df_omie_filtrado.columns:
-            agrupado = df_omie_filtrado.groupby(ciclo)['OMIE'].mean()
-            for periodo, media in agrupado.items():
-                omie_medios[f"{ciclo}_{periodo}"] = media
-    return omie_medios
-
-def normalizar_para_ordenacao(texto):
-    """
-    Remove acentos de um texto e converte para minúsculas para criar uma
-    chave de ordenação alfabética que funciona de forma consistente.
-    Ex: 'Évora' -> 'evora'
-    """
-    if not isinstance(texto, str):
-        return texto
-
-    # Dicionário de substituição de caracteres
-    substituicoes = {
-        'á': 'a', 'à': 'a', 'ã': 'a', 'â': 'a',
-        'é': 'e', 'ê': 'e',
-        'í': 'i',
-        'ó': 'o', 'ô': 'o', 'õ': 'o',
-        'ú': 'u', 'ü': 'u',
-        'ç': 'c',
-    }
-    
-    texto_lower = texto.lower()
-    texto_normalizado = ""
-    for char in texto_lower:
-        texto_normalizado += substituicoes.get(char, char)
-        
+import streamlit as st
+import pandas as pd
+import numpy as np
+from calendar import monthrange
+import requests
+import io
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Tempos de vida das caches de dados do simulador de gás ---
+# Os tarifários, constantes e TOS mudam raramente; a série MIBGAS muda todos os dias.
+TTL_CATALOGO_GAS = 21600 # 6 horas
+TTL_SERIE_MIBGAS = 1800  # 30 minutos
+
+def _calcular_versao_dados(*conteudos_bytes):
+    """Gera um identificador curto (hash) do conteúdo descarregado, para servir de chave a caches derivadas."""
+    hash_conteudo = hashlib.sha1()
+    for conteudo in conteudos_bytes:
+        hash_conteudo.update(conteudo or b"")
+    return hash_conteudo.hexdigest()[:12]
+
+def _descarregar_bytes(url):
+    """Descarrega um ficheiro e devolve o seu conteúdo em bytes (None se falhar)."""
+    try:
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        return response.content
+    except requests.exceptions.RequestException:
+        return None
+
+# --- Carregar catálogo de tarifários de gás (Excel do GitHub) ---
+@st.cache_data(ttl=TTL_CATALOGO_GAS, show_spinner=False)
+def carregar_catalogo_gas(url):
+    """
+    Carrega as abas que mudam raramente (Constantes, Tarifas_Gas_Master e TOS) do Excel de gás.
+    Devolve também um token de versão do ficheiro, que as caches derivadas podem usar como chave.
+    """
+    conteudo_excel = _descarregar_bytes(url)
+    if conteudo_excel is None:
+        raise ValueError(f"Não foi possível descarregar o ficheiro Excel de gás: {url}")
+    xls = pd.ExcelFile(io.BytesIO(conteudo_excel))
+    try:
+        tarifas_gas_master = xls.parse("Tarifas_Gas_Master")
+    except Exception as e:
+        # Se a aba não existir, criamos um DataFrame vazio para não quebrar a app
+        st.error(f"Atenção: A aba 'Tarifas_Gas_Master' não foi encontrada no Excel. {e}")
+        tarifas_gas_master = pd.DataFrame()
+    try:
+        tos_municipios = xls.parse("TOS")
+        # --- Limpar nomes das colunas da aba TOS ---
+        if not tos_municipios.empty:
+             tos_municipios.columns = [str(c).strip() for c in tos_municipios.columns]
+    except Exception:
+        st.error("Aviso: A aba 'TOS' (Taxa Ocupação Subsolo) não foi encontrada no Excel.")
+        tos_municipios = pd.DataFrame()
+
+    constantes = xls.parse("Constantes")
+    return constantes, tarifas_gas_master, tos_municipios, _calcular_versao_dados(conteudo_excel)
+
+# --- Carregar a série MIBGAS publicada à parte do Excel (pasta 'dados') ---
+@st.cache_data(ttl=TTL_SERIE_MIBGAS, show_spinner=False)
+def carregar_serie_mibgas(url_mibgas, url_info, url_excel_alternativo=None):
+    """
+    Lê a série diária MIBGAS e a aba Info a partir dos CSV publicados pelo script de atualização.
+    Se os CSV não estiverem disponíveis, recorre às abas 'MIBGAS' e 'Info' do Excel (se indicado).
+    Devolve (mibgas_df, info_tab, versao), onde 'versao' muda sempre que a série muda.
+    """
+    conteudo_mibgas = _descarregar_bytes(url_mibgas)
+    conteudo_info = _descarregar_bytes(url_info)
+
+    if conteudo_mibgas is not None:
+        try:
+            mibgas_df = pd.read_csv(io.BytesIO(conteudo_mibgas), parse_dates=['Data'], encoding='utf-8')
+            info_tab = pd.read_csv(io.BytesIO(conteudo_info), parse_dates=['Data'], encoding='utf-8') if conteudo_info is not None else pd.DataFrame()
+            return mibgas_df, info_tab, _calcular_versao_dados(conteudo_mibgas, conteudo_info)
+        except Exception as e:
+            # CSV truncado ou sem a coluna 'Data': segue para as abas do Excel
+            st.warning(f"Aviso: Não foi possível ler a série MIBGAS publicada ({e}). A usar o Excel de tarifários.")
+
+    # Alternativa: abas do Excel de tarifários
+    conteudo_excel = _descarregar_bytes(url_excel_alternativo) if url_excel_alternativo else None
+    if conteudo_excel is None:
+        return pd.DataFrame(), pd.DataFrame(), _calcular_versao_dados()
+    try:
+        xls = pd.ExcelFile(io.BytesIO(conteudo_excel))
+    except Exception as e:
+        st.warning(f"Aviso: Não foi possível abrir o Excel de tarifários para a série MIBGAS: {e}")
+        return pd.DataFrame(), pd.DataFrame(), _calcular_versao_dados()
+    try:
+        mibgas_df = xls.parse("MIBGAS")
+    except Exception:
+        st.warning("Aviso: A aba 'MIBGAS' não foi encontrada no Excel.")
+        mibgas_df = pd.DataFrame()
+    try:
+        info_tab = xls.parse("Info")
+    except Exception:
+        st.warning("Aviso: A aba 'Info' não foi encontrada no Excel.")
+        info_tab = pd.DataFrame()
+    return mibgas_df, info_tab, _calcular_versao_dados(conteudo_excel)
+
+# --- Carregar ficheiro Excel do GitHub ---
+# --- Para simulador de eletricidade
+@st.cache_data(ttl=1800, show_spinner=False)
+def carregar_dados_excel_elec(url):
+    """
+    Carrega os dados do ficheiro Excel de eletricidade a partir de um URL.
+    Usa 'requests' para descarregar e o motor 'calamine' para ler de forma robusta.
+    """
+    try:
+        response = requests.get(url)
+        response.raise_for_status()
+        excel_file_in_memory = io.BytesIO(response.content)
+        xls = pd.ExcelFile(excel_file_in_memory, engine='calamine')
+        
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erro ao descarregar o ficheiro Excel do GitHub: {e}")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+    tarifarios_fixos = xls.parse("Tarifarios_fixos")
+    tarifarios_indexados = xls.parse("Indexados")
+    omie_perdas_ciclos = xls.parse("OMIE_PERDAS_CICLOS")
+
+    omie_perdas_ciclos.columns = [str(c).strip() for c in omie_perdas_ciclos.columns]
+    
+    if 'Data' not in omie_perdas_ciclos.columns and 'DataHora' in omie_perdas_ciclos.columns:
+        temp_dt = pd.to_datetime(omie_perdas_ciclos['DataHora'])
+        omie_perdas_ciclos['Data'] = temp_dt.dt.strftime('%m/%d/%Y')
+        omie_perdas_ciclos['Hora'] = temp_dt.dt.strftime('%H:%M')
+
+    if 'Data' in omie_perdas_ciclos.columns and 'Hora' in omie_perdas_ciclos.columns:
+        omie_perdas_ciclos['DataHora'] = pd.to_datetime(
+            omie_perdas_ciclos['Data'].astype(str) + ' ' + omie_perdas_ciclos['Hora'].astype(str),
+            format='%m/%d/%Y %H:%M',
+            errors='coerce'
+        ).dt.tz_localize(None)
+        
+        omie_perdas_ciclos.dropna(subset=['DataHora'], inplace=True)
+        omie_perdas_ciclos.drop_duplicates(subset=['DataHora'], keep='first', inplace=True)
+    else:
+        st.error("Colunas 'Data' e 'Hora' não encontradas na aba OMIE_PERDAS_CICLOS.")
+
+    constantes = xls.parse("Constantes")
+    return tarifarios_fixos, tarifarios_indexados, omie_perdas_ciclos, constantes
+
+
+
+# Motor de leitura dos ficheiros Excel carregados: calamine (muito mais rápido) se estiver instalado
+try:
+    import python_calamine  # noqa: F401
+    MOTOR_EXCEL_CONSUMOS = 'calamine'
+except ImportError:
+    MOTOR_EXCEL_CONSUMOS = None # motor por omissão do pandas (openpyxl)
+
+# Formatos de "Data Hora" conhecidos nos ficheiros da E-Redes (o primeiro que servir na amostra é usado em todas as linhas)
+FORMATOS_DATA_HORA_EREDES = [
+    f"{formato_data} {formato_hora}"
+    for formato_data in ['%Y/%m/%d', '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y']
+    for formato_hora in ['%H:%M', '%H:%M:%S']
+]
+
+def _converter_data_hora_eredes(texto_data_hora):
+    """
+    Converte o texto "Data Hora" com um formato explícito de FORMATOS_DATA_HORA_EREDES, escolhido por
+    uma amostra das primeiras linhas. As linhas que esse formato não reconhece (ou todas, se nenhum
+    formato servir) são convertidas pela inferência do pandas, como antes.
+    """
+    amostra = texto_data_hora.head(50)
+    for formato in FORMATOS_DATA_HORA_EREDES:
+        if pd.to_datetime(amostra, format=formato, errors='coerce').notna().all():
+            data_hora = pd.to_datetime(texto_data_hora, format=formato, errors='coerce')
+            sem_formato = data_hora.isna()
+            if sem_formato.any():
+                data_hora[sem_formato] = pd.to_datetime(
+                    texto_data_hora[sem_formato], format='mixed', errors='coerce'
+                ).dt.tz_localize(None)
+            return data_hora
+    return pd.to_datetime(texto_data_hora, errors='coerce').dt.tz_localize(None)
+
+def processar_ficheiro_consumos(ficheiro_excel):
+    """
+    Lê um ficheiro Excel da E-Redes, com deteção de cabeçalho e ajuste de tempo preciso
+    para alinhar com os timestamps do ficheiro OMIE, aplicando a regra de negócio para 00:00.
+    Agora suporta múltiplos nomes para a coluna de consumo e potência.
+    O ficheiro é lido uma única vez; o cabeçalho é procurado nas primeiras 20 linhas da mesma leitura.
+    """
+    try:
+        df_bruto = pd.read_excel(ficheiro_excel, header=None, engine=MOTOR_EXCEL_CONSUMOS)
+        header_row_index = -1
+        coluna_consumo_kw = ""
+        
+        # --- Procurar por uma lista de colunas na ordem desejada ---
+        colunas_procurar_consumo = [
+            'Consumo Simulado (kW)',
+            "Consumo medido na IC, Ativa (kW)",
+            "Consumo registado (kW)",
+            "Consumo registado, Ativa (kW)"
+        ]
+
+        for i, row in enumerate(df_bruto.head(20).itertuples(index=False)):
+            row_values = [str(v).strip() for v in row]
+            for nome_coluna in colunas_procurar_consumo:
+                if nome_coluna in row_values:
+                    header_row_index = i
+                    coluna_consumo_kw = nome_coluna
+                    break  # Sai do loop interno assim que encontra uma correspondência
+            if coluna_consumo_kw:
+                break # Sai do loop externo se já encontrou a coluna
+
+        if header_row_index == -1:
+            return None, "Não foi possível encontrar uma linha de cabeçalho com colunas de consumo conhecidas."
+
+        df = df_bruto.iloc[header_row_index + 1:].reset_index(drop=True)
+        df.columns = [str(c).strip() for c in df_bruto.iloc[header_row_index]]
+        df = df.infer_objects()
+        
+        df['Consumo (kWh)'] = pd.to_numeric(df[coluna_consumo_kw], errors='coerce') / 4.0
+
+        # --- Lógica para definir a Potencia_kW_Para_Analise ---
+        if "Consumo registado, Ativa (kW)" in df.columns:
+            df['Potencia_kW_Para_Analise'] = pd.to_numeric(df["Consumo registado, Ativa (kW)"], errors='coerce')
+        elif "Consumo registado (kW)" in df.columns:
+            df['Potencia_kW_Para_Analise'] = pd.to_numeric(df["Consumo registado (kW)"], errors='coerce')
+        else:
+            # Fallback para a coluna de consumo principal, caso as outras não existam
+            df['Potencia_kW_Para_Analise'] = pd.to_numeric(df[coluna_consumo_kw], errors='coerce')
+
+        df.dropna(subset=[coluna_consumo_kw], inplace=True)
+
+        data_hora = _converter_data_hora_eredes(df['Data'].astype(str) + ' ' + df['Hora'].astype(str))
+
+        # Ajuste para o timestamp 00:00 (lógica existente mantida): recua 1 minuto, de forma vetorizada
+        valores_data_hora = data_hora.to_numpy()
+        meia_noite = (data_hora == data_hora.dt.normalize()).to_numpy()
+        df['DataHora'] = np.where(meia_noite, valores_data_hora - np.timedelta64(1, 'm'), valores_data_hora)
+        
+        df.dropna(subset=['DataHora', 'Consumo (kWh)'], inplace=True)
+
+        return df[['DataHora', 'Consumo (kWh)', 'Potencia_kW_Para_Analise']], None
+    except Exception as e:
+        return None, f"Erro ao processar ficheiro: {e}"
+
+MAX_FICHEIROS_CONSUMOS_EM_PARALELO = 8
+
+def _ordenar_consumos_por_data(df):
+    """Garante que um ficheiro de consumos está ordenado por DataHora (ordenação estável, só se necessário)."""
+    if df['DataHora'].is_monotonic_increasing:
+        return df
+    return df.sort_values(by='DataHora', kind='stable')
+
+def _juntar_consumos_ordenados(dataframes_ordenados):
+    """
+    Junção (k-way merge) de ficheiros já ordenados por DataHora e sem sobreposição entre si:
+    basta encadeá-los pela data inicial. Os registos repetidos (adjacentes após a junção) são
+    removidos mantendo o primeiro.
+    """
+    dataframes_ordenados = sorted(dataframes_ordenados, key=lambda df: df['DataHora'].iloc[0])
+    df_junto = pd.concat(dataframes_ordenados, ignore_index=True)
+    datas = df_junto['DataHora'].to_numpy()
+    if len(datas) > 1 and (datas[1:] < datas[:-1]).any():
+        # Salvaguarda: se as séries se intercalarem, recorre a uma ordenação estável completa
+        df_junto = df_junto.sort_values(by='DataHora', kind='stable').reset_index(drop=True)
+        datas = df_junto['DataHora'].to_numpy()
+    primeiro_de_cada_data = np.ones(len(datas), dtype=bool)
+    primeiro_de_cada_data[1:] = datas[1:] != datas[:-1]
+    return df_junto[primeiro_de_cada_data]
+
+def validar_e_juntar_ficheiros(lista_de_ficheiros):
+    """
+    Processa uma lista de ficheiros da E-Redes, junta os dados, e filtra para incluir
+    apenas registos a partir de 01/01/2025, alertando o utilizador se dados mais
+    antigos foram ignorados (Lógica Robusta).
+    Os ficheiros são lidos em paralelo; o tempo total aproxima-se do ficheiro mais lento.
+    """
+    if not lista_de_ficheiros:
+        return None, "Nenhum ficheiro carregado."
+
+    dataframes_processados = []
+    intervalos_de_datas = []
+    
+    data_limite_dt = pd.to_datetime('2025-01-01')
+    dados_antigos_encontrados = False # Flag para o aviso
+
+    num_threads = min(len(lista_de_ficheiros), MAX_FICHEIROS_CONSUMOS_EM_PARALELO)
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        resultados = list(executor.map(processar_ficheiro_consumos, lista_de_ficheiros))
+
+    for ficheiro, (df_individual, erro) in zip(lista_de_ficheiros, resultados):
+        if erro:
+            return None, f"Erro ao processar o ficheiro '{ficheiro.name}': {erro}"
+        
+        if df_individual.empty:
+            continue
+
+        # --- ALTERAÇÃO PRINCIPAL: Lógica de deteção por contagem de linhas ---
+        
+        # 1. Contar linhas ANTES de filtrar
+        linhas_antes = len(df_individual)
+        
+        # 2. Aplicar o filtro de data
+        df_filtrado = df_individual[df_individual['DataHora'] >= data_limite_dt]
+        
+        # 3. Contar linhas DEPOIS de filtrar
+        linhas_depois = len(df_filtrado)
+        
+        # 4. Se o número de linhas diminuiu, sabemos que dados antigos foram ignorados.
+        if linhas_antes > linhas_depois:
+            dados_antigos_encontrados = True
+
+        # Se o ficheiro ficar vazio após a filtragem, simplesmente ignoramo-lo.
+        if df_filtrado.empty:
+            continue
+
+        # A partir daqui, trabalhamos apenas com o df_filtrado (ordenado por data)
+        df_filtrado = _ordenar_consumos_por_data(df_filtrado)
+        dataframes_processados.append(df_filtrado)
+        intervalos_de_datas.append((df_filtrado['DataHora'].iloc[0], df_filtrado['DataHora'].iloc[-1]))
+
+    if not dataframes_processados:
+        return None, "Nenhum dos ficheiros continha dados válidos a partir de 01/01/2025."
+
+    # Verificação de sobreposição: varrimento dos intervalos ordenados pelo início
+    if len(intervalos_de_datas) > 1:
+        inicios = np.array([inicio for inicio, _ in intervalos_de_datas], dtype='datetime64[ns]')
+        fins = np.array([fim for _, fim in intervalos_de_datas], dtype='datetime64[ns]')
+        ordem = np.argsort(inicios, kind='stable')
+        fim_maximo_anterior = np.maximum.accumulate(fins[ordem])[:-1]
+        if (inicios[ordem][1:] < fim_maximo_anterior).any():
+            return None, "Erro: Sobreposição de datas detetada entre os ficheiros."
+
+    df_final_combinado = _juntar_consumos_ordenados(dataframes_processados).reset_index(drop=True)
+
+    # Lógica de retorno da mensagem (mantém-se igual)
+    mensagem_retorno = None
+    if dados_antigos_encontrados:
+        mensagem_retorno = "Aviso: Foram encontrados e ignorados dados anteriores a 01/01/2025."
+
+    return df_final_combinado, mensagem_retorno
+
+# --- CONSUMOS DE GÁS (FICHEIROS DO DISTRIBUIDOR) ---
+# Nomes de coluna reconhecidos (já normalizados: minúsculas, sem acentos, 'm³' -> 'm3')
+COLUNAS_CONSUMO_GAS = {
+    'data': ['data', 'data leitura', 'data da leitura', 'data de leitura', 'dia', 'date'],
+    'kwh': ['consumo (kwh)', 'energia (kwh)', 'consumo kwh', 'consumo energia (kwh)', 'kwh'],
+    'm3': ['consumo (m3)', 'volume (m3)', 'consumo m3', 'consumo volume (m3)', 'm3'],
+    'leitura': ['leitura (m3)', 'leitura', 'indice (m3)', 'indice', 'leitura contador (m3)'],
+    'pcs': ['pcs', 'pcs (kwh/m3)', 'fator de conversao', 'fator de conversao (kwh/m3)'],
+}
+TAMANHO_BLOCO_CSV_GAS = 100_000
+# Volume (m³) sem PCS no ficheiro: fica por converter até ser aplicado o PCS indicado pelo utilizador
+COLUNA_M3_SEM_PCS_GAS = 'Consumo (m3) sem PCS'
+# Os CSV exportados do Excel em PT vêm normalmente em cp1252; latin-1 aceita quaisquer bytes
+CODIFICACOES_CSV_GAS = ('utf-8-sig', 'cp1252', 'latin-1')
+
+def _normalizar_nome_coluna_gas(nome):
+    return normalizar_para_ordenacao(str(nome).strip()).replace('³', '3')
+
+def _mapear_colunas_consumo_gas(colunas):
+    """Devolve {papel: nome original da coluna} para as colunas reconhecidas em COLUNAS_CONSUMO_GAS."""
+    normalizadas = {_normalizar_nome_coluna_gas(c): c for c in colunas}
+    mapa = {}
+    for papel, candidatos in COLUNAS_CONSUMO_GAS.items():
+        for candidato in candidatos:
+            if candidato in normalizadas:
+                mapa[papel] = normalizadas[candidato]
+                break
+    return mapa
+
+def _para_numero_gas(serie):
+    """Converte texto com vírgula ou ponto decimal em números (vetorizado)."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    return pd.to_numeric(serie.astype(str).str.strip().str.replace(',', '.', regex=False), errors='coerce')
+
+def _para_data_gas(serie):
+    """Converte datas (dd/mm/aaaa, dd-mm-aaaa ou ISO) para datetime64 normalizado ao dia."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.normalize()
+    texto = serie.astype(str).str.strip().str.slice(0, 10)
+    for formato in ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d', '%Y/%m/%d'):
+        datas = pd.to_datetime(texto, errors='coerce', format=formato)
+        if datas.notna().any():
+            return datas
+    return pd.to_datetime(serie, errors='coerce', dayfirst=True).dt.normalize()
+
+def _detetar_codificacao_csv_gas(ficheiro):
+    """Primeira codificação de CODIFICACOES_CSV_GAS que descodifica o ficheiro inteiro sem erros."""
+    conteudo = ficheiro.read()
+    ficheiro.seek(0)
+    for codificacao in CODIFICACOES_CSV_GAS:
+        try:
+            conteudo.decode(codificacao)
+            return codificacao
+        except UnicodeDecodeError:
+            continue
+    return CODIFICACOES_CSV_GAS[-1]
+
+def _ler_blocos_consumos_gas(ficheiro):
+    """
+    Deteta a linha de cabeçalho (nas primeiras 20 linhas) e devolve um iterador de DataFrames.
+    Os CSV (UTF-8 ou cp1252/latin-1, detetado antes do cabeçalho) são lidos em blocos de
+    TAMANHO_BLOCO_CSV_GAS linhas; os Excel numa só leitura.
+    """
+    e_csv = ficheiro.name.lower().endswith('.csv')
+    if e_csv:
+        # As primeiras linhas podem ser títulos sem separador, por isso o separador e o cabeçalho
+        # são detetados no texto e não com o leitor de CSV
+        codificacao = _detetar_codificacao_csv_gas(ficheiro)
+        amostra = ficheiro.read(8192).decode(codificacao, errors='ignore')
+        separador = max([';', '\t', ','], key=amostra.count)
+        linhas_temp = [linha.split(separador) for linha in amostra.splitlines()[:20]]
+    else:
+        linhas_temp = pd.read_excel(ficheiro, header=None, nrows=20).values.tolist()
+
+    linha_cabecalho = 0
+    for i, valores in enumerate(linhas_temp):
+        mapa = _mapear_colunas_consumo_gas(valores)
+        if 'data' in mapa and ({'kwh', 'm3', 'leitura'} & mapa.keys()):
+            linha_cabecalho = i
+            break
+
+    ficheiro.seek(0)
+    if e_csv:
+        return pd.read_csv(
+            ficheiro, sep=separador, skiprows=linha_cabecalho, header=0, dtype=str,
+            encoding=codificacao, chunksize=TAMANHO_BLOCO_CSV_GAS
+        )
+    return iter([pd.read_excel(ficheiro, header=linha_cabecalho)])
+
+def _distribuir_leituras_por_dia(datas, leituras, pcs):
+    """
+    Converte leituras acumuladas do contador (m³) em consumo diário: o volume entre duas leituras
+    é repartido igualmente pelos dias desse intervalo (excluindo o dia da leitura anterior).
+    Com PCS na leitura o volume passa a kWh; sem PCS (NaN) fica em m³ em COLUNA_M3_SEM_PCS_GAS.
+    Intervalos com volume negativo (ex: troca de contador) são ignorados.
+    """
+    datas = datas.astype('datetime64[D]')
+    dias_intervalo = np.diff(datas).astype(int)
+    m3_intervalo = np.diff(leituras)
+    pcs_intervalo = pcs[1:]
+    validos = (dias_intervalo > 0) & (m3_intervalo >= 0)
+    dias_intervalo, m3_intervalo, pcs_intervalo, inicio = dias_intervalo[validos], m3_intervalo[validos], pcs_intervalo[validos], datas[:-1][validos]
+    if dias_intervalo.sum() == 0:
+        return pd.DataFrame(columns=['Data', 'Consumo (kWh)', COLUNA_M3_SEM_PCS_GAS])
+
+    sem_pcs = np.isnan(pcs_intervalo)
+    kwh_intervalo = np.where(sem_pcs, 0.0, m3_intervalo * np.nan_to_num(pcs_intervalo))
+    m3_sem_pcs_intervalo = np.where(sem_pcs, m3_intervalo, 0.0)
+
+    deslocamento = np.arange(dias_intervalo.sum()) - np.repeat(np.cumsum(dias_intervalo) - dias_intervalo, dias_intervalo)
+    datas_dia = np.repeat(inicio, dias_intervalo) + 1 + deslocamento
+    return pd.DataFrame({
+        'Data': pd.to_datetime(datas_dia),
+        'Consumo (kWh)': np.repeat(kwh_intervalo / dias_intervalo, dias_intervalo),
+        COLUNA_M3_SEM_PCS_GAS: np.repeat(m3_sem_pcs_intervalo / dias_intervalo, dias_intervalo),
+    })
+
+def ler_ficheiro_consumos_gas(ficheiro):
+    """
+    Lê um ficheiro de consumos de gás do distribuidor (CSV ou Excel) e devolve (DataFrame diário
+    com 'Data', 'Consumo (kWh)' e COLUNA_M3_SEM_PCS_GAS, erro). Aceita consumos diários em kWh,
+    consumos em m³ ou leituras acumuladas do contador. Os m³ com coluna PCS no ficheiro passam logo
+    a kWh; os restantes ficam em m³ para converter com converter_consumos_gas_kwh (o PCS pode mudar).
+    Sem colunas reconhecidas, assume a 1ª coluna como data e a seguinte como consumo em kWh.
+    """
+    try:
+        blocos_diarios = []
+        blocos_leituras = []
+        for bloco in _ler_blocos_consumos_gas(ficheiro):
+            mapa = _mapear_colunas_consumo_gas(bloco.columns)
+            if 'data' not in mapa or not ({'kwh', 'm3', 'leitura'} & mapa.keys()):
+                if bloco.shape[1] < 2:
+                    return None, "O ficheiro deve ter uma coluna de datas e uma coluna de consumo."
+                coluna_data = mapa.get('data', bloco.columns[0])
+                mapa = {'data': coluna_data, 'kwh': next(c for c in bloco.columns if c != coluna_data)}
+
+            datas = _para_data_gas(bloco[mapa['data']])
+            pcs = _para_numero_gas(bloco[mapa['pcs']]) if 'pcs' in mapa else pd.Series(np.nan, index=bloco.index)
+
+            if 'kwh' in mapa:
+                kwh = _para_numero_gas(bloco[mapa['kwh']])
+                m3_sem_pcs = pd.Series(0.0, index=bloco.index)
+            elif 'm3' in mapa:
+                m3 = _para_numero_gas(bloco[mapa['m3']])
+                kwh = (m3 * pcs).where(pcs.notna(), 0.0).where(m3.notna())
+                m3_sem_pcs = m3.where(pcs.isna(), 0.0)
+            else:
+                blocos_leituras.append(pd.DataFrame({'Data': datas, 'Leitura': _para_numero_gas(bloco[mapa['leitura']]), 'PCS': pcs}))
+                continue
+
+            validos = datas.notna() & kwh.notna()
+            # Agregar já por dia em cada bloco para manter a memória baixa em ficheiros grandes
+            blocos_diarios.append(
+                pd.DataFrame({'Consumo (kWh)': kwh[validos], COLUNA_M3_SEM_PCS_GAS: m3_sem_pcs[validos]}).groupby(datas[validos]).sum()
+            )
+
+        if blocos_leituras:
+            leituras = pd.concat(blocos_leituras).dropna(subset=['Data', 'Leitura'])
+            leituras = leituras.sort_values('Data').drop_duplicates(subset=['Data'], keep='last')
+            if len(leituras) < 2:
+                return None, "São necessárias pelo menos duas leituras do contador."
+            df_diario = _distribuir_leituras_por_dia(
+                leituras['Data'].to_numpy(), leituras['Leitura'].to_numpy(dtype=float), leituras['PCS'].to_numpy(dtype=float)
+            )
+        else:
+            if not blocos_diarios:
+                return None, "O ficheiro não tem dados."
+            df_diario = pd.concat(blocos_diarios).groupby(level=0).sum()
+            df_diario = pd.DataFrame({
+                'Data': pd.to_datetime(df_diario.index),
+                'Consumo (kWh)': df_diario['Consumo (kWh)'].to_numpy(dtype=float),
+                COLUNA_M3_SEM_PCS_GAS: df_diario[COLUNA_M3_SEM_PCS_GAS].to_numpy(dtype=float),
+            })
+
+        if df_diario.empty:
+            return None, "Não foram encontradas linhas com data e consumo válidos."
+        return df_diario.sort_values('Data').reset_index(drop=True), None
+    except Exception as e:
+        return None, f"Erro ao processar ficheiro: {e}"
+
+def converter_consumos_gas_kwh(df_consumos, fator_pcs=11.25):
+    """Série diária ('Data', 'Consumo (kWh)') a partir de ler_ficheiro_consumos_gas, convertendo os m³ sem PCS com fator_pcs."""
+    consumo_kwh = df_consumos['Consumo (kWh)'].to_numpy(dtype=float)
+    if COLUNA_M3_SEM_PCS_GAS in df_consumos.columns:
+        consumo_kwh = consumo_kwh + df_consumos[COLUNA_M3_SEM_PCS_GAS].to_numpy(dtype=float) * fator_pcs
+    return pd.DataFrame({'Data': df_consumos['Data'].to_numpy(), 'Consumo (kWh)': consumo_kwh})
+
+def tem_consumos_gas_sem_pcs(df_consumos):
+    """True se a série tiver volume em m³ à espera do PCS (o utilizador tem de indicar o PCS)."""
+    return COLUNA_M3_SEM_PCS_GAS in df_consumos.columns and bool((df_consumos[COLUNA_M3_SEM_PCS_GAS] != 0).any())
+
+def processar_ficheiro_consumos_gas(ficheiro, fator_pcs=11.25):
+    """
+    Lê um ficheiro de consumos de gás (ver ler_ficheiro_consumos_gas) e devolve (DataFrame diário
+    com 'Data' e 'Consumo (kWh)', erro), com os m³ sem PCS no ficheiro convertidos com fator_pcs.
+    """
+    df_consumos, erro = ler_ficheiro_consumos_gas(ficheiro)
+    if erro:
+        return None, erro
+    return converter_consumos_gas_kwh(df_consumos, fator_pcs), None
+
+def validar_e_juntar_ficheiros_gas(lista_de_ficheiros):
+    """
+    Lê uma lista de ficheiros de consumos de gás e junta-os numa série diária única (ainda com os
+    m³ sem PCS por converter, ver converter_consumos_gas_kwh), recusando ficheiros com datas
+    sobrepostas (como na versão de eletricidade).
+    """
+    if not lista_de_ficheiros:
+        return None, "Nenhum ficheiro carregado."
+
+    dataframes_processados = []
+    for ficheiro in lista_de_ficheiros:
+        df_individual, erro = ler_ficheiro_consumos_gas(ficheiro)
+        if erro:
+            return None, f"Erro ao processar o ficheiro '{ficheiro.name}': {erro}"
+        dataframes_processados.append(df_individual)
+
+    intervalos_ordenados = sorted((df['Data'].min(), df['Data'].max()) for df in dataframes_processados)
+    for i in range(1, len(intervalos_ordenados)):
+        if intervalos_ordenados[i][0] <= intervalos_ordenados[i-1][1]:
+            return None, "Erro: Sobreposição de datas detetada entre os ficheiros."
+
+    df_final_combinado = pd.concat(dataframes_processados, ignore_index=True)
+    return df_final_combinado.sort_values('Data').reset_index(drop=True), None
+
+def processar_perfil_consumo_gas(ficheiro):
+    """
+    Lê um perfil de consumo diário de gás e devolve (pd.Series de consumo em kWh indexada por dia, erro).
+    Usado para ponderar a média MIBGAS pelo consumo real.
+    """
+    df_diario, erro = processar_ficheiro_consumos_gas(ficheiro)
+    if erro:
+        return None, erro
+    return df_diario.set_index('Data')['Consumo (kWh)'], None
+
+def agregar_consumos_por_periodo(df_consumos, df_omie_ciclos, diagrama_preparado=None):
+    """
+    Consumo total ('Simples') e por período de cada ciclo (BD/BS/TD/TS); intervalos sem período ficam em 'Desconhecido'.
+    Com diagrama_preparado (calculos.preparar_diagrama_carga) soma sobre os arrays já cruzados, sem repetir o merge.
+    """
+    if df_consumos is None or df_consumos.empty: return {}
+
+    if diagrama_preparado is not None:
+        consumo = diagrama_preparado['consumo']
+        consumos_agregados = {'Simples': consumo.sum()}
+        for ciclo, (codigos, periodos) in diagrama_preparado['ciclos'].items():
+            com_periodo = codigos >= 0
+            soma_por_periodo = dict(zip(periodos, np.bincount(codigos[com_periodo], weights=consumo[com_periodo], minlength=len(periodos))))
+            if not com_periodo.all():
+                soma_por_periodo['Desconhecido'] = consumo[~com_periodo].sum()
+            consumos_agregados[ciclo] = soma_por_periodo
+        return consumos_agregados
+
+    df_merged = pd.merge(df_consumos, df_omie_ciclos, on='DataHora', how='left')
+
+    consumos_agregados = {'Simples': df_merged['Consumo (kWh)'].sum()}
+    
+    for ciclo in ['BD', 'BS', 'TD', 'TS']:
+        if ciclo in df_merged.columns:
+            df_merged[ciclo] = df_merged[ciclo].fillna('Desconhecido')
+            soma_por_periodo = df_merged.groupby(ciclo)['Consumo (kWh)'].sum().to_dict()
+            consumos_agregados[ciclo] = soma_por_periodo
+            
+    return consumos_agregados
+
+def calcular_medias_omie_para_todos_ciclos(df_consumos_periodo, df_omie_completo):
+    """
+    Calcula as médias OMIE para todos os ciclos, com base no intervalo de datas
+    do dataframe de consumos fornecido.
+    """
+    if df_consumos_periodo.empty:
+        return {}
+    
+    min_date = df_consumos_periodo['DataHora'].min()
+    max_date = df_consumos_periodo['DataHora'].max()
+    
+    df_omie_filtrado = df_omie_completo[
+        (df_omie_completo['DataHora'] >= min_date) & 
+        (df_omie_completo['DataHora'] <= max_date)
+    ].copy()
+
+    if df_omie_filtrado.empty:
+        return {}
+
+    omie_medios = {'S': df_omie_filtrado['OMIE'].mean()}
+    for ciclo in ['BD', 'BS', 'TD', 'TS']:
+        if ciclo in df_omie_filtrado.columns:
+            agrupado = df_omie_filtrado.groupby(ciclo)['OMIE'].mean()
+            for periodo, media in agrupado.items():
+                omie_medios[f"{ciclo}_{periodo}"] = media
+    return omie_medios
+
+def normalizar_para_ordenacao(texto):
+    """
+    Remove acentos de um texto e converte para minúsculas para criar uma
+    chave de ordenação alfabética que funciona de forma consistente.
+    Ex: 'Évora' -> 'evora'
+    """
+    if not isinstance(texto, str):
+        return texto
+
+    # Dicionário de substituição de caracteres
+    substituicoes = {
+        'á': 'a', 'à': 'a', 'ã': 'a', 'â': 'a',
+        'é': 'e', 'ê': 'e',
+        'í': 'i',
+        'ó': 'o', 'ô': 'o', 'õ': 'o',
+        'ú': 'u', 'ü': 'u',
+        'ç': 'c',
+    }
+    
+    texto_lower = texto.lower()
+    texto_normalizado = ""
+    for char in texto_lower:
+        texto_normalizado += substituicoes.get(char, char)
+        
     return texto_normalizado
\ No newline at end of file